@@ -0,0 +1,203 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from api.cache import TTLLRUCache
+
+User = get_user_model()
+
+
+class AuthTokenCache:
+    """Кэш снимков пользователей по токену авторизации.
+
+    Снимок - поля, нужные аутентификации и проверкам прав (роль,
+    блокировка, активность). Остальные поля, включая счетчики и хэш
+    пароля, у восстановленного пользователя отложены и при обращении
+    загружаются из БД.
+
+    Снимки ищутся в локальном LRU процесса с коротким сроком жизни,
+    затем в кэш-бэкенде. Сигналы удаляют снимок из бэкенда и из LRU
+    своего процесса, в остальных процессах он живет не дольше local_ttl.
+    Ключ - хэш токена, сам токен в кэш не попадает.
+
+    Счетчики попаданий и времени поиска копятся в процессе и
+    сбрасываются в бэкенд раз в stats_flush_every поисков.
+    """
+
+    prefix = "auth_token"
+    fields = (
+        "id",
+        "username",
+        "email",
+        "first_name",
+        "last_name",
+        "role",
+        "is_blocked",
+        "is_active",
+        "is_staff",
+        "is_superuser",
+    )
+    counters = (
+        "local_hits",
+        "shared_hits",
+        "misses",
+        "hit_time_us",
+        "miss_time_us",
+        "invalidations",
+    )
+
+    def __init__(
+        self, alias, timeout, local_size, local_ttl, stats_flush_every
+    ):
+        self.alias = alias
+        self.timeout = timeout
+        self.local = TTLLRUCache(local_size, local_ttl)
+        self.stats_flush_every = stats_flush_every
+        self._stats = Counter()
+        self._lookups = 0
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def key(self, token_key):
+        digest = hashlib.sha256(token_key.encode()).hexdigest()
+        return f"{self.prefix}:{digest}"
+
+    def load(self, token_key):
+        """Снимок из БД или None, если токена нет."""
+
+        token = (
+            Token.objects.select_related("user")
+            .filter(key=token_key)
+            .first()
+        )
+        if token is None:
+            return None
+        return {field: getattr(token.user, field) for field in self.fields}
+
+    def get(self, token_key):
+        """Снимок пользователя из LRU, кэш-бэкенда или БД."""
+
+        started = time.perf_counter()
+        key = self.key(token_key)
+        source = "local"
+        snapshot = self.local.get(key)
+        if snapshot is None:
+            source = "shared"
+            snapshot = self.backend.get(key)
+            if snapshot is None:
+                source = "db"
+                snapshot = self.load(token_key)
+                if snapshot is not None:
+                    self.backend.set(key, snapshot, timeout=self.timeout)
+            if snapshot is not None:
+                self.local.set(key, snapshot)
+
+        elapsed_us = int((time.perf_counter() - started) * 1_000_000)
+        if source == "db":
+            self.count(misses=1, miss_time_us=elapsed_us)
+        else:
+            self.count(**{f"{source}_hits": 1, "hit_time_us": elapsed_us})
+        return snapshot
+
+    @staticmethod
+    def build_user(snapshot):
+        """Пользователь из снимка: остальные поля отложены."""
+
+        field_names = [
+            field.attname
+            for field in User._meta.concrete_fields
+            if field.attname in snapshot
+        ]
+        return User.from_db(
+            DEFAULT_DB_ALIAS,
+            field_names,
+            [snapshot[field_name] for field_name in field_names],
+        )
+
+    def invalidate(self, token_keys):
+        keys = [self.key(token_key) for token_key in token_keys]
+        if not keys:
+            return
+        for key in keys:
+            self.local.delete(key)
+        self.backend.delete_many(keys)
+        self.count(invalidations=len(keys))
+
+    def count(self, **values):
+        with self._lock:
+            self._stats.update(values)
+            self._lookups += 1
+            if self._lookups < self.stats_flush_every:
+                return
+            stats, self._stats, self._lookups = self._stats, Counter(), 0
+        self.flush_stats(stats)
+
+    def flush_stats(self, stats=None):
+        if stats is None:
+            with self._lock:
+                stats, self._stats, self._lookups = self._stats, Counter(), 0
+        for counter, value in stats.items():
+            if not value:
+                continue
+            key = f"{self.prefix}:stats:{counter}"
+            self.backend.add(key, 0, timeout=None)
+            self.backend.incr(key, value)
+
+    def stats(self):
+        values = self.backend.get_many(
+            [f"{self.prefix}:stats:{counter}" for counter in self.counters]
+        )
+        return {
+            counter: values.get(f"{self.prefix}:stats:{counter}", 0)
+            for counter in self.counters
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats, self._lookups = Counter(), 0
+        self.backend.delete_many(
+            [f"{self.prefix}:stats:{counter}" for counter in self.counters]
+        )
+
+
+class CachingTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса к БД при попадании в кэш."""
+
+    def authenticate_credentials(self, key):
+        if not settings.AUTH_TOKEN_CACHE:
+            return super().authenticate_credentials(key)
+
+        snapshot = auth_token_cache.get(key)
+        if snapshot is None:
+            raise exceptions.AuthenticationFailed(_("Invalid token."))
+        if not snapshot["is_active"]:
+            raise exceptions.AuthenticationFailed(
+                _("User inactive or deleted.")
+            )
+
+        user = auth_token_cache.build_user(snapshot)
+        token = Token(key=key, user_id=user.id)
+        token.user = user
+        return user, token
+
+
+auth_token_cache = AuthTokenCache(
+    alias=settings.AUTH_TOKEN_CACHE_ALIAS,
+    timeout=settings.AUTH_TOKEN_CACHE_TIMEOUT,
+    local_size=settings.AUTH_TOKEN_CACHE_LOCAL_SIZE,
+    local_ttl=settings.AUTH_TOKEN_CACHE_LOCAL_TTL,
+    stats_flush_every=settings.AUTH_TOKEN_CACHE_STATS_FLUSH_EVERY,
+)
@@ -0,0 +1,393 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from recipes.models import Favorite, ShoppingCard
+
+
+def make_digest(export_format, rows):
+    """Хэш содержимого списка покупок - ключ документа и ETag."""
+
+    payload = json.dumps(
+        [export_format, list(rows)], ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class DocumentLRUCache:
+    """Локальный LRU-кэш документов, ограниченный суммарным размером."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._documents:
+                return None
+            self._documents.move_to_end(key)
+            return self._documents[key]
+
+    def set(self, key, document):
+        if len(document) > self.max_size:
+            return
+
+        with self._lock:
+            if key in self._documents:
+                self.size -= len(self._documents.pop(key))
+            self._documents[key] = document
+            self.size += len(document)
+
+            while self.size > self.max_size:
+                _, evicted = self._documents.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+            self.size = 0
+
+
+class TTLLRUCache:
+    """Локальный LRU-кэш с ограничением по числу записей и сроку жизни."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class ShoppingListCache:
+    """Кэш сгенерированных документов корзины.
+
+    Документы адресуются хэшем агрегированных строк (name, unit, amount):
+    сначала ищутся в локальном LRU, затем в кэш-бэкенде Django.
+    Для каждого пользователя хранится указатель на хэш его текущей
+    корзины, чтобы повторный запрос не пересчитывал агрегацию. Указатели
+    сбрасываются сигналами, а изменение ингредиентов поднимает общую
+    версию, которая входит в ключ указателя.
+
+    Указатели включаются SHOPPING_LIST_CACHE_POINTERS: в кэше отдельного
+    процесса сигнал из другого воркера их не сбросит.
+    """
+
+    prefix = "shopping_list"
+
+    def __init__(self, alias, max_size, timeout):
+        self.alias = alias
+        self.timeout = timeout
+        self.local = DocumentLRUCache(max_size)
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def get_version(self):
+        return self.backend.get_or_set(
+            f"{self.prefix}:version", 1, timeout=None
+        )
+
+    def bump_version(self):
+        try:
+            self.backend.incr(f"{self.prefix}:version")
+        except ValueError:
+            self.backend.set(f"{self.prefix}:version", 2, timeout=None)
+
+    def user_key(self, user_id, version=None):
+        if version is None:
+            version = self.get_version()
+        return f"{self.prefix}:{version}:user:{user_id}"
+
+    @property
+    def pointers(self):
+        return settings.SHOPPING_LIST_CACHE_POINTERS
+
+    def get_digest(self, user_id, export_format):
+        if not self.pointers:
+            return None
+        return self.backend.get(self.user_key(user_id), {}).get(export_format)
+
+    def set_digest(self, user_id, export_format, digest):
+        if not self.pointers:
+            return
+        key = self.user_key(user_id)
+        digests = self.backend.get(key, {})
+        digests[export_format] = digest
+        self.backend.set(key, digests, timeout=self.timeout)
+
+    def invalidate_users(self, user_ids):
+        version = self.get_version()
+        self.backend.delete_many(
+            [self.user_key(user_id, version) for user_id in set(user_ids)]
+        )
+
+    def get_document(self, digest):
+        document = self.local.get(digest)
+        if document is None:
+            document = self.backend.get(f"{self.prefix}:document:{digest}")
+            if document is not None:
+                self.local.set(digest, document)
+        return document
+
+    def set_document(self, digest, document):
+        self.local.set(digest, document)
+        self.backend.set(
+            f"{self.prefix}:document:{digest}", document, timeout=self.timeout
+        )
+
+
+class UserRecipeSetsCache:
+    """Кэш множеств id рецептов в избранном и в корзине пользователя.
+
+    Множества читаются одним запросом на пользователя и сбрасываются
+    сигналами при добавлении/удалении записей.
+    """
+
+    prefix = "user_recipe_sets"
+    models = {"favorites": Favorite, "shopping_cart": ShoppingCard}
+
+    def __init__(self, alias, timeout):
+        self.alias = alias
+        self.timeout = timeout
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def key(self, kind, user_id):
+        return f"{self.prefix}:{kind}:{user_id}"
+
+    def get(self, kind, user_id):
+        key = self.key(kind, user_id)
+        recipe_ids = self.backend.get(key)
+        if recipe_ids is None:
+            recipe_ids = frozenset(
+                self.models[kind]
+                .objects.filter(user_id=user_id)
+                .values_list("recipe_id", flat=True)
+            )
+            self.backend.set(key, recipe_ids, timeout=self.timeout)
+        return recipe_ids
+
+    def invalidate(self, kind, user_id):
+        self.backend.delete(self.key(kind, user_id))
+
+
+class UserRecipeSets:
+    """Множества избранного и корзины текущего пользователя.
+
+    Загружаются лениво, не больше одного раза за запрос: экземпляр
+    хранится на объекте запроса и общий для фильтров и сериализаторов.
+    """
+
+    request_attr = "_user_recipe_sets"
+    flag_kinds = {
+        "is_favorited": "favorites",
+        "is_in_shopping_cart": "shopping_cart",
+    }
+
+    def __init__(self, user):
+        self.user = user
+        self._sets = {}
+
+    @classmethod
+    def from_request(cls, request):
+        if not hasattr(request, cls.request_attr):
+            setattr(request, cls.request_attr, cls(request.user))
+        return getattr(request, cls.request_attr)
+
+    def get(self, kind):
+        if not self.user.is_authenticated:
+            return frozenset()
+        if kind not in self._sets:
+            self._sets[kind] = user_recipe_sets_cache.get(kind, self.user.id)
+        return self._sets[kind]
+
+    @property
+    def favorites(self):
+        return self.get("favorites")
+
+    @property
+    def shopping_cart(self):
+        return self.get("shopping_cart")
+
+
+class RecipeFeedCache:
+    """Общий кэш ответов ленты рецептов для анонимных пользователей.
+
+    Ключ - хэш адреса и нормализованной строки запроса. Вместе с ответом
+    хранятся версии пространств имен, от которых он зависит: фильтров
+    запроса (тег, автор или вся лента, рейтинг при сортировке по нему),
+    рецептов и авторов из ответа.
+    При чтении версии сверяются с текущими, поэтому изменение рецепта
+    сбрасывает только ответы с его тегами, автором или им самим.
+    """
+
+    prefix = "recipe_feed"
+    counters = ("hits", "misses", "invalidations")
+    multi_value_params = ("tags",)
+
+    def __init__(self, alias, timeout):
+        self.alias = alias
+        self.timeout = timeout
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    @classmethod
+    def normalize_query(cls, query_params):
+        params = []
+        for name, values in sorted(query_params.lists()):
+            values = [value for value in values if value != ""]
+            if name in cls.multi_value_params:
+                values = sorted(set(values))
+            params.extend((name, value) for value in values)
+        return params
+
+    def make_key(self, action, url, query_params):
+        payload = json.dumps(
+            [url, self.normalize_query(query_params)], ensure_ascii=False
+        )
+        digest = hashlib.sha256(payload.encode()).hexdigest()
+        return f"{self.prefix}:{action}:{digest}"
+
+    @classmethod
+    def query_namespaces(cls, query_params):
+        """Пространства имен, от которых зависит состав ленты."""
+
+        namespaces = [
+            f"tag:{slug}"
+            for slug in set(query_params.getlist("tags"))
+            if slug
+        ]
+        if query_params.get("author"):
+            namespaces.append(f"author:{query_params['author']}")
+        if not namespaces:
+            namespaces.append("all")
+        if query_params.get("ordering"):
+            namespaces.append("ranking")
+        return namespaces
+
+    def version_key(self, namespace):
+        return f"{self.prefix}:version:{namespace}"
+
+    def get_versions(self, namespaces):
+        """Текущие версии, отсутствующие заводятся заново.
+
+        Начальная версия берется от времени, чтобы вытесненный из кэша
+        счетчик не совпал с версией, сохраненной в старом ответе.
+        """
+
+        keys = {
+            self.version_key(namespace): namespace
+            for namespace in namespaces
+        }
+        versions = {
+            keys[key]: version
+            for key, version in self.backend.get_many(keys).items()
+        }
+        for key, namespace in keys.items():
+            if namespace not in versions:
+                self.backend.add(key, time.time_ns(), timeout=None)
+                versions[namespace] = self.backend.get(key)
+        return versions
+
+    def count(self, counter, delta=1):
+        key = f"{self.prefix}:stats:{counter}"
+        self.backend.add(key, 0, timeout=None)
+        self.backend.incr(key, delta)
+
+    def get(self, key):
+        entry = self.backend.get(key)
+        if (
+            entry is None
+            or self.get_versions(entry["versions"]) != entry["versions"]
+        ):
+            self.count("misses")
+            return None
+        self.count("hits")
+        return entry["data"]
+
+    def set(self, key, data, versions):
+        self.backend.set(
+            key, {"versions": versions, "data": data}, timeout=self.timeout
+        )
+
+    def invalidate(self, namespaces):
+        invalidated = 0
+        for namespace in set(namespaces):
+            try:
+                self.backend.incr(self.version_key(namespace))
+            except ValueError:
+                # версии нет - сохраненные ответы уже не пройдут проверку
+                continue
+            invalidated += 1
+        if invalidated:
+            self.count("invalidations", invalidated)
+
+    def stats(self):
+        values = self.backend.get_many(
+            [f"{self.prefix}:stats:{counter}" for counter in self.counters]
+        )
+        return {
+            counter: values.get(f"{self.prefix}:stats:{counter}", 0)
+            for counter in self.counters
+        }
+
+    def reset_stats(self):
+        self.backend.delete_many(
+            [f"{self.prefix}:stats:{counter}" for counter in self.counters]
+        )
+
+
+shopping_list_cache = ShoppingListCache(
+    alias=settings.SHOPPING_LIST_CACHE_ALIAS,
+    max_size=settings.SHOPPING_LIST_CACHE_MAX_SIZE,
+    timeout=settings.SHOPPING_LIST_CACHE_TIMEOUT,
+)
+
+user_recipe_sets_cache = UserRecipeSetsCache(
+    alias=settings.USER_RECIPE_SETS_CACHE_ALIAS,
+    timeout=settings.USER_RECIPE_SETS_CACHE_TIMEOUT,
+)
+
+recipe_feed_cache = RecipeFeedCache(
+    alias=settings.RECIPE_FEED_CACHE_ALIAS,
+    timeout=settings.RECIPE_FEED_CACHE_TIMEOUT,
+)
@@ -0,0 +1,164 @@
+import csv
+import io
+import json
+
+from django.http import HttpResponse, StreamingHttpResponse
+
+from api.utils import draw_shopping_list_pdf, format_amount
+
+EXPORTERS = {}
+DEFAULT_EXPORT_FORMAT = "pdf"
+
+
+def register_exporter(exporter_class):
+    """Регистрация экспортера списка покупок по его формату."""
+
+    EXPORTERS[exporter_class.format] = exporter_class
+    return exporter_class
+
+
+def get_exporter_class(request):
+    """Выбор экспортера по ?format= или заголовку Accept."""
+
+    export_format = request.query_params.get("format")
+    if export_format:
+        return EXPORTERS.get(export_format)
+
+    for media_range in request.META.get("HTTP_ACCEPT", "").split(","):
+        media_type = media_range.split(";")[0].strip()
+        for exporter_class in EXPORTERS.values():
+            if exporter_class.media_type == media_type:
+                return exporter_class
+
+    return EXPORTERS[DEFAULT_EXPORT_FORMAT]
+
+
+class BaseExporter:
+    """Базовый экспортер списка покупок."""
+
+    format = None
+    media_type = None
+    filename = "shopping_card"
+    cacheable = False
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def get_filename(self):
+        return f"{self.filename}.{self.format}"
+
+    def render(self):
+        raise NotImplementedError
+
+    def document_response(self, document):
+        response = HttpResponse(document, content_type=self.media_type)
+        response["Content-Disposition"] = (
+            f'attachment; filename="{self.get_filename()}"'
+        )
+        return response
+
+    def response(self):
+        return self.document_response(self.render())
+
+
+class StreamingExporter(BaseExporter):
+    """Экспортер текстовых форматов с потоковой отдачей."""
+
+    def stream(self):
+        raise NotImplementedError
+
+    def response(self):
+        response = StreamingHttpResponse(
+            (chunk.encode() for chunk in self.stream()),
+            content_type=f"{self.media_type}; charset=utf-8",
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="{self.get_filename()}"'
+        )
+        return response
+
+
+class EchoBuffer:
+    """Псевдо-буфер, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+@register_exporter
+class CSVExporter(StreamingExporter):
+    format = "csv"
+    media_type = "text/csv"
+
+    def stream(self):
+        writer = csv.writer(EchoBuffer())
+        yield writer.writerow(("name", "measurement_unit", "amount"))
+        for row in self.rows:
+            yield writer.writerow(
+                (
+                    row["ingredient__name"],
+                    row["ingredient__measurement_unit"],
+                    row["total_amount"],
+                )
+            )
+
+
+@register_exporter
+class TXTExporter(StreamingExporter):
+    format = "txt"
+    media_type = "text/plain"
+
+    def stream(self):
+        yield "Ваша продуктовая корзина:\n\n"
+        for row in self.rows:
+            yield f"{row['ingredient__name']}: {format_amount(row)}\n"
+
+
+@register_exporter
+class JSONExporter(StreamingExporter):
+    format = "json"
+    media_type = "application/json"
+
+    def stream(self):
+        separator = ""
+        yield "["
+        for row in self.rows:
+            yield separator + json.dumps(
+                {
+                    "name": row["ingredient__name"],
+                    "measurement_unit": row["ingredient__measurement_unit"],
+                    "amount": row["total_amount"],
+                },
+                ensure_ascii=False,
+            )
+            separator = ","
+        yield "]"
+
+
+@register_exporter
+class PDFExporter(BaseExporter):
+    """ПДФ собирается целиком и кэшируется по хэшу содержимого корзины."""
+
+    format = "pdf"
+    media_type = "application/pdf"
+    cacheable = True
+
+    def render(self):
+        buffer = io.BytesIO()
+        draw_shopping_list_pdf(self.rows, buffer)
+        return buffer.getvalue()
+
+
+class RecipeCatalogueExporter(StreamingExporter):
+    """Выгрузка каталога рецептов в NDJSON, одна запись на строку.
+
+    Не регистрируется среди экспортеров списка покупок.
+    """
+
+    format = "ndjson"
+    media_type = "application/x-ndjson"
+    filename = "recipes"
+
+    def stream(self):
+        for record in self.rows:
+            yield json.dumps(record, ensure_ascii=False) + "\n"
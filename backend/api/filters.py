@@ -1,7 +1,13 @@
 import django_filters
-
+from django.conf import settings
+from django.db import connection
+from django.db.models import (Case, F, FloatField, Func, IntegerField, Value,
+                              When)
+from django.db.models.functions import Length
 from django_filters import rest_framework as filters
-from recipes.models import Favorite, Ingredient, Recipe, ShoppingCard, Tag
+from recipes.models import Ingredient, Recipe, Tag
+
+from api.cache import UserRecipeSets, user_recipe_sets_cache
 
 
 class RecipeSearchFilter(django_filters.FilterSet):
@@ -20,35 +26,50 @@ class RecipeSearchFilter(django_filters.FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         field_name="is_in_shopping_cart", method="filter_is_in_shopping_cart"
     )
+    ordering = filters.ChoiceFilter(
+        choices=(("popular", "popular"), ("trending", "trending")),
+        method="filter_ordering",
+    )
 
-    def filter_is_favorited(self, queryset, name, value):
+    def filter_user_set(self, queryset, kind, value):
+        """Фильтр по избранному/корзине текущего пользователя.
+
+        При стратегии "sets" id берутся из закэшированного множества,
+        если оно не больше USER_RECIPE_SETS_FILTER_LIMIT: длинный список
+        параметров в IN медленнее подзапроса к таблице связей.
+        """
+
+        recipe_ids = None
+        if settings.RECIPE_USER_FLAGS_STRATEGY == "sets":
+            recipe_ids = UserRecipeSets.from_request(self.request).get(kind)
+            if len(recipe_ids) > settings.USER_RECIPE_SETS_FILTER_LIMIT:
+                recipe_ids = None
+        if recipe_ids is None:
+            recipe_ids = (
+                user_recipe_sets_cache.models[kind]
+                .objects.filter(user=self.request.user)
+                .values("recipe_id")
+            )
 
         if value:
-            return queryset.filter(
-                id__in=Favorite.objects.filter(user=self.request.user).values(
-                    "recipe_id"
-                )
-            )
+            return queryset.filter(id__in=recipe_ids)
+        return queryset.exclude(id__in=recipe_ids)
 
-        return queryset.exclude(
-            id__in=Favorite.objects.filter(user=self.request.user).values(
-                "recipe_id"
-            )
-        )
+    def filter_is_favorited(self, queryset, name, value):
+        return self.filter_user_set(queryset, "favorites", value)
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
+        return self.filter_user_set(queryset, "shopping_cart", value)
 
-        if value:
-            return queryset.filter(
-                id__in=ShoppingCard.objects.filter(
-                    user=self.request.user
-                ).values("recipe_id")
-            )
+    @staticmethod
+    def filter_ordering(queryset, name, value):
+        """Сортировка по рейтингу из RecipeRanking, затем по новизне.
 
-        return queryset.exclude(
-            id__in=ShoppingCard.objects.filter(user=self.request.user).values(
-                "recipe_id"
-            )
+        Рейтинг пересчитывается командой update_recipe_ranking.
+        """
+
+        return queryset.order_by(
+            F(f"ranking__{value}").desc(nulls_last=True), "-pub_date", "-id"
         )
 
     class Meta:
@@ -59,11 +80,17 @@ class RecipeSearchFilter(django_filters.FilterSet):
             "is_favorited",
             "author",
             "is_in_shopping_cart",
+            "ordering",
         )
 
 
 class IngredientSearchFilter(filters.FilterSet):
-    """Фильтрация ингредиентов."""
+    """Поиск ингредиентов.
+
+    Сначала идут совпадения по началу названия, затем по подстроке.
+    В PostgreSQL поиск использует индексы pg_trgm, а внутри группы
+    результаты сортируются по триграммному сходству.
+    """
 
     name = filters.CharFilter(field_name="name", method="filter_name")
 
@@ -72,5 +99,54 @@ class IngredientSearchFilter(filters.FilterSet):
         fields = ("name",)
 
     @staticmethod
-    def filter_name(queryset, name, value):
-        return queryset.filter(name__icontains=value.lower())
+    def ranked_ids(queryset, value, limit):
+        ordering = []
+        if connection.vendor == "postgresql":
+            # SIMILARITY из pg_trgm, без зависимости от django.contrib.postgres
+            queryset = queryset.annotate(
+                similarity=Func(
+                    F("name"),
+                    Value(value),
+                    function="SIMILARITY",
+                    output_field=FloatField(),
+                )
+            )
+            ordering.append("-similarity")
+
+        return list(
+            queryset.order_by(*ordering, Length("name"), "name").values_list(
+                "id", flat=True
+            )[:limit]
+        )
+
+    def filter_name(self, queryset, name, value):
+        """Группы ищутся отдельными запросами под свои индексы: по началу
+        названия - text_pattern_ops, по подстроке - pg_trgm. Второй
+        запрос нужен, только если первых совпадений меньше лимита.
+        """
+
+        value = value.lower()
+        limit = settings.INGREDIENT_SEARCH_LIMIT
+        ids = self.ranked_ids(
+            queryset.filter(name__istartswith=value), value, limit
+        )
+        if len(ids) < limit:
+            ids += self.ranked_ids(
+                queryset.filter(name__icontains=value).exclude(
+                    name__istartswith=value
+                ),
+                value,
+                limit - len(ids),
+            )
+        if not ids:
+            return queryset.none()
+
+        return queryset.filter(id__in=ids).order_by(
+            Case(
+                *(
+                    When(id=ingredient_id, then=Value(position))
+                    for position, ingredient_id in enumerate(ids)
+                ),
+                output_field=IntegerField(),
+            )
+        )
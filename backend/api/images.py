@@ -0,0 +1,216 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from PIL import Image, UnidentifiedImageError
+from rest_framework import serializers
+
+from api.cache import recipe_feed_cache
+from recipes.models import Recipe
+from recipes.utils import delete_media_file
+
+logger = logging.getLogger(__name__)
+
+# форматы Pillow, принимаемые в картинках рецептов
+IMAGE_EXTENSIONS = {"PNG": "png", "JPEG": "jpg", "GIF": "gif", "WEBP": "webp"}
+IMAGE_SIGNATURE_SIZE = 12
+
+
+def detect_format(header):
+    """Формат картинки по сигнатуре первых байт файла."""
+
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "PNG"
+    if header.startswith(b"\xff\xd8\xff"):
+        return "JPEG"
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return "GIF"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "WEBP"
+    return None
+
+
+def variant_name(name, width):
+    """photos/2023/01/01/image.png -> photos/2023/01/01/image_320w.webp"""
+
+    path = PurePosixPath(name)
+    return str(path.with_name(f"{path.stem}_{width}w.webp"))
+
+
+def ready_variants(recipe):
+    """Готовые варианты текущей картинки рецепта или None."""
+
+    variants = recipe.image_variants or {}
+    if not recipe.image or variants.get("source") != recipe.image.name:
+        return None
+    return variants
+
+
+def delete_variants(variants):
+    for width in (variants or {}).get("widths", ()):
+        delete_media_file(variant_name(variants["source"], width))
+
+
+def render_variants(name):
+    """Уменьшенные WebP-копии картинки для ширин RECIPE_IMAGE_WIDTHS.
+
+    Картинка читается из хранилища потоком; ширины не меньше исходной
+    пропускаются. Возвращает ширину оригинала и сохраненные ширины.
+    """
+
+    with default_storage.open(name) as file, Image.open(file) as image:
+        original_width = image.width
+        # JPEG декодируется сразу в уменьшенном масштабе
+        image.draft("RGB", (max(settings.RECIPE_IMAGE_WIDTHS),) * 2)
+        # прозрачность бывает альфа-каналом (RGBA, LA) или цветом в
+        # палитре/tRNS (P, L, RGB) - второй случай теряется без RGBA
+        mode = (
+            "RGBA"
+            if "A" in image.getbands() or "transparency" in image.info
+            else "RGB"
+        )
+        if image.mode != mode:
+            image = image.convert(mode)
+
+        widths = []
+        for width in sorted(settings.RECIPE_IMAGE_WIDTHS):
+            if width >= original_width:
+                break
+            height = round(image.height * width / image.width)
+            variant = image.resize((width, height), Image.LANCZOS)
+            content = ContentFile(b"")
+            variant.save(
+                content, "WEBP", quality=settings.RECIPE_IMAGE_QUALITY
+            )
+            target = variant_name(name, width)
+            default_storage.delete(target)
+            default_storage.save(target, content)
+            widths.append(width)
+    return original_width, widths
+
+
+def process_recipe_image(recipe_id, name):
+    """Генерация вариантов и их публикация в Recipe.image_variants.
+
+    Запись делается, только если картинка рецепта не сменилась за время
+    обработки; варианты прошлой картинки удаляются.
+    """
+
+    previous = (
+        Recipe.objects.filter(id=recipe_id, image=name)
+        .values_list("image_variants", flat=True)
+        .first()
+    )
+    if previous is None:
+        return
+
+    try:
+        width, widths = render_variants(name)
+    except FileNotFoundError:
+        logger.warning("Картинка %s не найдена", name)
+        return
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        logger.exception("Не удалось обработать картинку %s", name)
+        return
+
+    variants = {"source": name, "width": width, "widths": widths}
+    updated = Recipe.objects.filter(id=recipe_id, image=name).update(
+        image_variants=variants
+    )
+    if not updated:
+        delete_variants(variants)
+        return
+    if previous.get("source") != name:
+        delete_variants(previous)
+    recipe_feed_cache.invalidate((f"recipe:{recipe_id}",))
+
+
+class ImageVariantWorker:
+    """Фоновая генерация вариантов картинок в пуле потоков.
+
+    Очередь локальная и ограничена RECIPE_IMAGE_QUEUE_SIZE задачами:
+    при переполнении задача отбрасывается, а рецепт продолжает отдавать
+    оригинал до запуска команды generate_image_variants. При
+    RECIPE_IMAGE_WORKERS = 0 обработка идет синхронно.
+    """
+
+    def __init__(self, queue_size):
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._lock = threading.Lock()
+
+    @property
+    def workers(self):
+        return settings.RECIPE_IMAGE_WORKERS
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="image-variants",
+                )
+            return self._executor
+
+    def submit(self, recipe_id, name):
+        if not self.workers:
+            process_recipe_image(recipe_id, name)
+            return True
+
+        if not self._slots.acquire(blocking=False):
+            logger.warning("Очередь картинок переполнена: %s", name)
+            return False
+        future = self.executor.submit(self.run, recipe_id, name)
+        future.add_done_callback(lambda _: self._slots.release())
+        return True
+
+    @staticmethod
+    def run(recipe_id, name):
+        try:
+            process_recipe_image(recipe_id, name)
+        finally:
+            close_old_connections()
+
+
+class ImageSrcsetField(serializers.Field):
+    """srcset картинки рецепта: готовые варианты или оригинал."""
+
+    def __init__(self, **kwargs):
+        kwargs["source"] = "*"
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        if not recipe.image:
+            return ""
+
+        request = self.context.get("request")
+
+        def url(name):
+            if request is None:
+                return default_storage.url(name)
+            return request.build_absolute_uri(default_storage.url(name))
+
+        variants = ready_variants(recipe)
+        if variants is None:
+            return url(recipe.image.name)
+        return ", ".join(
+            (
+                *(
+                    f"{url(variant_name(recipe.image.name, width))} {width}w"
+                    for width in variants["widths"]
+                ),
+                f"{url(recipe.image.name)} {variants['width']}w",
+            )
+        )
+
+
+image_variant_worker = ImageVariantWorker(
+    queue_size=settings.RECIPE_IMAGE_QUEUE_SIZE
+)
@@ -0,0 +1,272 @@
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from core.utils import chunked
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, transaction
+from pydantic import ValidationError
+from recipes.counters import change_counter
+from recipes.management.importers import ImportStats
+from recipes.management.parsers import RecipeParsed
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users import feed
+
+from api.cache import recipe_feed_cache
+from api.images import (IMAGE_EXTENSIONS, IMAGE_SIGNATURE_SIZE, detect_format,
+                        image_variant_worker)
+
+User = get_user_model()
+
+
+class RecipeImporter:
+    """Пакетный импорт рецептов из записей NDJSON.
+
+    Каждая пачка проверяется несколькими запросами на всю пачку (авторы,
+    теги, ингредиенты, существующие рецепты) и пишется через bulk_create
+    в своей транзакции: ошибка записи откатывает только эту пачку.
+    Записи с ошибками попадают в errors, уже существующие рецепты
+    (та же пара название + автор) пропускаются.
+
+    bulk_create не вызывает сигналы, поэтому счетчики авторов и
+    материализованные ленты обновляются в той же транзакции, а варианты
+    картинок (on_image) и сброс кэша ленты запускаются после ее фиксации.
+    """
+
+    def __init__(
+        self,
+        batch_size=100,
+        dry_run=False,
+        default_author=None,
+        images_dir=None,
+        on_progress=None,
+        on_image=image_variant_worker.submit,
+    ):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.default_author = default_author
+        self.images_dir = Path(images_dir) if images_dir else None
+        self.on_progress = on_progress
+        self.on_image = on_image
+        self.stats = ImportStats()
+        self.errors = []
+        self._seen = set()
+        self._image_field = Recipe._meta.get_field("image")
+
+    def run(self, records, file_path=None):
+        started = time.perf_counter()
+        for batch in chunked(enumerate(records, 1), self.batch_size):
+            self.import_batch(batch, file_path)
+            self.stats.elapsed = time.perf_counter() - started
+            if self.on_progress is not None:
+                self.on_progress(self.stats)
+
+        if self.stats.inserted:
+            recipe_feed_cache.invalidate(("global",))
+        self.stats.elapsed = time.perf_counter() - started
+        return self.stats
+
+    def parse(self, batch, file_path):
+        parsed = []
+        for line, record in batch:
+            try:
+                recipe = RecipeParsed.parse_obj(record)
+            except ValidationError as error:
+                self.add_error(
+                    file_path,
+                    line,
+                    record,
+                    [
+                        f"{'.'.join(map(str, item['loc']))}: {item['msg']}"
+                        for item in error.errors()
+                    ],
+                )
+                continue
+            if recipe.author is None:
+                recipe.author = self.default_author
+            parsed.append((line, record, recipe))
+        return parsed
+
+    def add_error(self, file_path, line, record, messages):
+        self.errors.append((file_path, line, record, messages))
+        self.stats.failed += 1
+
+    def resolve_image(self, name, copied):
+        """Копия картинки из хранилища или images_dir под новым именем
+        по upload_to: у каждого рецепта свой файл, и удаление или замена
+        картинки одного рецепта не задевает другие.
+        """
+
+        if default_storage.exists(name):
+            source = default_storage.open(name)
+        elif self.images_dir is not None and (
+            self.images_dir / name
+        ).is_file():
+            source = open(self.images_dir / name, "rb")
+        else:
+            return None
+
+        with source as file:
+            image_format = detect_format(file.read(IMAGE_SIGNATURE_SIZE))
+            if image_format is None:
+                return None
+            if self.dry_run:
+                return name
+            file.seek(0)
+            stored = default_storage.save(
+                self._image_field.generate_filename(
+                    None,
+                    f"{uuid.uuid4().hex}.{IMAGE_EXTENSIONS[image_format]}",
+                ),
+                File(file),
+            )
+        copied.append(stored)
+        return stored
+
+    def load_lookups(self, parsed):
+        """Авторы, теги, ингредиенты и существующие рецепты пачки."""
+
+        authors = User.objects.in_bulk(
+            {recipe.author for _, _, recipe in parsed if recipe.author},
+            field_name="username",
+        )
+        tags = Tag.objects.in_bulk(
+            {slug for _, _, recipe in parsed for slug in recipe.tags},
+            field_name="slug",
+        )
+        ingredients = {
+            (ingredient.name, ingredient.measurement_unit): ingredient
+            for ingredient in Ingredient.objects.filter(
+                name__in={
+                    ingredient.name
+                    for _, _, recipe in parsed
+                    for ingredient in recipe.ingredients
+                }
+            )
+        }
+        existing = set(
+            Recipe.objects.filter(
+                author__in=authors.values(),
+                name__in={recipe.name for _, _, recipe in parsed},
+            ).values_list("name", "author_id")
+        )
+        return authors, tags, ingredients, existing
+
+    @staticmethod
+    def check_references(recipe, authors, tags, ingredients):
+        messages = []
+        if recipe.author not in authors:
+            messages.append(f"Автор не найден: {recipe.author}")
+
+        missing_tags = [slug for slug in recipe.tags if slug not in tags]
+        if missing_tags:
+            messages.append(f"Теги не найдены: {', '.join(missing_tags)}")
+
+        missing_ingredients = [
+            f"{ingredient.name} ({ingredient.measurement_unit})"
+            for ingredient in recipe.ingredients
+            if (ingredient.name, ingredient.measurement_unit)
+            not in ingredients
+        ]
+        if missing_ingredients:
+            messages.append(
+                "Ингредиенты не найдены: " + ", ".join(missing_ingredients)
+            )
+        return messages
+
+    def select_valid(self, parsed, lookups, file_path, copied):
+        """Новые рецепты пачки с найденными связями и картинкой."""
+
+        authors, tags, ingredients, existing = lookups
+        for line, record, recipe in parsed:
+            messages = self.check_references(
+                recipe, authors, tags, ingredients
+            )
+            if messages:
+                self.add_error(file_path, line, record, messages)
+                continue
+
+            author = authors[recipe.author]
+            key = (recipe.name, author.id)
+            if key in existing or key in self._seen:
+                self.stats.skipped += 1
+                continue
+
+            image = self.resolve_image(recipe.image, copied)
+            if image is None:
+                self.add_error(
+                    file_path,
+                    line,
+                    record,
+                    [f"Картинка не найдена: {recipe.image}"],
+                )
+                continue
+
+            self._seen.add(key)
+            yield line, record, recipe, author, image
+
+    def import_batch(self, batch, file_path):
+        self.stats.total += len(batch)
+        parsed = self.parse(batch, file_path)
+        lookups = self.load_lookups(parsed)
+
+        copied = []
+        valid = list(self.select_valid(parsed, lookups, file_path, copied))
+        self.stats.valid += len(valid)
+        if self.dry_run or not valid:
+            return
+
+        _, tags, ingredients, _ = lookups
+        try:
+            recipes = self.write(valid, tags, ingredients)
+        except DatabaseError as error:
+            for name in copied:
+                default_storage.delete(name)
+            for line, record, recipe, author, _ in valid:
+                self._seen.discard((recipe.name, author.id))
+                self.add_error(file_path, line, record, [str(error)])
+            self.stats.valid -= len(valid)
+            return
+
+        self.stats.inserted += len(recipes)
+        for recipe in recipes:
+            self.on_image(recipe.id, recipe.image.name)
+
+    @transaction.atomic
+    def write(self, valid, tags, ingredients):
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                name=recipe.name,
+                text=recipe.text,
+                cooking_time=recipe.cooking_time,
+                author=author,
+                image=image,
+            )
+            for _, _, recipe, author, image in valid
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=instance,
+                ingredient=ingredients[
+                    (ingredient.name, ingredient.measurement_unit)
+                ],
+                amount=ingredient.amount,
+            )
+            for instance, (_, _, recipe, _, _) in zip(recipes, valid)
+            for ingredient in recipe.ingredients
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=instance.id, tag_id=tags[slug].id)
+            for instance, (_, _, recipe, _, _) in zip(recipes, valid)
+            for slug in dict.fromkeys(recipe.tags)
+        )
+
+        for author_id, count in Counter(
+            recipe.author_id for recipe in recipes
+        ).items():
+            change_counter(User, author_id, "recipes_count", count)
+        feed.add_new_recipes(recipes)
+        return recipes
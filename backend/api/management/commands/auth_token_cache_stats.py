@@ -0,0 +1,42 @@
+from django.core.management import BaseCommand
+from django.utils.translation import gettext_lazy as _
+
+from api.authentication import auth_token_cache
+
+
+class Command(BaseCommand):
+    """Счетчики кэша снимков пользователей по токену."""
+
+    help = _("Show auth token cache hit rate and time saved per request.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help=_("Reset counters after showing them"),
+        )
+
+    def handle(self, *args, **options):
+        auth_token_cache.flush_stats()
+        stats = auth_token_cache.stats()
+        hits = stats["local_hits"] + stats["shared_hits"]
+        requests = hits + stats["misses"]
+        hit_rate = hits / requests if requests else 0
+        hit_ms = stats["hit_time_us"] / hits / 1000 if hits else 0
+        miss_ms = (
+            stats["miss_time_us"] / stats["misses"] / 1000
+            if stats["misses"]
+            else 0
+        )
+
+        for counter, value in stats.items():
+            self.stdout.write(f"{counter}: {value}")
+        self.stdout.write(f"hit rate: {hit_rate:.1%}")
+        self.stdout.write(f"avg hit: {hit_ms:.3f} ms, miss: {miss_ms:.3f} ms")
+        if hits and stats["misses"]:
+            self.stdout.write(
+                f"saved per request: {(miss_ms - hit_ms) * hit_rate:.3f} ms"
+            )
+
+        if options["reset"]:
+            auth_token_cache.reset_stats()
@@ -0,0 +1,40 @@
+from django.core.management import BaseCommand
+from django.utils.translation import gettext_lazy as _
+from recipes.management.exporters import recipe_records
+
+from api.exporters import RecipeCatalogueExporter
+
+
+class Command(BaseCommand):
+    """Выгрузка всех рецептов в NDJSON для import_recipes."""
+
+    help = _("Export all recipes to NDJSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output", help=_("Output file (stdout by default)")
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help=_("Recipes read per query"),
+        )
+
+    def handle(self, *args, **options):
+        lines = RecipeCatalogueExporter(
+            recipe_records(options["batch_size"])
+        ).stream()
+        if not options["output"]:
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+
+        count = 0
+        with open(options["output"], "w", encoding="UTF-8") as file:
+            for line in lines:
+                file.write(line)
+                count += 1
+        self.stdout.write(
+            self.style.SUCCESS(_("Exported recipes: {}").format(count))
+        )
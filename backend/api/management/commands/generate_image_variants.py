@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.utils.translation import gettext_lazy as _
+from recipes.models import Recipe
+
+from api.images import ImageVariantWorker, ready_variants
+
+
+class Command(BaseCommand):
+    """Генерация недостающих вариантов картинок рецептов.
+
+    Нужна после импорта рецептов в обход сигналов, смены
+    RECIPE_IMAGE_WIDTHS и при переполнении очереди фоновой обработки.
+    """
+
+    help = _("Generate missing resized image variants for recipes.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=max(settings.RECIPE_IMAGE_WORKERS, 1),
+            help=_("Images processed in parallel"),
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help=_("Regenerate variants of every recipe"),
+        )
+
+    def handle(self, *args, **options):
+        recipes = [
+            (recipe.id, recipe.image.name)
+            for recipe in Recipe.objects.exclude(image="").only(
+                "id", "image", "image_variants"
+            ).iterator()
+            if options["all"] or ready_variants(recipe) is None
+        ]
+
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            for recipe_id, name in recipes:
+                executor.submit(ImageVariantWorker.run, recipe_id, name)
+
+        self.stdout.write(
+            self.style.SUCCESS(_("Processed images: {}").format(len(recipes)))
+        )
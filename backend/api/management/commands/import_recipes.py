@@ -0,0 +1,103 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.utils.translation import gettext_lazy as _
+from recipes.management.parsers import read_jsonl, read_lines
+
+from api.images import ImageVariantWorker
+from api.importers import RecipeImporter
+
+
+class Command(BaseCommand):
+    """Пакетный импорт рецептов из NDJSON (одна запись на строку).
+
+    Формат записи совпадает с выгрузкой export_recipes. Варианты
+    картинок новых рецептов генерируются в пуле команды, а не в
+    ограниченной очереди воркера приложения.
+    """
+
+    help = _("Import recipes from an NDJSON file.")
+    errors_to_show = 10
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "filename", help=_("NDJSON file, '-' to read from stdin")
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help=_("Recipes written per transaction"),
+        )
+        parser.add_argument(
+            "--author",
+            help=_("Username of the author for records without one"),
+        )
+        parser.add_argument(
+            "--images-dir",
+            help=_(
+                "Directory with image files for records whose image is "
+                "not in the media storage yet"
+            ),
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=max(settings.RECIPE_IMAGE_WORKERS, 1),
+            help=_("Images processed in parallel"),
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help=_("Only validate the records, do not write to the DB"),
+        )
+
+    def handle(self, *args, **options):
+        if options["filename"] == "-":
+            records = read_lines(sys.stdin)
+        else:
+            records = read_jsonl(options["filename"])
+
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            importer = RecipeImporter(
+                batch_size=options["batch_size"],
+                dry_run=options["dry_run"],
+                default_author=options["author"],
+                images_dir=options["images_dir"],
+                on_progress=self.report_progress,
+                on_image=lambda recipe_id, name: executor.submit(
+                    ImageVariantWorker.run, recipe_id, name
+                ),
+            )
+            try:
+                stats = importer.run(records, options["filename"])
+            except (FileNotFoundError, UnicodeDecodeError) as error:
+                raise CommandError(str(error))
+
+        self.report_errors(importer.errors)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Импорт завершен за {stats.elapsed:.2f} с: "
+                f"всего {stats.total}, корректных {stats.valid}, "
+                f"добавлено {stats.inserted}, пропущено {stats.skipped}, "
+                f"с ошибками {stats.failed}"
+            )
+        )
+
+    def report_progress(self, stats):
+        self.stdout.write(
+            f"Обработано записей: {stats.total} ({stats.rate:.0f} записей/с)"
+        )
+
+    def report_errors(self, errors):
+        for file_path, line, record, messages in errors[: self.errors_to_show]:
+            name = record.get("name") if isinstance(record, dict) else None
+            self.stdout.write(
+                f"{file_path}, запись {line} ({name}): {'; '.join(messages)}"
+            )
+        if len(errors) > self.errors_to_show:
+            self.stdout.write(
+                f"... и еще {len(errors) - self.errors_to_show} ошибок"
+            )
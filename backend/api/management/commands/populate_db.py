@@ -0,0 +1,196 @@
+import glob
+import os
+from itertools import chain
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.utils.translation import gettext_lazy as _
+from recipes.management.importers import IngredientImporter
+from recipes.management.parsers import read_csv, read_json, read_jsonl
+
+from api.search import ingredient_index
+
+
+class Command(BaseCommand):
+    """Заполнение БД из CSV/JSON/JSON Lines файлов."""
+
+    help = _("Populate db via CSV/JSON files.")
+
+    data_path = settings.BASE_DIR / "backend_static" / "data"
+    default_filename = "ingredients"
+    default_batch_size = 1000
+    readers = {"csv": read_csv, "json": read_json, "jsonl": read_jsonl}
+    errors_to_show = 10
+
+    def add_arguments(self, parser):
+        """Добавление путей и типа файлов."""
+
+        parser.add_argument(
+            "filenames",
+            nargs="*",
+            type=str,
+            default=[self.default_filename],
+            help=_(
+                "Files, directories or glob patterns relative to "
+                "backend_static/data"
+            ),
+        )
+        parser.add_argument(
+            "--csv", action="store_true", help=_("Choose it for .csv")
+        )
+        parser.add_argument(
+            "--json", action="store_true", help=_("Choose it for .json")
+        )
+        parser.add_argument(
+            "--jsonl",
+            action="store_true",
+            help=_("Choose it for .jsonl (JSON Lines)"),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=self.default_batch_size,
+            help=_("Rows per bulk insert"),
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help=_("Processes parsing files in parallel"),
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help=_("Only validate the files, do not write to the DB"),
+        )
+
+    def handle(self, *args, **options):
+        """Основной обработчик консольной команды."""
+
+        formats = [
+            file_format
+            for file_format in self.readers
+            if options[file_format]
+        ]
+
+        if len(formats) > 1:
+            self.stdout.write(
+                "Выберите только 1 формат (--csv, --json или --jsonl)"
+            )
+            return
+
+        if not formats:
+            self.stdout.write(
+                "Выберите хотя бы 1 формат (--csv, --json или --jsonl)"
+            )
+            return
+
+        file_format = formats[0]
+        reader = self.readers[file_format]
+
+        importer = IngredientImporter(
+            batch_size=options["batch_size"],
+            dry_run=options["dry_run"],
+            on_progress=self.report_progress,
+        )
+
+        try:
+            file_paths = self.resolve_paths(options["filenames"], file_format)
+            if options["workers"] > 1 and len(file_paths) > 1:
+                stats = importer.run_shards(
+                    file_paths, reader, options["workers"]
+                )
+            elif len(file_paths) == 1:
+                stats = importer.run(reader(file_paths[0]), file_paths[0])
+            else:
+                stats = importer.run(
+                    chain.from_iterable(map(reader, file_paths))
+                )
+        except FileNotFoundError as e:
+            self.stdout.write(
+                f"По указанному пути {self.data_path} отсутствует файл {e}"
+            )
+            return
+        except Exception as e:
+            self.stdout.write(str(e))
+            self.stdout.write("Проверьте правильность заполнения файла.")
+            return
+
+        if not options["dry_run"]:
+            ingredient_index.invalidate()
+
+        self.report_errors(importer.errors)
+        self.report_stats(stats, options["dry_run"])
+
+    def resolve_paths(self, patterns, file_format):
+        """Файлы по именам, папкам и glob-шаблонам."""
+
+        file_paths = []
+        for pattern in patterns:
+            path = self.data_path / pattern
+
+            if any(char in pattern for char in "*?["):
+                matches = sorted(
+                    match
+                    for match in glob.glob(str(path), recursive=True)
+                    if not os.path.isdir(match)
+                )
+            elif path.is_dir():
+                matches = sorted(
+                    str(match) for match in path.glob(f"*.{file_format}")
+                )
+            elif path.is_file():
+                matches = [str(path)]
+            elif path.with_name(f"{path.name}.{file_format}").is_file():
+                matches = [str(path.with_name(f"{path.name}.{file_format}"))]
+            else:
+                matches = []
+
+            if not matches:
+                raise FileNotFoundError(pattern)
+            file_paths.extend(matches)
+
+        return list(dict.fromkeys(file_paths))
+
+    def report_progress(self, stats):
+        self.stdout.write(
+            f"Обработано строк: {stats.total} "
+            f"({stats.rate:.0f} строк/с)"
+        )
+
+    def report_errors(self, errors):
+        for file_path, line, record, messages in errors[: self.errors_to_show]:
+            location = f"{file_path}, строка {line}" if file_path else line
+            self.stdout.write(f"{location}: {record} - {'; '.join(messages)}")
+        if len(errors) > self.errors_to_show:
+            self.stdout.write(
+                f"... и еще {len(errors) - self.errors_to_show} ошибок"
+            )
+
+    def report_stats(self, stats, dry_run):
+        for shard in sorted(stats.shards, key=lambda shard: shard.file_path):
+            self.stdout.write(
+                f"{shard.file_path}: {shard.total} строк, "
+                f"разбор {shard.elapsed:.2f} с"
+            )
+        self.stdout.write(
+            "Этапы: "
+            + ", ".join(
+                f"{stage} {elapsed:.2f} с"
+                for stage, elapsed in stats.stages.items()
+            )
+        )
+
+        if dry_run:
+            self.stdout.write(
+                f"Проверка завершена: всего {stats.total}, "
+                f"корректных {stats.valid}, с ошибками {stats.failed}"
+            )
+            return
+
+        self.stdout.write(
+            f"Загрузка завершена за {stats.elapsed:.2f} с "
+            f"({stats.rate:.0f} строк/с): всего {stats.total}, "
+            f"добавлено {stats.inserted}, пропущено {stats.skipped}, "
+            f"с ошибками {stats.failed}"
+        )
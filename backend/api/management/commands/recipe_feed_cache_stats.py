@@ -0,0 +1,29 @@
+from django.core.management import BaseCommand
+from django.utils.translation import gettext_lazy as _
+
+from api.cache import recipe_feed_cache
+
+
+class Command(BaseCommand):
+    """Счетчики кэша ленты рецептов для анонимных пользователей."""
+
+    help = _("Show recipe feed cache hits, misses and invalidations.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help=_("Reset counters after showing them"),
+        )
+
+    def handle(self, *args, **options):
+        stats = recipe_feed_cache.stats()
+        requests = stats["hits"] + stats["misses"]
+        hit_rate = stats["hits"] / requests if requests else 0
+
+        for counter, value in stats.items():
+            self.stdout.write(f"{counter}: {value}")
+        self.stdout.write(f"hit rate: {hit_rate:.1%}")
+
+        if options["reset"]:
+            recipe_feed_cache.reset_stats()
@@ -0,0 +1,37 @@
+from django.core.management import BaseCommand
+from django.utils.translation import gettext_lazy as _
+from recipes.ranking import rebuild_rankings, update_rankings
+
+from api.cache import recipe_feed_cache
+
+
+class Command(BaseCommand):
+    """Пересчет рейтинга рецептов для ?ordering=popular|trending.
+
+    Запускается по расписанию: часто - для свертки новых событий,
+    изредка с --full - чтобы убрать накопленную погрешность.
+    """
+
+    help = _("Apply new favorite/cart events to the recipe ranking.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help=_("Rebuild the ranking from favorites and carts"),
+        )
+
+    def handle(self, *args, **options):
+        if options["full"]:
+            rankings = rebuild_rankings()
+            self.stdout.write(_("Rebuilt rankings: {}").format(rankings))
+        else:
+            events, rankings = update_rankings()
+            self.stdout.write(
+                _("Applied events: {}, updated rankings: {}").format(
+                    events, rankings
+                )
+            )
+            if not events:
+                return
+        recipe_feed_cache.invalidate(("ranking",))
@@ -1,4 +1,59 @@
+import base64
+import hashlib
+import json
+from datetime import datetime
+
+from core.utils import chunked
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import InvalidPage, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
 from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def estimate_count(queryset):
+    """Приблизительное кол-во объектов без COUNT(*) на каждый запрос.
+
+    Для выборки без фильтров в PostgreSQL берется статистика
+    pg_class.reltuples, в остальных случаях точный COUNT(*) кэшируется
+    на RECIPE_COUNT_CACHE_TIMEOUT секунд.
+    """
+
+    connection = connections[queryset.db]
+    if connection.vendor == "postgresql" and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class "
+                "WHERE oid = %s::regclass",
+                (queryset.model._meta.db_table,),
+            )
+            row = cursor.fetchone()
+        if row is not None and row[0] >= 0:
+            return row[0]
+
+    sql, params = queryset.order_by().values("pk").query.sql_with_params()
+    key = hashlib.sha256(f"{sql}{params}".encode()).hexdigest()
+    return cache.get_or_set(
+        f"count:{key}",
+        queryset.count,
+        timeout=settings.RECIPE_COUNT_CACHE_TIMEOUT,
+    )
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор с приблизительным кол-вом объектов."""
+
+    @cached_property
+    def count(self):
+        return estimate_count(self.object_list)
 
 
 class CustomPagination(pagination.PageNumberPagination):
@@ -7,3 +62,246 @@ class CustomPagination(pagination.PageNumberPagination):
     page_size = 6
     page_size_query_param = "page_size"
     max_page_size = 10000
+
+
+class RecipePagination(CustomPagination):
+    """Пагинация рецептов.
+
+    По умолчанию - по номеру страницы. С параметром ?cursor= включается
+    пагинация по курсору (keyset) по упорядочиванию (-pub_date, -id),
+    без OFFSET. Параметр ?count=estimate заменяет точный COUNT(*)
+    оценкой в обоих режимах. Формат ответа одинаковый. При сортировке
+    по рейтингу (?ordering=) курсор не поддерживается и используются
+    номера страниц.
+    """
+
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    ordering_query_param = "ordering"
+    # поля ключа (дата, id) для пагинации по курсору
+    cursor_fields = ("pub_date", "id")
+    invalid_cursor_message = _("Неверный курсор")
+
+    def setup(self, request):
+        self.request = request
+        self.estimate = (
+            request.query_params.get(self.count_query_param) == "estimate"
+        )
+        self.cursor_mode = (
+            self.cursor_query_param in request.query_params
+            and not request.query_params.get(self.ordering_query_param)
+        )
+        if self.estimate:
+            self.django_paginator_class = EstimatedCountPaginator
+
+    @property
+    def ordering(self):
+        return tuple(f"-{field}" for field in self.cursor_fields)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.setup(request)
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+        return list(self.iterate_cursor_page(queryset, request))
+
+    def cursor_page_queryset(self, queryset, request):
+        """Выборка страницы по курсору в порядке ordering.
+
+        Для перехода назад сначала читаются только ключи (дата, id)
+        страницы, а сами объекты выбираются в прямом порядке, чтобы
+        страницу можно было отдавать потоком без разворота в памяти.
+        Если has_next неизвестен, в выборку входит лишний объект.
+        """
+
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(
+            request.query_params.get(self.cursor_query_param)
+        )
+        self.count = (
+            estimate_count(queryset) if self.estimate else queryset.count()
+        )
+        self.has_next = None
+        queryset = queryset.order_by(*self.ordering)
+
+        if cursor is None:
+            self.has_previous = False
+            return queryset[: page_size + 1]
+
+        date_field, id_field = self.cursor_fields
+        date, pk, reverse = cursor
+        if not reverse:
+            self.has_previous = True
+            return queryset.filter(
+                Q(**{f"{date_field}__lt": date})
+                | Q(**{date_field: date, f"{id_field}__lt": pk})
+            )[: page_size + 1]
+
+        keys = list(
+            queryset.filter(
+                Q(**{f"{date_field}__gt": date})
+                | Q(**{date_field: date, f"{id_field}__gt": pk})
+            )
+            .order_by(*self.cursor_fields)
+            .values_list(*self.cursor_fields)[: page_size + 1]
+        )
+        self.has_next = True
+        self.has_previous = len(keys) > page_size
+        keys = keys[:page_size]
+        if not keys:
+            return queryset.none()
+
+        newest_date, newest_id = keys[-1]
+        return queryset.filter(
+            Q(**{f"{date_field}__lt": newest_date})
+            | Q(**{date_field: newest_date, f"{id_field}__lte": newest_id})
+        )[: len(keys)]
+
+    def iterate_cursor_page(self, queryset, request, chunk_size=None):
+        page_size = self.get_page_size(request)
+        page_queryset = self.cursor_page_queryset(queryset, request)
+        if chunk_size is not None:
+            page_queryset = page_queryset.iterator(chunk_size=chunk_size)
+
+        self.first = self.last = None
+        return self.take_cursor_page(page_queryset, page_size)
+
+    def take_cursor_page(self, page_queryset, page_size):
+        for position, recipe in enumerate(page_queryset):
+            if position == page_size:
+                self.has_next = True
+                break
+            if self.first is None:
+                self.first = recipe
+            self.last = recipe
+            yield recipe
+
+        if self.has_next is None:
+            self.has_next = False
+
+    def encode_cursor(self, recipe, reverse=False):
+        date_field, id_field = self.cursor_fields
+        position = json.dumps(
+            (
+                getattr(recipe, date_field).isoformat(),
+                getattr(recipe, id_field),
+                reverse,
+            )
+        )
+        return base64.urlsafe_b64encode(position.encode()).decode()
+
+    def decode_cursor(self, encoded):
+        if not encoded:
+            return None
+        try:
+            date, pk, reverse = json.loads(
+                base64.urlsafe_b64decode(encoded.encode())
+            )
+            return datetime.fromisoformat(date), int(pk), bool(reverse)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_cursor_link(self, recipe, reverse=False):
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(recipe, reverse)
+        )
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if not self.has_next or self.last is None:
+            return None
+        return self.get_cursor_link(self.last)
+
+    def get_previous_link(self):
+        if not self.cursor_mode:
+            return super().get_previous_link()
+        if not self.has_previous or self.first is None:
+            return None
+        return self.get_cursor_link(self.first, reverse=True)
+
+    def get_count(self):
+        if self.cursor_mode:
+            return self.count
+        return self.page.paginator.count
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response(
+            {
+                "count": self.get_count(),
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def is_streaming(self, request):
+        return self.get_page_size(request) > settings.RECIPE_STREAM_PAGE_SIZE
+
+    def stream_queryset(self, queryset, request):
+        """Объекты страницы серверным курсором, блоками по chunk_size."""
+
+        self.setup(request)
+        chunk_size = settings.RECIPE_STREAM_CHUNK_SIZE
+        if self.cursor_mode:
+            return self.iterate_cursor_page(queryset, request, chunk_size)
+
+        paginator = self.django_paginator_class(
+            queryset, self.get_page_size(request)
+        )
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(
+                    page_number=page_number, message=str(exc)
+                )
+            )
+        return self.page.object_list.iterator(chunk_size=chunk_size)
+
+    def get_streaming_response(self, objects, serialize):
+        """Ответ в обычном формате, отдаваемый по частям.
+
+        Результаты сериализуются блоками функцией serialize. Ссылки
+        next/previous в режиме курсора известны только после последнего
+        объекта, поэтому идут в конце ответа.
+        """
+
+        return StreamingHttpResponse(
+            self.stream_envelope(objects, serialize),
+            content_type="application/json",
+        )
+
+    def stream_envelope(self, objects, serialize):
+        yield f'{{"count": {json.dumps(self.get_count())}, "results": ['
+        separator = ""
+        for chunk in chunked(objects, settings.RECIPE_STREAM_CHUNK_SIZE):
+            for item in serialize(chunk):
+                yield separator + json.dumps(
+                    item, cls=JSONEncoder, ensure_ascii=False
+                )
+                separator = ", "
+        yield (
+            f'], "next": {json.dumps(self.get_next_link())}, '
+            f'"previous": {json.dumps(self.get_previous_link())}}}'
+        )
+
+
+class SubscriptionFeedPagination(RecipePagination):
+    """Лента подписок: всегда по курсору и с оценкой кол-ва.
+
+    Ключ (feed_date, feed_id) аннотируется выборкой ленты, см. users.feed.
+    """
+
+    cursor_fields = ("feed_date", "feed_id")
+
+    def setup(self, request):
+        super().setup(request)
+        self.cursor_mode = True
+        self.estimate = True
+        self.django_paginator_class = EstimatedCountPaginator
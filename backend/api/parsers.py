@@ -0,0 +1,34 @@
+import codecs
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from recipes.management.parsers import read_lines
+
+
+class NDJSONParser(BaseParser):
+    """Потоковый разбор NDJSON: тело читается построчно по мере обработки
+    записей. Строки с некорректным JSON возвращаются как {"row": ...}.
+    """
+
+    media_type = "application/x-ndjson"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        # stream=None - пустое тело; генератор строк упал бы только
+        # при чтении записей во вьюхе
+        if stream is None:
+            raise ParseError("NDJSON parse error - empty request body")
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        return read_lines(self.decode_lines(stream, encoding))
+
+    @staticmethod
+    def decode_lines(stream, encoding):
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            for line in iter(stream.readline, b""):
+                yield decoder.decode(line)
+            decoder.decode(b"", final=True)
+        except UnicodeDecodeError as error:
+            raise ParseError(f"NDJSON parse error - {error}")
@@ -10,6 +10,13 @@ class IsAdminOrReadOnly(permissions.BasePermission):
         )
 
 
+class IsAdmin(permissions.BasePermission):
+    """Доступ только администраторам."""
+
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and request.user.is_admin
+
+
 class IsNotBlockedOrReadOnly(permissions.BasePermission):
     """Проверка наличия блокировки на аккаунте."""
 
@@ -0,0 +1,233 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from recipes.models import Ingredient
+
+
+class IngredientIndex:
+    """Индекс ингредиентов в памяти процесса для автодополнения.
+
+    Названия хранятся отсортированным списком приведенных к casefold
+    ключей: префиксный поиск - это bisect по списку, поиск по подстроке
+    идет через карту триграмм. Изменения ингредиентов записываются
+    сигналами в журнал в кэше под возрастающим номером версии, и каждый
+    воркер при поиске догоняет журнал точечно. Если журнал потерян
+    или индекс устарел, индекс собирается заново. Без общего кэша
+    (SHARED_CACHE) журнал был бы у каждого воркера свой, поэтому индекс
+    тогда не включается.
+    """
+
+    ngram_size = 3
+    fields = ("id", "name", "measurement_unit")
+    cache_prefix = "ingredient_index"
+
+    def __init__(self, alias, rebuild_interval, changes_timeout):
+        self.alias = alias
+        self.rebuild_interval = rebuild_interval
+        self.changes_timeout = changes_timeout
+        self.version = None
+        self.built_at = None
+        self._lock = threading.RLock()
+        self._ingredients = {}
+        self._keys = []
+        self._ngrams = defaultdict(set)
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    @staticmethod
+    def normalize(value):
+        return value.casefold()
+
+    def ngrams(self, key):
+        return {
+            key[start: start + self.ngram_size]
+            for start in range(len(key) - self.ngram_size + 1)
+        }
+
+    def get_remote_version(self):
+        return self.backend.get_or_set(
+            f"{self.cache_prefix}:version", 0, timeout=None
+        )
+
+    def next_version(self):
+        version_key = f"{self.cache_prefix}:version"
+        self.backend.add(version_key, 0, timeout=None)
+        return self.backend.incr(version_key)
+
+    def record_change(self, ingredient_id):
+        """Запись изменения ингредиента в общий журнал."""
+
+        self.backend.set(
+            f"{self.cache_prefix}:change:{self.next_version()}",
+            ingredient_id,
+            timeout=self.changes_timeout,
+        )
+
+    def invalidate(self):
+        """Пропуск в журнале заставит все воркеры пересобрать индекс.
+
+        Нужен после массовых изменений в обход сигналов (bulk_create).
+        """
+
+        self.next_version()
+
+    def _add(self, ingredient):
+        self._remove(ingredient["id"])
+        key = self.normalize(ingredient["name"])
+        self._ingredients[ingredient["id"]] = ingredient
+        insort(self._keys, (key, ingredient["id"]))
+        for ngram in self.ngrams(key):
+            self._ngrams[ngram].add(ingredient["id"])
+
+    def _remove(self, ingredient_id):
+        ingredient = self._ingredients.pop(ingredient_id, None)
+        if ingredient is None:
+            return
+
+        key = self.normalize(ingredient["name"])
+        del self._keys[bisect_left(self._keys, (key, ingredient_id))]
+        for ngram in self.ngrams(key):
+            self._ngrams[ngram].discard(ingredient_id)
+            if not self._ngrams[ngram]:
+                del self._ngrams[ngram]
+
+    def build(self):
+        """Полная сборка индекса из БД."""
+
+        version = self.get_remote_version()
+        ingredients = {}
+        keys = []
+        ngrams = defaultdict(set)
+
+        for ingredient in Ingredient.objects.order_by().values(*self.fields):
+            key = self.normalize(ingredient["name"])
+            ingredients[ingredient["id"]] = ingredient
+            keys.append((key, ingredient["id"]))
+            for ngram in self.ngrams(key):
+                ngrams[ngram].add(ingredient["id"])
+        keys.sort()
+
+        with self._lock:
+            self._ingredients = ingredients
+            self._keys = keys
+            self._ngrams = ngrams
+            self.version = version
+            self.built_at = time.monotonic()
+
+    def sync(self):
+        """Применение изменений из журнала, при необходимости - пересборка."""
+
+        if (
+            self.version is None
+            or time.monotonic() - self.built_at > self.rebuild_interval
+        ):
+            self.build()
+            return
+
+        remote_version = self.get_remote_version()
+        if remote_version == self.version:
+            return
+
+        changes = self.backend.get_many(
+            f"{self.cache_prefix}:change:{version}"
+            for version in range(self.version + 1, remote_version + 1)
+        )
+        if len(changes) != remote_version - self.version:
+            self.build()
+            return
+
+        changed_ids = set(changes.values())
+        ingredients = {
+            ingredient["id"]: ingredient
+            for ingredient in Ingredient.objects.filter(
+                id__in=changed_ids
+            ).values(*self.fields)
+        }
+        with self._lock:
+            for ingredient_id in changed_ids:
+                if ingredient_id in ingredients:
+                    self._add(ingredients[ingredient_id])
+                else:
+                    self._remove(ingredient_id)
+            self.version = remote_version
+
+    def _prefix_ids(self, key):
+        position = bisect_left(self._keys, (key,))
+        while position < len(self._keys):
+            name, ingredient_id = self._keys[position]
+            if not name.startswith(key):
+                break
+            yield ingredient_id
+            position += 1
+
+    def _substring_ids(self, key):
+        if len(key) < self.ngram_size:
+            return (
+                ingredient_id
+                for name, ingredient_id in self._keys
+                if key in name
+            )
+
+        candidates = set.intersection(
+            *(self._ngrams.get(ngram, set()) for ngram in self.ngrams(key))
+        )
+        return (
+            ingredient_id
+            for ingredient_id in candidates
+            if key in self.normalize(self._ingredients[ingredient_id]["name"])
+        )
+
+    def _ranked(self, ingredient_ids, limit):
+        return heapq.nsmallest(
+            limit,
+            (
+                self._ingredients[ingredient_id]
+                for ingredient_id in ingredient_ids
+            ),
+            key=lambda ingredient: (
+                len(ingredient["name"]), ingredient["name"]
+            ),
+        )
+
+    def search(self, value, limit):
+        """Сначала совпадения по началу названия, затем по подстроке."""
+
+        self.sync()
+        key = self.normalize(value)
+
+        with self._lock:
+            prefix_ids = set(self._prefix_ids(key))
+            result = self._ranked(prefix_ids, limit)
+            if len(result) < limit:
+                result += self._ranked(
+                    (
+                        ingredient_id
+                        for ingredient_id in self._substring_ids(key)
+                        if ingredient_id not in prefix_ids
+                    ),
+                    limit - len(result),
+                )
+        return result
+
+    def all(self):
+        self.sync()
+        with self._lock:
+            return [
+                self._ingredients[ingredient_id]
+                for _, ingredient_id in self._keys
+            ]
+
+
+ingredient_index = IngredientIndex(
+    alias=settings.INGREDIENT_SEARCH_INDEX_CACHE_ALIAS,
+    rebuild_interval=settings.INGREDIENT_SEARCH_INDEX_REBUILD_INTERVAL,
+    changes_timeout=settings.INGREDIENT_SEARCH_INDEX_CHANGES_TIMEOUT,
+)
@@ -1,29 +1,180 @@
 import base64
+import binascii
+import tempfile
+import uuid
 
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files.base import File
+from django.db import transaction
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
-from rest_framework.generics import get_object_or_404
+from PIL import Image
 
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCard, Tag)
-from users.serializers import CustomUserSerializer
+from users.serializers import AuthorPayloadListSerializer, CustomUserSerializer
+
+from api.cache import UserRecipeSets
+from api.images import (IMAGE_EXTENSIONS, IMAGE_SIGNATURE_SIZE,
+                        ImageSrcsetField, detect_format)
 
 
 class Base64ImageField(serializers.ImageField):
-    """Декодирование Base64 в файл."""
+    """Декодирование Base64 в файл.
+
+    Строка декодируется кусками во временный файл, который держится в
+    памяти до FILE_UPLOAD_MAX_MEMORY_SIZE и затем уходит на диск.
+    Размер проверяется по длине строки до декодирования, формат и
+    размеры картинки - по заголовку, как только он декодирован.
+    """
+
+    chunk_size = 64 * 1024
+    header_limit = 256 * 1024
+    default_error_messages = {
+        "invalid_base64": _("Некорректная строка Base64"),
+        "unsupported_format": _(
+            "Поддерживаются только картинки PNG, JPEG, GIF и WebP"
+        ),
+        "too_large": _("Размер картинки больше {max_bytes} байт"),
+        "too_many_pixels": _(
+            "Разрешение картинки больше {max_pixels} пикселей"
+        ),
+    }
 
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith("data:image"):
-            format, encoded_image = data.split(";base64,")
-            extension = format.split("/")[-1]
-            data = ContentFile(
-                base64.b64decode(encoded_image), name="image." + extension
+            # проверки размера и заголовка заменяют полную проверку
+            # ImageField, которая копирует файл в память
+            return serializers.FileField.to_internal_value(
+                self, self.decode(data)
             )
 
         return super().to_internal_value(data)
 
+    def encoded_chunks(self, data, start):
+        for position in range(start, len(data), self.chunk_size):
+            yield data[position: position + self.chunk_size]
+
+    def decoded_chunks(self, data, start):
+        tail = b""
+        try:
+            for chunk in self.encoded_chunks(data, start):
+                chunk = tail + chunk.encode("ascii").translate(
+                    None, b" \t\r\n"
+                )
+                size = len(chunk) - len(chunk) % 4
+                tail = chunk[size:]
+                yield base64.b64decode(chunk[:size], validate=True)
+        except (UnicodeEncodeError, binascii.Error):
+            self.fail("invalid_base64")
+        if tail:
+            self.fail("invalid_base64")
+
+    def check_header(self, file):
+        """Формат и разрешение по уже декодированному началу файла.
+
+        Возвращает формат или None, если заголовок еще не полностью
+        декодирован.
+        """
+
+        position = file.tell()
+        file.seek(0)
+        image_format = detect_format(file.read(IMAGE_SIGNATURE_SIZE))
+        if image_format is None:
+            self.fail("unsupported_format")
+
+        file.seek(0)
+        try:
+            with Image.open(file, formats=(image_format,)) as image:
+                width, height = image.size
+        except Image.DecompressionBombError:
+            width = height = None
+        except (OSError, SyntaxError):
+            if position < self.header_limit:
+                file.seek(position)
+                return None
+            self.fail("invalid_image")
+        finally:
+            file.seek(position)
+
+        max_pixels = settings.RECIPE_IMAGE_MAX_PIXELS
+        if width is None or width * height > max_pixels:
+            self.fail("too_many_pixels", max_pixels=max_pixels)
+        return image_format
+
+    def decode(self, data):
+        start = data.find(";base64,", 0, 100)
+        if start == -1:
+            self.fail("invalid_base64")
+        start += len(";base64,")
+
+        max_bytes = settings.RECIPE_IMAGE_MAX_BYTES
+        if (len(data) - start) // 4 * 3 > max_bytes + 2:
+            self.fail("too_large", max_bytes=max_bytes)
+
+        file = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        image_format = None
+        for chunk in self.decoded_chunks(data, start):
+            file.write(chunk)
+            if file.tell() > max_bytes:
+                self.fail("too_large", max_bytes=max_bytes)
+            if image_format is None and file.tell() >= IMAGE_SIGNATURE_SIZE:
+                image_format = self.check_header(file)
+
+        if image_format is None:
+            image_format = self.check_header(file)
+        if image_format is None:
+            self.fail("invalid_image")
+
+        file.seek(0)
+        try:
+            with Image.open(file, formats=(image_format,)) as image:
+                image.verify()
+        except Exception:
+            self.fail("invalid_image")
+        file.seek(0)
+
+        # уникальное имя: варианты и кэши привязаны к имени файла
+        return File(
+            file,
+            name=f"{uuid.uuid4().hex}.{IMAGE_EXTENSIONS[image_format]}",
+        )
+
+
+class BulkObjectsListSerializer(serializers.ListSerializer):
+    """Список, объекты которого по id загружаются одним in_bulk."""
+
+    model = None
+
+    def in_bulk(self, ids):
+        ids = list(ids)
+        objects = self.model.objects.in_bulk(ids)
+        missing = sorted(set(ids) - objects.keys())
+        if missing:
+            raise ValidationError(
+                _("{objects} с id {ids} не найдены").format(
+                    objects=self.model._meta.verbose_name_plural,
+                    ids=", ".join(map(str, missing)),
+                )
+            )
+        return objects
+
+
+class TagsListSerializer(BulkObjectsListSerializer):
+    """Теги рецепта по списку id."""
+
+    model = Tag
+
+    def to_internal_value(self, data):
+        tag_ids = serializers.ListField(
+            child=serializers.IntegerField()
+        ).run_validation(data)
+        tags = self.in_bulk(tag_ids)
+        return [tags[tag_id] for tag_id in tag_ids]
+
 
 class TagsSerializer(serializers.ModelSerializer):
     """Сериализатор тегов."""
@@ -31,9 +182,7 @@ class TagsSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = ("id", "name", "color", "slug")
-
-    def to_internal_value(self, data):
-        return get_object_or_404(Tag, id=data)
+        list_serializer_class = TagsListSerializer
 
 
 class IngredientsSerializer(serializers.ModelSerializer):
@@ -44,19 +193,40 @@ class IngredientsSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "measurement_unit")
 
 
+class IngredientIdField(serializers.PrimaryKeyRelatedField):
+    """id ингредиента без запроса к БД: ингредиенты всего списка
+    загружает RecipeIngredientListSerializer.
+    """
+
+    def to_internal_value(self, data):
+        return serializers.IntegerField().to_internal_value(data)
+
+
+class RecipeIngredientListSerializer(BulkObjectsListSerializer):
+    """Ингредиенты рецепта: id проверяются одним запросом."""
+
+    model = Ingredient
+
+    def to_internal_value(self, data):
+        items = super().to_internal_value(data)
+        ingredients = self.in_bulk(item["name"] for item in items)
+        for item in items:
+            item["name"] = ingredients[item["name"]]
+        return items
+
+
 class RecipeIngredientWriteSerializer(serializers.ModelSerializer):
     """Сериализатор добавления поля amount в модель ингредиентов.
     Только для записи.
     """
 
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(), source="name"
-    )
+    id = IngredientIdField(queryset=Ingredient.objects.all(), source="name")
     amount = serializers.IntegerField()
 
     class Meta:
         model = RecipeIngredient
         fields = ("id", "amount")
+        list_serializer_class = RecipeIngredientListSerializer
 
     def to_representation(self, instance):
         if "amount" in self.fields:
@@ -67,14 +237,10 @@ class RecipeIngredientWriteSerializer(serializers.ModelSerializer):
 class RecipeIngredientReadSerializer(serializers.ModelSerializer):
     """Сериализатор для чтения игредиента и соответствующего ему amount."""
 
-    id = serializers.PrimaryKeyRelatedField(
-        source="ingredient", read_only=True
-    )
-    name = serializers.SlugRelatedField(
-        slug_field="name", source="ingredient", read_only=True
-    )
-    measurement_unit = serializers.SlugRelatedField(
-        slug_field="measurement_unit", source="ingredient", read_only=True
+    id = serializers.ReadOnlyField(source="ingredient_id")
+    name = serializers.ReadOnlyField(source="ingredient.name")
+    measurement_unit = serializers.ReadOnlyField(
+        source="ingredient.measurement_unit"
     )
 
     class Meta:
@@ -82,6 +248,12 @@ class RecipeIngredientReadSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "measurement_unit", "amount")
 
 
+class RecipeListSerializer(AuthorPayloadListSerializer):
+    """Список рецептов с предзагрузкой данных авторов."""
+
+    author_id_attr = "author_id"
+
+
 class BaseRecipeSerializer(serializers.ModelSerializer):
     """Базовый сериализатор для рецептов."""
 
@@ -91,25 +263,31 @@ class BaseRecipeSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     tags = TagsSerializer(many=True)
 
-    def get_is_in_shopping_cart(self, obj):
-        if self.context["request"].user.is_authenticated and hasattr(
-            obj, "is_in_shopping_cart"
-        ):
-            return obj.is_in_shopping_cart
+    def get_user_flag(self, obj, name):
+        """Флаг из аннотации queryset или из множества id пользователя."""
+
+        request = self.context["request"]
+        if not request.user.is_authenticated:
+            return False
+        if hasattr(obj, name):
+            return getattr(obj, name)
+        if settings.RECIPE_USER_FLAGS_STRATEGY == "sets":
+            user_sets = UserRecipeSets.from_request(request)
+            return obj.id in user_sets.get(user_sets.flag_kinds[name])
         return False
 
+    def get_is_in_shopping_cart(self, obj):
+        return self.get_user_flag(obj, "is_in_shopping_cart")
+
     def get_is_favorited(self, obj):
-        if self.context["request"].user.is_authenticated and hasattr(
-            obj, "is_favorited"
-        ):
-            return obj.is_favorited
-        return False
+        return self.get_user_flag(obj, "is_favorited")
 
 
 class RecipeReadSerializer(BaseRecipeSerializer):
     """Сериализатор рецептов(чтение)."""
 
     ingredients = serializers.SerializerMethodField()
+    image_srcset = ImageSrcsetField()
 
     class Meta:
         model = Recipe
@@ -120,16 +298,18 @@ class RecipeReadSerializer(BaseRecipeSerializer):
             "ingredients",
             "name",
             "image",
+            "image_srcset",
             "text",
             "cooking_time",
             "is_in_shopping_cart",
             "is_favorited",
         )
         read_only_fields = ("author",)
+        list_serializer_class = RecipeListSerializer
 
     def get_ingredients(self, obj):
         return RecipeIngredientReadSerializer(
-            RecipeIngredient.objects.filter(recipe_id=obj.id), many=True
+            obj.recipe_ingr.all(), many=True
         ).data
 
 
@@ -179,8 +359,54 @@ class RecipeWriteSerializer(BaseRecipeSerializer):
 
         igredient_through.objects.bulk_create(ingredients_list)
 
-        instance.save()
+    def __update_tags(self, instance, tags):
+        current = {tag.id for tag in instance.tags.all()}
+        submitted = {tag.id for tag in tags}
+
+        if current - submitted:
+            instance.tags.remove(*(current - submitted))
+        if submitted - current:
+            instance.tags.add(*(submitted - current))
 
+    def __update_ingredients(self, instance, ingredients):
+        """Удаляются, добавляются и меняются только отличающиеся строки."""
+
+        current = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in instance.recipe_ingr.all()
+        }
+        submitted = {
+            ingredient["name"].id: ingredient["amount"]
+            for ingredient in ingredients
+        }
+
+        removed = current.keys() - submitted.keys()
+        if removed:
+            RecipeIngredient.objects.filter(
+                id__in=[current[ingredient_id].id for ingredient_id in removed]
+            ).delete()
+
+        changed = []
+        for ingredient_id, recipe_ingredient in current.items():
+            amount = submitted.get(ingredient_id)
+            if amount is not None and recipe_ingredient.amount != amount:
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ("amount",))
+
+        added = submitted.keys() - current.keys()
+        if added:
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe_id=instance.id,
+                    ingredient_id=ingredient_id,
+                    amount=submitted[ingredient_id],
+                )
+                for ingredient_id in added
+            )
+
+    @transaction.atomic
     def create(self, validated_data):
 
         tags = validated_data.pop("tags")
@@ -191,22 +417,29 @@ class RecipeWriteSerializer(BaseRecipeSerializer):
         self.__fill_fields(recipe, tags, ingredients)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
+        """Изменения связей считаются от загруженных (предзагруженных
+        вьюсетом) тегов и ингредиентов; рецепт сохраняется один раз,
+        после связей, чтобы его сигналы сбросили кэши уже с новыми данными.
+        """
 
         tags = validated_data.pop("tags")
         ingredients = validated_data.pop("ingredients")
 
+        update_fields = ["name", "text", "cooking_time"]
         instance.name = validated_data["name"]
         instance.text = validated_data["text"]
         instance.cooking_time = validated_data["cooking_time"]
 
         if "image" in validated_data:
             instance.image = validated_data["image"]
+            update_fields.append("image")
 
-        instance.tags.clear()
-        instance.ingredients.clear()
-
-        self.__fill_fields(instance, tags, ingredients)
+        self.__update_tags(instance, tags)
+        self.__update_ingredients(instance, ingredients)
+        # счетчики меняются конкурентно через F() и не перезаписываются
+        instance.save(update_fields=update_fields)
 
         return instance
 
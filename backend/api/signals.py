@@ -0,0 +1,266 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import auth_token_cache
+from api.cache import (recipe_feed_cache, shopping_list_cache,
+                       user_recipe_sets_cache)
+from api.images import delete_variants, image_variant_worker, ready_variants
+from api.search import ingredient_index
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCard, Tag)
+from users.models import User
+
+
+def invalidate_carts(user_ids):
+    """Сброс указателей корзин после фиксации транзакции: иначе
+    параллельный запрос пересчитает корзину по старым строкам и
+    сохранит указатель, который уже никто не сбросит.
+    """
+
+    user_ids = set(user_ids)
+    transaction.on_commit(
+        lambda: shopping_list_cache.invalidate_users(user_ids)
+    )
+
+
+def invalidate_recipe_carts(recipe_id):
+    invalidate_carts(
+        ShoppingCard.objects.filter(recipe_id=recipe_id)
+        .order_by()
+        .values_list("user_id", flat=True)
+    )
+
+
+def bump_carts_version():
+    transaction.on_commit(shopping_list_cache.bump_version)
+
+
+@receiver((post_save, post_delete), sender=ShoppingCard)
+def invalidate_cart(sender, instance, *args, **kwargs):
+    """Сброс кэша корзины при добавлении/удалении рецепта."""
+
+    invalidate_carts((instance.user_id,))
+
+
+@receiver((post_save, post_delete), sender=ShoppingCard)
+def invalidate_cart_set(sender, instance, *args, **kwargs):
+    """Сброс множества id рецептов в корзине пользователя."""
+
+    user_recipe_sets_cache.invalidate("shopping_cart", instance.user_id)
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+def invalidate_favorites_set(sender, instance, *args, **kwargs):
+    """Сброс множества id избранных рецептов пользователя."""
+
+    user_recipe_sets_cache.invalidate("favorites", instance.user_id)
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def invalidate_recipe_ingredient(sender, instance, *args, **kwargs):
+    """Сброс кэша корзин, в которых есть измененный рецепт."""
+
+    invalidate_recipe_carts(instance.recipe_id)
+
+
+@receiver(post_save, sender=Recipe)
+def invalidate_recipe(sender, instance, created, *args, **kwargs):
+    """Ингредиенты рецепта пишутся через bulk_create без сигналов,
+    поэтому кэш сбрасывается и при сохранении самого рецепта.
+    """
+
+    if not created:
+        invalidate_recipe_carts(instance.id)
+
+
+@receiver(m2m_changed, sender=RecipeIngredient)
+def invalidate_recipe_ingredients(sender, instance, action, *args, **kwargs):
+    """Сброс кэша при изменении ингредиентов через менеджер М:М."""
+
+    if not action.startswith("post_"):
+        return
+    if isinstance(instance, Recipe):
+        invalidate_recipe_carts(instance.id)
+    else:
+        bump_carts_version()
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient(sender, instance, *args, **kwargs):
+    """Ингредиенты меняются редко - сбрасываются все корзины."""
+
+    bump_carts_version()
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def record_ingredient_change(sender, instance, *args, **kwargs):
+    """Запись изменения в журнал индекса автодополнения после фиксации:
+    иначе другой воркер догонит журнал по еще старой строке.
+    """
+
+    ingredient_id = instance.id
+    transaction.on_commit(
+        lambda: ingredient_index.record_change(ingredient_id)
+    )
+
+
+def invalidate_feed(namespaces):
+    """Сброс ленты после фиксации транзакции, чтобы параллельный запрос
+    не закэшировал старые данные под новой версией.
+    """
+
+    namespaces = list(namespaces)
+    transaction.on_commit(lambda: recipe_feed_cache.invalidate(namespaces))
+
+
+def recipe_feed_namespaces(recipe_id, author_id, tag_slugs=None):
+    if tag_slugs is None:
+        tag_slugs = Tag.objects.filter(recipes__id=recipe_id).values_list(
+            "slug", flat=True
+        )
+    return (
+        "all",
+        f"recipe:{recipe_id}",
+        f"author:{author_id}",
+        *(f"tag:{slug}" for slug in tag_slugs),
+    )
+
+
+def invalidate_feed_recipe(recipe_id):
+    author_id = (
+        Recipe.objects.filter(id=recipe_id)
+        .values_list("author_id", flat=True)
+        .first()
+    )
+    if author_id is not None:
+        invalidate_feed(recipe_feed_namespaces(recipe_id, author_id))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(pre_delete, sender=Recipe)
+def invalidate_feed_on_recipe(sender, instance, *args, **kwargs):
+    """Сброс ленты с тегами и автором рецепта.
+
+    При удалении теги читаются до каскадного удаления связей.
+    """
+
+    invalidate_feed(recipe_feed_namespaces(instance.id, instance.author_id))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_feed_on_recipe_tags(
+    sender, instance, action, reverse, pk_set, *args, **kwargs
+):
+    """Сброс ленты со старыми и новыми тегами рецепта."""
+
+    if reverse:
+        if action.startswith("post_") or action == "pre_clear":
+            invalidate_feed(("global",))
+        return
+
+    if action == "pre_clear":
+        tag_slugs = None
+    elif action in ("post_add", "post_remove"):
+        tag_slugs = Tag.objects.filter(id__in=pk_set).values_list(
+            "slug", flat=True
+        )
+    else:
+        return
+    invalidate_feed(
+        recipe_feed_namespaces(instance.id, instance.author_id, tag_slugs)
+    )
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def invalidate_feed_on_recipe_ingredient(sender, instance, *args, **kwargs):
+    invalidate_feed_recipe(instance.recipe_id)
+
+
+@receiver(m2m_changed, sender=RecipeIngredient)
+def invalidate_feed_on_recipe_ingredients(
+    sender, instance, action, *args, **kwargs
+):
+    if not action.startswith("post_"):
+        return
+    if isinstance(instance, Recipe):
+        invalidate_feed(
+            recipe_feed_namespaces(instance.id, instance.author_id)
+        )
+    else:
+        invalidate_feed(("global",))
+
+
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_feed_on_dictionary(sender, *args, **kwargs):
+    """Теги и ингредиенты выводятся во всех рецептах и меняются редко -
+    сбрасывается вся лента.
+    """
+
+    invalidate_feed(("global",))
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_feed_on_author(
+    sender, instance, created=False, update_fields=None, *args, **kwargs
+):
+    """Сброс ответов с рецептами автора при изменении его профиля."""
+
+    if created or update_fields == frozenset(("last_login",)):
+        return
+    invalidate_feed((f"author:{instance.id}",))
+
+
+def invalidate_auth_tokens(user_id):
+    token_keys = list(
+        Token.objects.filter(user_id=user_id).values_list("key", flat=True)
+    )
+    transaction.on_commit(lambda: auth_token_cache.invalidate(token_keys))
+
+
+@receiver(post_save, sender=User)
+def invalidate_auth_token_on_user(
+    sender, instance, created=False, update_fields=None, *args, **kwargs
+):
+    """Сброс снимка пользователя при изменении роли, блокировки и т.п."""
+
+    if created or (
+        update_fields is not None
+        and not update_fields.intersection(auth_token_cache.fields)
+    ):
+        return
+    invalidate_auth_tokens(instance.id)
+
+
+@receiver(pre_delete, sender=User)
+def invalidate_auth_token_on_user_delete(sender, instance, *args, **kwargs):
+    invalidate_auth_tokens(instance.id)
+
+
+@receiver((post_save, post_delete), sender=Token)
+def invalidate_auth_token(sender, instance, *args, **kwargs):
+    token_key = instance.key
+    transaction.on_commit(lambda: auth_token_cache.invalidate((token_key,)))
+
+
+@receiver(post_save, sender=Recipe)
+def schedule_image_variants(sender, instance, *args, **kwargs):
+    """Генерация вариантов новой картинки после фиксации транзакции."""
+
+    if instance.image and ready_variants(instance) is None:
+        recipe_id, name = instance.id, instance.image.name
+        transaction.on_commit(
+            lambda: image_variant_worker.submit(recipe_id, name)
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_image_variants(sender, instance, *args, **kwargs):
+    """Удаление копий после фиксации: при откате рецепт остается с ними."""
+
+    transaction.on_commit(partial(delete_variants, instance.image_variants))
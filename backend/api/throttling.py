@@ -0,0 +1,87 @@
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import throttling
+from rest_framework.settings import api_settings
+
+
+class CounterRateThrottle(throttling.SimpleRateThrottle):
+    """Ограничение частоты запросов на счетчиках в общем кэше.
+
+    Вместо списка отметок времени, который штатные троттлы читают и
+    целиком перезаписывают на каждом запросе, на окно длиной duration
+    хранится одно число с ключом по номеру окна. Запрос - атомарный
+    incr счетчика текущего окна и чтение счетчика прошлого.
+
+    Скользящее окно (THROTTLE_SLIDING_WINDOW) оценивает число запросов
+    за последние duration секунд как сумму текущего счетчика и доли
+    прошлого, пропорциональной непрошедшей части окна. Без него окна
+    фиксированные: в начале окна лимит сбрасывается целиком.
+
+    Атомарность incr дают Redis, Memcached и LocMem; файловый кэш и кэш
+    в БД подходят как локальная замена для тестов. Ключ текущего окна
+    живет два окна, поэтому не истекает между проверкой и incr.
+    """
+
+    def get_rate(self):
+        self.THROTTLE_RATES = api_settings.DEFAULT_THROTTLE_RATES
+        return super().get_rate()
+
+    @property
+    def cache(self):
+        return caches[settings.THROTTLE_CACHE_ALIAS]
+
+    def increment(self, key):
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            if self.cache.add(key, 1, timeout=self.duration * 2):
+                return 1
+            return self.cache.incr(key)
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window, self.elapsed = divmod(self.now, self.duration)
+        current_key = f"{self.key}:{int(window)}"
+        self.count = self.increment(current_key)
+        self.previous = (
+            self.cache.get(f"{self.key}:{int(window) - 1}", 0)
+            if settings.THROTTLE_SLIDING_WINDOW
+            else 0
+        )
+
+        weight = 1 - self.elapsed / self.duration
+        if self.previous * weight + self.count <= self.num_requests:
+            return True
+
+        # отклоненный запрос не расходует лимит
+        try:
+            self.cache.decr(current_key)
+        except ValueError:
+            pass
+        return self.throttle_failure()
+
+    def wait(self):
+        if self.count > self.num_requests or not self.previous:
+            return self.duration - self.elapsed
+        # момент, когда доля прошлого окна уменьшится до свободного места
+        share = 1 - (self.num_requests - self.count) / self.previous
+        return max(share * self.duration - self.elapsed, 0)
+
+
+class AnonRateThrottle(throttling.AnonRateThrottle, CounterRateThrottle):
+    pass
+
+
+class UserRateThrottle(throttling.UserRateThrottle, CounterRateThrottle):
+    pass
+
+
+class ScopedRateThrottle(throttling.ScopedRateThrottle, CounterRateThrottle):
+    pass
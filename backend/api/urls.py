@@ -17,5 +17,7 @@ urlpatterns = [
         views.CreateDeleteShoppingCardView.as_view(),
     ),
     path(r"recipes/<int:recipe_id>/favorite/", views.FavoriteView.as_view()),
+    path("recipes/import/", views.RecipeImportView.as_view()),
+    path("recipes/export/", views.RecipeExportView.as_view()),
     path("", include(router_v1.urls)),
 ]
@@ -1,11 +1,86 @@
-import io
-
-from django.http import FileResponse
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Prefetch, Sum
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfbase.ttfonts import TTFError, TTFont
 from reportlab.pdfgen import canvas
 
+from recipes.models import Favorite, RecipeIngredient, ShoppingCard
+
+FONT_NAME = "Verdana"
+FONT_PATHS = (
+    "Verdana.ttf",
+    settings.BASE_DIR / "backend_static" / "fonts" / "Verdana.ttf",
+)
+
+
+def register_fonts():
+    """Однократная регистрация шрифта для ПДФ при старте приложения."""
+
+    if FONT_NAME in pdfmetrics.getRegisteredFontNames():
+        return True
+
+    for font_path in FONT_PATHS:
+        try:
+            pdfmetrics.registerFont(TTFont(FONT_NAME, font_path))
+        except TTFError:
+            continue
+        return True
+    return False
+
+
+def with_read_relations(queryset, user):
+    """Связанные данные для RecipeReadSerializer без запросов на рецепт.
+
+    Флаги избранного/корзины аннотируются подзапросами EXISTS только
+    при RECIPE_USER_FLAGS_STRATEGY="exists".
+    """
+
+    queryset = queryset.select_related("author").prefetch_related(
+        Prefetch(
+            "recipe_ingr",
+            queryset=RecipeIngredient.objects.select_related("ingredient"),
+        ),
+        "tags",
+    )
+    if (
+        not user.is_authenticated
+        or settings.RECIPE_USER_FLAGS_STRATEGY == "sets"
+    ):
+        return queryset
+    return queryset.annotate(
+        is_in_shopping_cart=Exists(
+            ShoppingCard.objects.filter(user=user, recipe=OuterRef("pk"))
+        ),
+        is_favorited=Exists(
+            Favorite.objects.filter(user=user, recipe=OuterRef("pk"))
+        ),
+    )
+
+
+def get_shopping_list(user_id):
+    """Суммарное кол-во ингредиентов из корзины пользователя.
+
+    Агрегация выполняется в БД одним запросом с группировкой
+    по паре (название, единицы измерения).
+    """
+
+    return (
+        RecipeIngredient.objects.filter(recipe__shopping_card__user_id=user_id)
+        .values("ingredient__name", "ingredient__measurement_unit")
+        .annotate(total_amount=Sum("amount"))
+        .order_by("ingredient__name", "ingredient__measurement_unit")
+    )
+
+
+def format_amount(row):
+    """Кол-во ингредиента с единицами измерения."""
+
+    measurement_unit = row["ingredient__measurement_unit"]
+    if measurement_unit == "по вкусу":
+        return measurement_unit
+    return f"{row['total_amount']} ({measurement_unit})"
+
 
 def draw_headers_and_footers(object, x_size, y_size, text, header=True):
     line_y_cor = 778
@@ -20,14 +95,14 @@ def draw_headers_and_footers(object, x_size, y_size, text, header=True):
     object.line(0, line_y_cor_next, 1000, line_y_cor_next)
 
 
-def pdf_response_creator(data):
-    """Создание ответа в виде ПДФ-файла."""
+def draw_shopping_list_pdf(data, file):
+    """Отрисовка списка покупок в ПДФ-файл."""
 
-    pdfmetrics.registerFont(TTFont("Verdana", "Verdana.ttf"))
+    if not register_fonts():
+        raise TTFError(f"Шрифт {FONT_NAME} не найден")
 
-    buffer = io.BytesIO()
-    pdf_object = canvas.Canvas(buffer, pagesize=A4)
-    pdf_object.setFont("Verdana", 15, leading=None)
+    pdf_object = canvas.Canvas(file, pagesize=A4)
+    pdf_object.setFont(FONT_NAME, 15, leading=None)
 
     draw_headers_and_footers(
         pdf_object, 200, 800, "Ваша продуктовая корзина:"
@@ -36,20 +111,12 @@ def pdf_response_creator(data):
     y_coord = 750
     page = 1
 
-    pdf_object.setFont("Verdana", 10, leading=None)
-
-    for ingr_name, ingr_data in sorted(data.items()):
+    pdf_object.setFont(FONT_NAME, 10, leading=None)
 
-        pdf_object.drawString(100, y_coord, f"{ingr_name}:")
+    for row in data:
 
-        if ingr_data["measurement_unit"] == "по вкусу":
-            to_draw = f"{ingr_data['measurement_unit']}"
-        else:
-            to_draw = (
-                f"{ingr_data['amount']} ({ingr_data['measurement_unit']})"
-            )
-
-        pdf_object.drawString(450, y_coord, to_draw)
+        pdf_object.drawString(100, y_coord, f"{row['ingredient__name']}:")
+        pdf_object.drawString(450, y_coord, format_amount(row))
         y_coord -= 40
         if y_coord < 60:
             draw_headers_and_footers(
@@ -64,7 +131,3 @@ def pdf_response_creator(data):
     )
 
     pdf_object.save()
-    buffer.seek(0)
-    return FileResponse(
-        buffer, as_attachment=True, filename="shopping_card.pdf"
-    )
@@ -1,25 +1,39 @@
-from django.db.models import Exists, OuterRef
+from django.conf import settings
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+from django.utils.translation import gettext_lazy as _
 from django_filters.rest_framework import DjangoFilterBackend
+from recipes.management.exporters import recipe_records
 from recipes.models import Favorite, Ingredient, Recipe, ShoppingCard, Tag
+from rest_framework import status
+from rest_framework.exceptions import NotFound, ParseError
 from rest_framework.generics import (CreateAPIView, DestroyAPIView,
                                      RetrieveAPIView, get_object_or_404)
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 
+from api.cache import make_digest, recipe_feed_cache, shopping_list_cache
+from api.exporters import RecipeCatalogueExporter, get_exporter_class
 from api.filters import IngredientSearchFilter, RecipeSearchFilter
-from api.pagination import CustomPagination
-from api.permissions import (IsAdminOrReadOnly, IsAuthorOrReadOnly,
+from api.importers import RecipeImporter
+from api.pagination import RecipePagination
+from api.parsers import NDJSONParser
+from api.permissions import (IsAdmin, IsAdminOrReadOnly, IsAuthorOrReadOnly,
                              IsNotBlockedOrReadOnly)
+from api.search import ingredient_index
 from api.serializers import (FavoriteSerializer, IngredientsSerializer,
                              RecipeReadSerializer, RecipeWriteSerializer,
                              ShoppingCardSerializer, TagsSerializer)
-from api.utils import pdf_response_creator
+from api.utils import get_shopping_list, with_read_relations
 
 
 class RecipeViewset(ModelViewSet):
     """Вьюсет рецептов."""
 
-    pagination_class = CustomPagination
+    pagination_class = RecipePagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeSearchFilter
     permission_classes = (
@@ -29,32 +43,132 @@ class RecipeViewset(ModelViewSet):
     )
 
     def get_queryset(self):
-        if not self.request.user.is_authenticated:
-            return Recipe.objects.select_related("author").prefetch_related(
-                "ingredients", "tags"
-            )
-        return (
-            Recipe.objects.select_related("author")
-            .prefetch_related("ingredients", "tags")
-            .annotate(
-                is_in_shopping_cart=Exists(
-                    ShoppingCard.objects.filter(
-                        user=self.request.user, recipe=OuterRef("pk")
-                    )
-                ),
-                is_favorited=Exists(
-                    Favorite.objects.filter(
-                        user=self.request.user, recipe=OuterRef("pk")
-                    )
-                ),
-            )
-        )
+        return with_read_relations(Recipe.objects.all(), self.request.user)
 
     def get_serializer_class(self):
         if self.action in ("list", "retrieve"):
             return RecipeReadSerializer
         return RecipeWriteSerializer
 
+    def list(self, request, *args, **kwargs):
+        if not self.paginator.is_streaming(request):
+            return self.feed_cached_response(
+                recipe_feed_cache.query_namespaces(request.query_params),
+                lambda: super(RecipeViewset, self).list(
+                    request, *args, **kwargs
+                ),
+            )
+
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.paginator.get_streaming_response(
+            self.paginator.stream_queryset(queryset, request),
+            lambda chunk: self.get_serializer(chunk, many=True).data,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.feed_cached_response(
+            (f"recipe:{kwargs['pk']}",),
+            lambda: super(RecipeViewset, self).retrieve(
+                request, *args, **kwargs
+            ),
+        )
+
+    def feed_cached_response(self, namespaces, get_response):
+        """Ответ анонимному пользователю из общего кэша ленты.
+
+        Версии пространств имен запроса читаются до построения ответа,
+        версии рецептов и авторов из ответа - после.
+        """
+
+        request = self.request
+        if (
+            not settings.RECIPE_FEED_CACHE
+            or request.user.is_authenticated
+            or request.accepted_renderer.format != "json"
+        ):
+            return get_response()
+
+        key = recipe_feed_cache.make_key(
+            self.action,
+            request.build_absolute_uri(request.path),
+            request.query_params,
+        )
+        data = recipe_feed_cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        versions = recipe_feed_cache.get_versions(("global", *namespaces))
+        response = get_response()
+        if response.status_code == status.HTTP_200_OK:
+            recipes = response.data.get("results", (response.data,))
+            versions.update(
+                recipe_feed_cache.get_versions(
+                    namespace
+                    for recipe in recipes
+                    for namespace in (
+                        f"recipe:{recipe['id']}",
+                        f"author:{recipe['author']['id']}",
+                    )
+                )
+            )
+            recipe_feed_cache.set(key, response.data, versions)
+        return response
+
+
+class RecipeImportView(APIView):
+    """Пакетный импорт рецептов из NDJSON с отчетом по каждой записи.
+
+    Картинки указываются путем к файлу в хранилище и копируются под
+    новым именем, записи без автора создаются от имени администратора.
+    ?dry_run=1 - только проверка.
+    """
+
+    permission_classes = (IsAdmin,)
+    parser_classes = (NDJSONParser,)
+
+    def post(self, request):
+        # для пустого тела DRF не вызывает парсер и подставляет {}
+        if isinstance(request.data, dict):
+            raise ParseError(_("Пустое тело запроса"))
+        importer = RecipeImporter(
+            batch_size=settings.RECIPE_IMPORT_BATCH_SIZE,
+            dry_run=request.query_params.get("dry_run") in ("1", "true"),
+            default_author=request.user.username,
+        )
+        stats = importer.run(request.data)
+        return Response(
+            {
+                "total": stats.total,
+                "valid": stats.valid,
+                "inserted": stats.inserted,
+                "skipped": stats.skipped,
+                "failed": stats.failed,
+                "errors": [
+                    {
+                        "line": line,
+                        "name": (
+                            record.get("name")
+                            if isinstance(record, dict)
+                            else None
+                        ),
+                        "errors": messages,
+                    }
+                    for _, line, record, messages in importer.errors
+                ],
+            }
+        )
+
+
+class RecipeExportView(APIView):
+    """Потоковая выгрузка всех рецептов в NDJSON."""
+
+    permission_classes = (IsAdmin,)
+
+    def get(self, request):
+        return RecipeCatalogueExporter(
+            recipe_records(settings.RECIPE_EXPORT_BATCH_SIZE)
+        ).response()
+
 
 class TagsViewset(ModelViewSet):
     """Вьюсет тегов."""
@@ -73,9 +187,25 @@ class IngredientsViewset(ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientSearchFilter
 
+    def list(self, request, *args, **kwargs):
+        if not settings.INGREDIENT_SEARCH_INDEX:
+            return super().list(request, *args, **kwargs)
+
+        name = request.query_params.get("name")
+        if name:
+            return Response(
+                ingredient_index.search(
+                    name, settings.INGREDIENT_SEARCH_LIMIT
+                )
+            )
+        return Response(ingredient_index.all())
+
 
 class ShoppingCardView(RetrieveAPIView):
-    """Получение корзины в виде файла."""
+    """Получение корзины в виде файла.
+
+    Формат выбирается параметром ?format= или заголовком Accept.
+    """
 
     permission_classes = (IsNotBlockedOrReadOnly,)
     serializer_class = ShoppingCardSerializer
@@ -86,21 +216,52 @@ class ShoppingCardView(RetrieveAPIView):
     def get_queryset(self):
         return ShoppingCard.objects.filter(user__id=self.get_object())
 
-    def retrieve(self, request, *args, **kwargs):
-
-        data = {}
+    def perform_content_negotiation(self, request, force=False):
+        return super().perform_content_negotiation(request, force=True)
 
-        for recipe in self.get_queryset().select_related("user", "recipe"):
-            for rec_ingr in recipe.recipe.recipe_ingr.all():
-                curr_ingredient = rec_ingr.ingredient
-                if curr_ingredient.name not in data:
-                    data[curr_ingredient.name] = {
-                        "amount": 0,
-                        "measurement_unit": curr_ingredient.measurement_unit,
-                    }
-                data[curr_ingredient.name]["amount"] += rec_ingr.amount
-
-        return pdf_response_creator(data)
+    def retrieve(self, request, *args, **kwargs):
+        exporter_class = get_exporter_class(request)
+        if exporter_class is None:
+            raise NotFound(_("Неподдерживаемый формат файла"))
+
+        if not exporter_class.cacheable:
+            return exporter_class(
+                get_shopping_list(self.get_object()).iterator()
+            ).response()
+
+        return self.cached_response(exporter_class)
+
+    def cached_response(self, exporter_class):
+        """Документ из кэша с ETag и ответом 304 на If-None-Match."""
+
+        user_id = self.get_object()
+        export_format = exporter_class.format
+        rows = None
+
+        digest = shopping_list_cache.get_digest(user_id, export_format)
+        if digest is None:
+            rows = list(get_shopping_list(user_id))
+            digest = make_digest(export_format, rows)
+            shopping_list_cache.set_digest(user_id, export_format, digest)
+
+        etag = quote_etag(digest)
+        if_none_match = self.request.META.get("HTTP_IF_NONE_MATCH")
+        if if_none_match and (
+            etag in parse_etags(if_none_match) or if_none_match == "*"
+        ):
+            response = HttpResponseNotModified()
+        else:
+            document = shopping_list_cache.get_document(digest)
+            if document is None:
+                if rows is None:
+                    rows = list(get_shopping_list(user_id))
+                document = exporter_class(rows).render()
+                shopping_list_cache.set_document(digest, document)
+            response = exporter_class(rows).document_response(document)
+
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
 
 class CreateDeleteShoppingCardView(DestroyAPIView, CreateAPIView):
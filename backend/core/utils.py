@@ -0,0 +1,9 @@
+from itertools import islice
+
+
+def chunked(iterable, size):
+    """Разбиение итерируемого объекта на списки по size элементов."""
+
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
@@ -1,4 +1,5 @@
 import os
+from datetime import datetime, timezone
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -93,6 +94,24 @@ DATABASES = {
     }
 }
 
+# Общий кэш воркеров gunicorn (в docker-compose - Redis). По умолчанию
+# локальный кэш процесса - для разработки и тестов
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND",
+            default="django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", default=""),
+    }
+}
+# Указатели, версии и журналы изменений в кэше верны, только если кэш
+# общий для всех воркеров; иначе такие кэши по умолчанию выключены
+SHARED_CACHE = CACHES["default"]["BACKEND"] not in (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
 AUTH_PASSWORD_VALIDATORS = (
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -133,8 +152,9 @@ AUTH_USER_MODEL = "users.User"
 REST_FRAMEWORK = {
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "DEFAULT_THROTTLE_CLASSES": (
-        "rest_framework.throttling.UserRateThrottle",
-        "rest_framework.throttling.ScopedRateThrottle",
+        "api.throttling.AnonRateThrottle",
+        "api.throttling.UserRateThrottle",
+        "api.throttling.ScopedRateThrottle",
     ),
     "DEFAULT_THROTTLE_RATES": {
         "user": "10000/day",
@@ -144,10 +164,24 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticated",
     ),
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework.authentication.TokenAuthentication",
+        "api.authentication.CachingTokenAuthentication",
     ),
 }
 
+# Счетчики запросов троттлинга: скользящее или фиксированное окно
+THROTTLE_CACHE_ALIAS = "default"
+THROTTLE_SLIDING_WINDOW = True
+
+# Снимки пользователей по токену: локальный LRU процесса с коротким
+# сроком жизни перед общим кэшем. Без общего кэша сброс снимка не дошел
+# бы до других воркеров - токен проверяется по БД
+AUTH_TOKEN_CACHE = SHARED_CACHE
+AUTH_TOKEN_CACHE_ALIAS = "default"
+AUTH_TOKEN_CACHE_TIMEOUT = 60 * 5
+AUTH_TOKEN_CACHE_LOCAL_SIZE = 10000
+AUTH_TOKEN_CACHE_LOCAL_TTL = 5
+AUTH_TOKEN_CACHE_STATS_FLUSH_EVERY = 100
+
 
 DJOSER = {
     "SERIALIZERS": {
@@ -159,3 +193,62 @@ DJOSER = {
         "user_list": ("rest_framework.permissions.IsAuthenticatedOrReadOnly",)
     },
 }
+
+SHOPPING_LIST_CACHE_ALIAS = "default"
+SHOPPING_LIST_CACHE_MAX_SIZE = 32 * 1024 * 1024
+SHOPPING_LIST_CACHE_TIMEOUT = 60 * 60 * 24
+# Указатель пользователя на хэш его корзины; документы по хэшу
+# кэшируются и без него
+SHOPPING_LIST_CACHE_POINTERS = SHARED_CACHE
+
+RECIPE_COUNT_CACHE_TIMEOUT = 60
+# Вес добавления в избранное/корзину в рейтинге рецептов
+RECIPE_RANKING_WEIGHTS = {"favorite": 2.0, "shopping_cart": 1.0}
+RECIPE_RANKING_EPOCH = datetime(2023, 1, 1, tzinfo=timezone.utc)
+RECIPE_RANKING_BATCH_SIZE = 10000
+RECIPE_TRENDING_HALF_LIFE = 60 * 60 * 24 * 3
+# С этого кол-ва подписок лента пользователя материализуется в
+# TimelineEntry (None - только выборка при чтении)
+SUBSCRIPTION_FEED_TIMELINE_THRESHOLD = 500
+SUBSCRIPTION_FEED_TIMELINE_BATCH_SIZE = 1000
+# Уменьшенные WebP-копии картинок рецептов (srcset)
+RECIPE_IMAGE_WIDTHS = (320, 640, 1280)
+RECIPE_IMAGE_QUALITY = 80
+RECIPE_IMAGE_WORKERS = int(os.getenv("RECIPE_IMAGE_WORKERS", default=2))
+RECIPE_IMAGE_QUEUE_SIZE = 100
+# Ограничения картинки рецепта в Base64: размер файла и разрешение
+# проверяются до полного декодирования
+RECIPE_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+RECIPE_IMAGE_MAX_PIXELS = 40_000_000
+# тело запроса с картинкой в Base64 на треть больше самой картинки
+DATA_UPLOAD_MAX_MEMORY_SIZE = RECIPE_IMAGE_MAX_BYTES * 4 // 3 + 1024 * 1024
+# Версии пространств имен ленты должны быть общими для всех воркеров
+RECIPE_FEED_CACHE = (
+    os.getenv("RECIPE_FEED_CACHE", default=str(SHARED_CACHE)).lower()
+    == "true"
+)
+RECIPE_FEED_CACHE_ALIAS = "default"
+RECIPE_FEED_CACHE_TIMEOUT = 60 * 5
+# Флаги is_favorited/is_in_shopping_cart: "exists" - подзапросами EXISTS
+# на каждую строку, "sets" - по множествам id пользователя из кэша
+# (только с общим кэшем: множества сбрасываются сигналами).
+RECIPE_USER_FLAGS_STRATEGY = os.getenv(
+    "RECIPE_USER_FLAGS_STRATEGY",
+    default="sets" if SHARED_CACHE else "exists",
+)
+USER_RECIPE_SETS_CACHE_ALIAS = "default"
+USER_RECIPE_SETS_CACHE_TIMEOUT = 60 * 60
+USER_RECIPE_SETS_FILTER_LIMIT = 1000
+RECIPE_IMPORT_BATCH_SIZE = 100
+RECIPE_EXPORT_BATCH_SIZE = 1000
+RECIPE_STREAM_PAGE_SIZE = 100
+RECIPE_STREAM_CHUNK_SIZE = 100
+
+INGREDIENT_SEARCH_LIMIT = 50
+# Журнал изменений индекса в кэше должны видеть все воркеры
+INGREDIENT_SEARCH_INDEX = SHARED_CACHE and (
+    os.getenv("INGREDIENT_SEARCH_INDEX", default="false").lower() == "true"
+)
+INGREDIENT_SEARCH_INDEX_CACHE_ALIAS = "default"
+INGREDIENT_SEARCH_INDEX_REBUILD_INTERVAL = 60 * 60
+INGREDIENT_SEARCH_INDEX_CHANGES_TIMEOUT = 60 * 60 * 24
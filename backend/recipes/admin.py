@@ -1,5 +1,5 @@
 from django.contrib import admin
-from django.db.models import Count
+from django.utils.translation import gettext_lazy as _
 
 from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                      ShoppingCard, Tag)
@@ -20,6 +20,27 @@ class TagAdmin(admin.ModelAdmin):
     prepopulated_fields = {"slug": ("name",)}
 
 
+class SaveEditableFieldsMixin:
+    """Изменение из админки пишет только редактируемые поля.
+
+    Счетчики и копии картинок обновляются параллельно F()-выражениями
+    и фоновыми задачами; полное сохранение вернуло бы им значения,
+    загруженные вместе с формой.
+    """
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            super().save_model(request, obj, form, change)
+            return
+        obj.save(
+            update_fields=[
+                field.name
+                for field in obj._meta.concrete_fields
+                if field.editable and not field.primary_key
+            ]
+        )
+
+
 class RecipeIngredientInline(admin.StackedInline):
     model = RecipeIngredient
     extra = 2
@@ -27,7 +48,7 @@ class RecipeIngredientInline(admin.StackedInline):
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(SaveEditableFieldsMixin, admin.ModelAdmin):
 
     list_display = (
         "pk",
@@ -44,8 +65,11 @@ class RecipeAdmin(admin.ModelAdmin):
     filter_horizontal = ("tags",)
     inlines = (RecipeIngredientInline,)
 
+    @admin.display(
+        description=_("Добавлений в избранное"), ordering="favorites_count"
+    )
     def favorited_times(self, obj):
-        return obj.favorited_times
+        return obj.favorites_count
 
     def tag_list(self, obj):
         return " | ".join([tag.name for tag in obj.tags.all()])
@@ -59,7 +83,6 @@ class RecipeAdmin(admin.ModelAdmin):
         return (
             Recipe.objects.select_related("author")
             .prefetch_related("tags", "ingredients")
-            .annotate(favorited_times=Count("favorite_object"))
         )
 
 
@@ -0,0 +1,61 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, ShoppingCard
+from users.models import Subscription
+
+User = get_user_model()
+
+# (модель со счетчиком, поле счетчика, связанная модель, поле связи)
+COUNTERS = (
+    (Recipe, "favorites_count", Favorite, "recipe"),
+    (Recipe, "cart_count", ShoppingCard, "recipe"),
+    (User, "recipes_count", Recipe, "author"),
+    (User, "subscriptions_count", Subscription, "user"),
+)
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарное изменение счетчика без гонок между запросами."""
+
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f"{field}__gte": -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def actual_count(related_model, related_field):
+    """Подзапрос с фактическим кол-вом связанных записей."""
+
+    return Coalesce(
+        Subquery(
+            related_model.objects.filter(**{related_field: OuterRef("pk")})
+            .order_by()
+            .values(related_field)
+            .annotate(count=Count("pk"))
+            .values("count"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def reconcile_counters(dry_run=False):
+    """Пересчет разошедшихся счетчиков (после bulk_create, ручных правок).
+
+    Возвращает кол-во исправленных строк для каждого счетчика.
+    """
+
+    drift = {}
+    for model, field, related_model, related_field in COUNTERS:
+        stale = model.objects.annotate(
+            actual=actual_count(related_model, related_field)
+        ).exclude(**{field: F("actual")})
+        drift[f"{model._meta.model_name}.{field}"] = stale.count()
+
+        if not dry_run:
+            model.objects.filter(pk__in=stale.values("pk")).update(
+                **{field: actual_count(related_model, related_field)}
+            )
+    return drift
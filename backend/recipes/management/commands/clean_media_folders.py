@@ -0,0 +1,36 @@
+from django.core.management import BaseCommand
+from django.utils.translation import gettext_lazy as _
+
+from recipes.utils import media_folder_cleaner
+
+
+class Command(BaseCommand):
+    """Удаление всех пустых папок картинок рецептов.
+
+    Сигналы удаляют только папки удаленного файла; полный обход нужен
+    периодически, после ручных правок MEDIA_ROOT и сбоев.
+    """
+
+    help = _("Remove empty folders left in MEDIA_ROOT/photos.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=2,
+            help=_("Top-level folders swept in parallel"),
+        )
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=60 * 60,
+            help=_("Skip empty folders modified less than N seconds ago"),
+        )
+
+    def handle(self, *args, **options):
+        removed = media_folder_cleaner(
+            workers=options["workers"], min_age=options["min_age"]
+        )
+        self.stdout.write(
+            self.style.SUCCESS(_("Removed folders: {}").format(removed))
+        )
@@ -0,0 +1,27 @@
+from django.core.management import BaseCommand
+from django.utils.translation import gettext_lazy as _
+
+from recipes.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    """Пересчет денормализованных счетчиков рецептов и авторов."""
+
+    help = _("Recalculate favorites, cart and recipes counters.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help=_("Only report rows with wrong counters"),
+        )
+
+    def handle(self, *args, **options):
+        drift = reconcile_counters(dry_run=options["dry_run"])
+        for counter, rows in drift.items():
+            self.stdout.write(f"{counter}: {rows}")
+        if not options["dry_run"]:
+            fixed = sum(drift.values())
+            self.stdout.write(
+                self.style.SUCCESS(_("Fixed rows: {}").format(fixed))
+            )
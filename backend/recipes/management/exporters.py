@@ -0,0 +1,45 @@
+from django.db.models import Prefetch
+
+from recipes.models import Recipe, RecipeIngredient
+
+
+def recipe_records(batch_size=1000):
+    """Все рецепты в формате импорта (RecipeParsed) в порядке id.
+
+    Рецепты читаются пачками по batch_size вместе с тегами и
+    ингредиентами, в памяти держится только текущая пачка.
+    """
+
+    recipes = (
+        Recipe.objects.order_by("id")
+        .select_related("author")
+        .prefetch_related(
+            "tags",
+            Prefetch(
+                "recipe_ingr",
+                queryset=RecipeIngredient.objects.select_related(
+                    "ingredient"
+                ).order_by("id"),
+            ),
+        )
+    )
+    for recipe in recipes.iterator(chunk_size=batch_size):
+        yield {
+            "id": recipe.id,
+            "name": recipe.name,
+            "text": recipe.text,
+            "cooking_time": recipe.cooking_time,
+            "author": recipe.author.username,
+            "image": recipe.image.name,
+            "tags": [tag.slug for tag in recipe.tags.all()],
+            "ingredients": [
+                {
+                    "name": recipe_ingredient.ingredient.name,
+                    "measurement_unit": (
+                        recipe_ingredient.ingredient.measurement_unit
+                    ),
+                    "amount": recipe_ingredient.amount,
+                }
+                for recipe_ingredient in recipe.recipe_ingr.all()
+            ],
+        }
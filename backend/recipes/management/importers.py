@@ -0,0 +1,149 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from core.utils import chunked
+from django.db import transaction
+
+from recipes.management.parsers import parse_shard, validate_records
+from recipes.models import Ingredient
+
+
+@dataclass
+class ImportStats:
+    """Итоги импорта."""
+
+    total: int = 0
+    valid: int = 0
+    inserted: int = 0
+    skipped: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+    stages: dict = field(default_factory=dict)
+    shards: list = field(default_factory=list)
+
+    @property
+    def rate(self):
+        if not self.elapsed:
+            return 0.0
+        return self.total / self.elapsed
+
+
+class IngredientImporter:
+    """Пакетная загрузка ингредиентов в одной транзакции.
+
+    Записи валидируются моделью IngredientParsed и пишутся пачками через
+    bulk_create(ignore_conflicts=True): дубликаты по уникальной паре
+    (name, measurement_unit) пропускаются самой БД. Несколько файлов
+    можно разбирать в пуле процессов, при этом пишет в БД только
+    основной процесс и отбрасывает повторы между файлами заранее.
+    """
+
+    def __init__(self, batch_size=1000, dry_run=False, on_progress=None):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.on_progress = on_progress
+        self.stats = ImportStats()
+        self.errors = []
+        self._started = None
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stats.stages[name] = self.stats.stages.get(name, 0.0) + (
+                time.perf_counter() - started
+            )
+
+    def write(self, batch):
+        if self.dry_run:
+            return
+        with self.stage("write"):
+            Ingredient.objects.bulk_create(
+                (
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                    for name, measurement_unit in batch
+                ),
+                batch_size=self.batch_size,
+                ignore_conflicts=True,
+            )
+
+    def report_progress(self):
+        self.stats.elapsed = time.perf_counter() - self._started
+        if self.on_progress is not None:
+            self.on_progress(self.stats)
+
+    @contextmanager
+    def transaction(self):
+        self._started = time.perf_counter()
+
+        with transaction.atomic():
+            count_before = 0 if self.dry_run else Ingredient.objects.count()
+            yield
+            if not self.dry_run:
+                self.stats.inserted = (
+                    Ingredient.objects.count() - count_before
+                )
+                self.stats.skipped = self.stats.valid - self.stats.inserted
+
+        self.report_progress()
+        self.stats.stages["total"] = self.stats.elapsed
+
+    def run(self, records, file_path=None):
+        """Потоковый импорт записей в текущем процессе."""
+
+        errors_before = len(self.errors)
+        with self.transaction():
+            for batch in chunked(
+                validate_records(records, file_path, self.errors),
+                self.batch_size,
+            ):
+                self.stats.valid += len(batch)
+                self.stats.failed = len(self.errors) - errors_before
+                self.stats.total = self.stats.valid + self.stats.failed
+                self.write(batch)
+                self.report_progress()
+
+        self.stats.failed = len(self.errors) - errors_before
+        self.stats.total = self.stats.valid + self.stats.failed
+        self.stats.stages["read"] = self.stats.elapsed - (
+            self.stats.stages.get("write", 0.0)
+        )
+        return self.stats
+
+    def run_shards(self, file_paths, reader, workers):
+        """Разбор файлов в пуле процессов и запись одним писателем."""
+
+        seen = set()
+        with self.transaction(), ProcessPoolExecutor(workers) as executor:
+            futures = [
+                executor.submit(parse_shard, file_path, reader)
+                for file_path in file_paths
+            ]
+            for future in as_completed(futures):
+                shard = future.result()
+                self.stats.shards.append(shard)
+                self.stats.total += shard.total
+                self.stats.valid += len(shard.rows)
+                self.stats.failed += len(shard.errors)
+                self.errors.extend(shard.errors)
+                self.stats.stages["read"] = (
+                    self.stats.stages.get("read", 0.0) + shard.elapsed
+                )
+
+                with self.stage("deduplicate"):
+                    rows = []
+                    for row in shard.rows:
+                        if row not in seen:
+                            seen.add(row)
+                            rows.append(row)
+                    shard.rows = None
+
+                for batch in chunked(rows, self.batch_size):
+                    self.write(batch)
+                self.report_progress()
+
+        return self.stats
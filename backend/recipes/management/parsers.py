@@ -1,10 +1,213 @@
-from pydantic import BaseModel
+import csv
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import PurePosixPath
+from typing import Optional
+
+from pydantic import (BaseModel, ValidationError, conint, conlist, constr,
+                      validator)
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = re.compile(r"\s*")
 
 
 class IngredientParsed(BaseModel):
-    name: str
-    measurement_unit: str
+    name: constr(strip_whitespace=True, min_length=1, max_length=128)
+    measurement_unit: constr(
+        strip_whitespace=True, min_length=1, max_length=50
+    )
+
+
+INGREDIENT_FIELDS = tuple(IngredientParsed.__fields__)
+
+
+class RecipeIngredientParsed(IngredientParsed):
+    amount: conint(gt=0)
+
+
+class RecipeParsed(BaseModel):
+    """Рецепт в NDJSON: теги по слагу, ингредиенты по названию и
+    единицам измерения, картинка - путь к файлу.
+    """
+
+    name: constr(strip_whitespace=True, min_length=1, max_length=128)
+    text: constr(min_length=1, max_length=500)
+    cooking_time: conint(ge=1)
+    author: Optional[constr(strip_whitespace=True, min_length=1)] = None
+    image: constr(strip_whitespace=True, min_length=1)
+    tags: conlist(constr(strip_whitespace=True, min_length=1), min_items=1)
+    ingredients: conlist(RecipeIngredientParsed, min_items=1)
+
+    @validator("image")
+    @classmethod
+    def relative_image(cls, image):
+        path = PurePosixPath(image)
+        if path.is_absolute() or ".." in path.parts:
+            raise ValueError(
+                "Путь к картинке должен быть относительным и без '..'"
+            )
+        return image
+
+    @validator("ingredients")
+    @classmethod
+    def unique_ingredients(cls, ingredients):
+        keys = {
+            (ingredient.name, ingredient.measurement_unit)
+            for ingredient in ingredients
+        }
+        if len(keys) != len(ingredients):
+            raise ValueError("Все ингредиенты должны быть уникальные")
+        return ingredients
+
+
+def read_csv(file_path):
+    """Построчное чтение CSV-файла."""
+
+    with open(file_path, "r", encoding="UTF-8") as file:
+        for row in csv.reader(file):
+            if len(row) == len(INGREDIENT_FIELDS):
+                yield dict(zip(INGREDIENT_FIELDS, row))
+            else:
+                yield {"row": row}
+
+
+class JSONArrayReader:
+    """Потоковое чтение JSON-массива по одному элементу.
+
+    Файл читается блоками по chunk_size, в памяти держится только
+    текущий блок и разбираемый элемент.
+    """
+
+    def __init__(self, file, chunk_size=CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.position = 0
+
+    def fill(self):
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def next_char(self):
+        while True:
+            self.position = WHITESPACE.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.fill():
+                return ""
+
+    def decode_value(self):
+        self.next_char()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(
+                    self.buffer, self.position
+                )
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # Число на границе блока могло быть прочитано не полностью.
+            if end == len(self.buffer) and self.fill():
+                continue
+            self.position = end
+            return value
+
+    def __iter__(self):
+        if self.next_char() != "[":
+            raise ValueError("Ожидался JSON-массив")
+        self.position += 1
+        if self.next_char() == "]":
+            return
+
+        while True:
+            yield self.decode_value()
+            char = self.next_char()
+            self.position += 1
+            if char == "]":
+                return
+            if char != ",":
+                raise ValueError(
+                    "Некорректный JSON-массив: ожидалась ',' или ']'"
+                )
+
+
+def read_json(file_path):
+    """Потоковое чтение JSON-файла со списком ингредиентов."""
+
+    with open(file_path, "r", encoding="UTF-8") as file:
+        yield from JSONArrayReader(file)
+
+
+def read_lines(lines):
+    """Разбор JSON Lines: одна запись на строку."""
+
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            yield {"row": line.rstrip()}
+
+
+def read_jsonl(file_path):
+    """Чтение файла JSON Lines: один ингредиент на строку."""
+
+    with open(file_path, "r", encoding="UTF-8") as file:
+        yield from read_lines(file)
+
+
+def validate_records(records, file_path, errors):
+    """Валидация записей, ошибки складываются в errors.
+
+    Возвращает пары (name, measurement_unit) - ключ уникальности
+    ингредиента.
+    """
+
+    for line, record in enumerate(records, 1):
+        try:
+            ingredient = IngredientParsed.parse_obj(record)
+        except ValidationError as error:
+            errors.append(
+                (
+                    file_path,
+                    line,
+                    record,
+                    [item["msg"] for item in error.errors()],
+                )
+            )
+            continue
+        yield ingredient.name, ingredient.measurement_unit
+
+
+@dataclass
+class ShardResult:
+    """Результат разбора одного файла."""
+
+    file_path: str
+    total: int = 0
+    rows: list = field(default_factory=list)
+    errors: list = field(default_factory=list)
+    elapsed: float = 0.0
+
 
+def parse_shard(file_path, reader):
+    """Чтение и валидация файла целиком. Выполняется в процессе пула."""
 
-class IngredientList(BaseModel):
-    __root__: list[IngredientParsed]
+    started = time.perf_counter()
+    result = ShardResult(file_path=str(file_path))
+    records = reader(file_path)
+    result.rows = list(
+        validate_records(records, result.file_path, result.errors)
+    )
+    result.total = len(result.rows) + len(result.errors)
+    result.elapsed = time.perf_counter() - started
+    return result
@@ -0,0 +1,40 @@
+from django.db import migrations
+
+CREATE_INDEXES = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS recipes_ingredient_name_trgm "
+    "ON recipes_ingredient USING gin (UPPER(name::text) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS recipes_ingredient_name_prefix "
+    "ON recipes_ingredient (UPPER(name::text) text_pattern_ops)",
+)
+
+DROP_INDEXES = (
+    "DROP INDEX IF EXISTS recipes_ingredient_name_trgm",
+    "DROP INDEX IF EXISTS recipes_ingredient_name_prefix",
+)
+
+
+def run_on_postgresql(statements):
+    """Индексы pg_trgm есть только в PostgreSQL, в SQLite шаг пропускается."""
+
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0005_alter_recipeingredient_amount"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_on_postgresql(CREATE_INDEXES),
+            run_on_postgresql(DROP_INDEXES),
+        ),
+    ]
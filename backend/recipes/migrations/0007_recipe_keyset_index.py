@@ -0,0 +1,27 @@
+# Generated by Django 4.1 on 2026-10-18 16:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0006_ingredient_name_search_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="recipe",
+            options={
+                "ordering": ("-pub_date", "-id"),
+                "verbose_name": "Рецепт",
+                "verbose_name_plural": "Рецепты",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["-pub_date", "-id"], name="recipe_pub_date_id_idx"
+            ),
+        ),
+    ]
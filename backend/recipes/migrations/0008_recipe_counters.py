@@ -0,0 +1,60 @@
+# Generated by Django 4.1 on 2026-10-18 16:56
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_related(related_model, related_field):
+    return Coalesce(
+        Subquery(
+            related_model.objects.filter(**{related_field: OuterRef("pk")})
+            .order_by()
+            .values(related_field)
+            .annotate(count=Count("pk"))
+            .values("count"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    Favorite = apps.get_model("recipes", "Favorite")
+    ShoppingCard = apps.get_model("recipes", "ShoppingCard")
+    User = apps.get_model("users", "User")
+
+    Recipe.objects.update(
+        favorites_count=count_related(Favorite, "recipe"),
+        cart_count=count_related(ShoppingCard, "recipe"),
+    )
+    User.objects.update(recipes_count=count_related(Recipe, "author"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0007_recipe_keyset_index"),
+        ("users", "0008_user_recipes_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="cart_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Добавлений в корзину"
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="favorites_count",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                verbose_name="Добавлений в избранное",
+            ),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
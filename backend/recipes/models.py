@@ -4,6 +4,7 @@ from core.models import AbstractModel
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, RegexValidator
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 User = get_user_model()
@@ -32,9 +33,18 @@ class Recipe(AbstractModel):
     cooking_time = models.PositiveIntegerField(
         _("Время приготовления"), validators=[MinValueValidator(1)]
     )
+    favorites_count = models.PositiveIntegerField(
+        _("Добавлений в избранное"), default=0, editable=False
+    )
+    cart_count = models.PositiveIntegerField(
+        _("Добавлений в корзину"), default=0, editable=False
+    )
+    image_variants = models.JSONField(
+        _("Уменьшенные копии картинки"), default=dict, editable=False
+    )
 
     class Meta:
-        ordering = ("-pub_date",)
+        ordering = ("-pub_date", "-id")
         verbose_name = _("Рецепт")
         verbose_name_plural = _("Рецепты")
         constraints = (
@@ -43,10 +53,26 @@ class Recipe(AbstractModel):
                 name="unique name + author",
             ),
         )
+        indexes = (
+            models.Index(
+                fields=("-pub_date", "-id"), name="recipe_pub_date_id_idx"
+            ),
+        )
 
     def __str__(self):
         return self.name[:50]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Запоминает загруженную картинку, чтобы при сохранении удалить
+        замененный файл без повторного чтения рецепта.
+        """
+
+        instance = super().from_db(db, field_names, values)
+        if "image" in field_names:
+            instance._loaded_image = values[field_names.index("image")]
+        return instance
+
 
 class Ingredient(AbstractModel):
     """Модель ингредиентов."""
@@ -139,6 +165,9 @@ class ShoppingCard(models.Model):
         on_delete=models.CASCADE,
         related_name="shopping_card",
     )
+    created = models.DateTimeField(
+        _("Дата добавления"), default=timezone.now, editable=False
+    )
 
     class Meta:
         ordering = ("user",)
@@ -167,6 +196,9 @@ class Favorite(models.Model):
         related_name="favorite_object",
         on_delete=models.CASCADE,
     )
+    created = models.DateTimeField(
+        _("Дата добавления"), default=timezone.now, editable=False
+    )
 
     class Meta:
         ordering = ("user",)
@@ -177,3 +209,55 @@ class Favorite(models.Model):
                 fields=("user", "recipe"), name="unique favorite"
             ),
         )
+
+
+class RecipeRanking(models.Model):
+    """Рейтинг рецепта для сортировки по популярности.
+
+    popular - взвешенная сумма добавлений в избранное и корзину.
+    trending - log2 той же суммы, где каждое добавление весит
+    2 ** ((время - RECIPE_RANKING_EPOCH) / RECIPE_TRENDING_HALF_LIFE):
+    порядок по нему совпадает с порядком по сумме с экспоненциальным
+    затуханием на любой момент времени, поэтому значения не нужно
+    пересчитывать со временем.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        verbose_name=_("Рецепт"),
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="ranking",
+    )
+    popular = models.FloatField(_("Популярность"), default=0)
+    trending = models.FloatField(_("Популярность сейчас"), null=True)
+
+    class Meta:
+        verbose_name = _("Рейтинг рецепта")
+        verbose_name_plural = _("Рейтинги рецептов")
+        indexes = (
+            models.Index(
+                fields=("-popular",), name="recipe_ranking_popular_idx"
+            ),
+            models.Index(
+                fields=("-trending",), name="recipe_ranking_trending_idx"
+            ),
+        )
+
+
+class RecipeRankingEvent(models.Model):
+    """Необработанное изменение рейтинга.
+
+    Пишется сигналами при добавлении/удалении из избранного и корзины
+    и сворачивается в RecipeRanking командой update_recipe_ranking.
+    Ссылки на рецепт нет, чтобы событие удаления пережило каскадное
+    удаление рецепта.
+    """
+
+    recipe_id = models.BigIntegerField(_("Рецепт"))
+    weight = models.FloatField(_("Вес"))
+    created = models.DateTimeField(_("Время события"))
+
+    class Meta:
+        verbose_name = _("Событие рейтинга")
+        verbose_name_plural = _("События рейтинга")
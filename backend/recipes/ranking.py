@@ -0,0 +1,154 @@
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from recipes.models import (Favorite, Recipe, RecipeRanking,
+                            RecipeRankingEvent, ShoppingCard)
+
+# (модель, ключ веса в RECIPE_RANKING_WEIGHTS)
+RANKING_SOURCES = ((Favorite, "favorite"), (ShoppingCard, "shopping_cart"))
+
+
+def event_exponent(created):
+    """Показатель степени двойки для веса события в trending."""
+
+    return (
+        created - settings.RECIPE_RANKING_EPOCH
+    ).total_seconds() / settings.RECIPE_TRENDING_HALF_LIFE
+
+
+def add_log2(log_total, terms):
+    """log2(2 ** log_total + sum(weight * 2 ** exponent)).
+
+    Сумма считается относительно наибольшего показателя, чтобы
+    не переполнить float. Нулевая или отрицательная сумма - None.
+    """
+
+    exponents = [exponent for _, exponent in terms]
+    if log_total is not None:
+        exponents.append(log_total)
+    if not exponents:
+        return log_total
+
+    base = max(exponents)
+    total = 0.0 if log_total is None else 2 ** (log_total - base)
+    total += sum(weight * 2 ** (exponent - base) for weight, exponent in terms)
+    if total <= 1e-9:
+        return None
+    return base + math.log2(total)
+
+
+class RankingDelta:
+    """Накопленные изменения рейтингов по рецептам."""
+
+    def __init__(self):
+        self.popular = defaultdict(float)
+        self.trending = defaultdict(list)
+
+    def add(self, recipe_id, weight, created):
+        self.popular[recipe_id] += weight
+        self.trending[recipe_id].append((weight, event_exponent(created)))
+
+    def apply(self, rankings):
+        for recipe_id, ranking in rankings.items():
+            ranking.popular = max(
+                ranking.popular + self.popular[recipe_id], 0.0
+            )
+            ranking.trending = add_log2(
+                ranking.trending, self.trending[recipe_id]
+            )
+
+
+def record_event(instance, sign):
+    """Событие изменения рейтинга от записи избранного или корзины."""
+
+    for model, weight_key in RANKING_SOURCES:
+        if isinstance(instance, model):
+            RecipeRankingEvent.objects.create(
+                recipe_id=instance.recipe_id,
+                weight=sign * settings.RECIPE_RANKING_WEIGHTS[weight_key],
+                created=instance.created,
+            )
+
+
+def save_rankings(delta, replace=False):
+    recipe_ids = set(
+        Recipe.objects.filter(id__in=delta.popular).values_list(
+            "id", flat=True
+        )
+    )
+    if replace:
+        RecipeRanking.objects.all().delete()
+        rankings = {}
+    else:
+        rankings = RecipeRanking.objects.select_for_update().in_bulk(
+            recipe_ids
+        )
+    created = {
+        recipe_id: RecipeRanking(recipe_id=recipe_id)
+        for recipe_id in recipe_ids - rankings.keys()
+    }
+    rankings.update(created)
+    delta.apply(rankings)
+
+    batch_size = settings.RECIPE_RANKING_BATCH_SIZE
+    RecipeRanking.objects.bulk_create(
+        created.values(), batch_size=batch_size
+    )
+    RecipeRanking.objects.bulk_update(
+        [
+            ranking
+            for recipe_id, ranking in rankings.items()
+            if recipe_id not in created
+        ],
+        ("popular", "trending"),
+        batch_size=batch_size,
+    )
+    return len(rankings)
+
+
+def update_rankings():
+    """Свертка новых событий в рейтинг, пачками по id событий.
+
+    Возвращает кол-во обработанных событий и обновленных рейтингов.
+    """
+
+    events_count = rankings_count = 0
+    while True:
+        with transaction.atomic():
+            events = list(
+                RecipeRankingEvent.objects.order_by("id").values_list(
+                    "id", "recipe_id", "weight", "created"
+                )[: settings.RECIPE_RANKING_BATCH_SIZE]
+            )
+            if not events:
+                return events_count, rankings_count
+
+            delta = RankingDelta()
+            for _, recipe_id, weight, created in events:
+                delta.add(recipe_id, weight, created)
+            rankings_count += save_rankings(delta)
+            RecipeRankingEvent.objects.filter(
+                id__lte=events[-1][0]
+            ).delete()
+            events_count += len(events)
+
+
+def rebuild_rankings():
+    """Полный пересчет рейтинга по таблицам избранного и корзины."""
+
+    with transaction.atomic():
+        last_event = RecipeRankingEvent.objects.order_by("id").last()
+        delta = RankingDelta()
+        for model, weight_key in RANKING_SOURCES:
+            weight = settings.RECIPE_RANKING_WEIGHTS[weight_key]
+            for recipe_id, created in model.objects.order_by().values_list(
+                "recipe_id", "created"
+            ).iterator(chunk_size=settings.RECIPE_RANKING_BATCH_SIZE):
+                delta.add(recipe_id, weight, created)
+
+        if last_event is not None:
+            RecipeRankingEvent.objects.filter(id__lte=last_event.id).delete()
+        return save_rankings(delta, replace=True)
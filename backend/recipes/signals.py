@@ -1,39 +1,98 @@
-from django.db.models.signals import post_delete, pre_save
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
-from recipes.models import Recipe
-from recipes.utils import media_folder_cleaner
+from recipes.counters import change_counter
+from recipes.models import Favorite, Recipe, ShoppingCard, User
+from recipes.ranking import record_event
+from recipes.utils import delete_media_file
 
 
 @receiver(post_delete, sender=Recipe)
 def post_delete_image(sender, instance, *args, **kwargs):
-    """Сигнал на удаление картинки."""
+    """Сигнал на удаление картинки.
+
+    Файл и опустевшие папки удаляются после фиксации транзакции.
+    """
 
-    try:
-        instance.image.delete(save=False)
-        media_folder_cleaner()
-    except Exception:
-        pass
+    if instance.image:
+        transaction.on_commit(partial(delete_media_file, instance.image.name))
 
 
 @receiver(pre_save, sender=Recipe)
 def pre_save_image(sender, instance, *args, **kwargs):
-    """Сигнал на удаление старой картинки при обновлении картинки."""
-
-    try:
-        old_img = instance.__class__.objects.get(id=instance.id).image.path
-        try:
-            new_img = instance.image.path
-        except Exception:
-            new_img = None
-        if new_img != old_img:
-            import os
-
-            if os.path.exists(old_img):
-                os.remove(old_img)
-                media_folder_cleaner()
-    except Exception:
-        pass
+    """Сигнал на удаление старой картинки при обновлении картинки.
+
+    Старая картинка берется из загруженного рецепта, запрос к БД
+    нужен только для созданных вручную объектов с id.
+    """
+
+    if instance.id is None:
+        return
+
+    if hasattr(instance, "_loaded_image"):
+        old_image = instance._loaded_image
+    else:
+        old_image = (
+            sender.objects.filter(id=instance.id)
+            .values_list("image", flat=True)
+            .first()
+        )
+    if old_image and old_image != instance.image.name:
+        transaction.on_commit(partial(delete_media_file, old_image))
+
+
+@receiver(post_save, sender=Recipe)
+def remember_image(sender, instance, *args, **kwargs):
+    """Сохраненная картинка становится исходной для следующего save."""
+
+    instance._loaded_image = instance.image.name
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def update_favorites_count(sender, instance, created=False, **kwargs):
+    """Счетчик добавлений рецепта в избранное."""
+
+    if created or kwargs["signal"] is post_delete:
+        change_counter(
+            Recipe, instance.recipe_id, "favorites_count", 1 if created else -1
+        )
+
+
+@receiver(post_save, sender=ShoppingCard)
+@receiver(post_delete, sender=ShoppingCard)
+def update_cart_count(sender, instance, created=False, **kwargs):
+    """Счетчик добавлений рецепта в корзину."""
+
+    if created or kwargs["signal"] is post_delete:
+        change_counter(
+            Recipe, instance.recipe_id, "cart_count", 1 if created else -1
+        )
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def update_recipes_count(sender, instance, created=False, **kwargs):
+    """Счетчик рецептов автора."""
+
+    if created or kwargs["signal"] is post_delete:
+        change_counter(
+            User, instance.author_id, "recipes_count", 1 if created else -1
+        )
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCard)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCard)
+def record_ranking_event(sender, instance, created=False, **kwargs):
+    """Событие для инкрементального пересчета рейтинга рецептов."""
+
+    if created or kwargs["signal"] is post_delete:
+        record_event(instance, 1 if created else -1)
 
 
 post_delete.connect(post_delete_image, sender=Recipe)
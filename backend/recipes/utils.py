@@ -1,17 +1,85 @@
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
 from django.conf import settings
+from django.core.files.storage import default_storage
 
 
-def media_folder_cleaner():
-    """Удаление пустых папок."""
+def photos_root():
+    return Path(settings.MEDIA_ROOT) / "photos"
 
-    media_path = settings.MEDIA_ROOT / "photos"
 
-    for dirpath, _, _ in os.walk(media_path, topdown=False):
-        if dirpath == media_path:
+def prune_empty_dirs(path, root=None):
+    """Удаление опустевших папок файла path снизу вверх до root."""
+
+    root = Path(root or photos_root())
+    directory = Path(path).parent
+    while root in directory.parents:
+        try:
+            directory.rmdir()
+        except OSError:
             break
+        directory = directory.parent
+
+
+def delete_media_file(name):
+    """Удаление файла из хранилища вместе с опустевшими папками."""
+
+    default_storage.delete(name)
+    try:
+        path = default_storage.path(name)
+    except NotImplementedError:
+        return
+    prune_empty_dirs(path)
+
+
+def sweep_empty_dirs(top, min_age=0):
+    """Удаление пустых папок поддерева top, включая саму top.
+
+    Пустые папки, измененные менее min_age секунд назад, пропускаются:
+    в них может идти загрузка. Папки, опустевшие при самом обходе,
+    удаляются независимо от времени изменения.
+    """
+
+    deadline = time.time() - min_age
+    removed = set()
+    for dirpath, dirnames, filenames in os.walk(top, topdown=False):
+        if filenames or any(
+            os.path.join(dirpath, dirname) not in removed
+            for dirname in dirnames
+        ):
+            continue
         try:
+            if not dirnames and os.stat(dirpath).st_mtime > deadline:
+                continue
             os.rmdir(dirpath)
         except OSError:
-            pass
+            continue
+        removed.add(dirpath)
+    return len(removed)
+
+
+def media_folder_cleaner(workers=1, min_age=0):
+    """Удаление всех пустых папок в MEDIA_ROOT/photos.
+
+    Полный обход дерева: папки верхнего уровня обходятся параллельно,
+    не более чем в workers потоков. Возвращает число удаленных папок.
+    """
+
+    root = photos_root()
+    if not root.is_dir():
+        return 0
+
+    subtrees = [
+        entry.path
+        for entry in os.scandir(root)
+        if entry.is_dir(follow_symlinks=False)
+    ]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return sum(
+            executor.map(
+                lambda top: sweep_empty_dirs(top, min_age), subtrees
+            )
+        )
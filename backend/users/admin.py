@@ -3,12 +3,12 @@ from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import Group
 from django.utils.translation import gettext_lazy as _
 
-from recipes.admin import BaseReadOnlyAdmin
+from recipes.admin import BaseReadOnlyAdmin, SaveEditableFieldsMixin
 from .models import Subscription, User
 
 
 @admin.register(User)
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(SaveEditableFieldsMixin, UserAdmin):
     """Админка для управления пользователями."""
 
     list_display = (
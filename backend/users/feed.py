@@ -0,0 +1,194 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from recipes.models import Recipe
+
+from users.models import Subscription, TimelineEntry, User
+
+
+def is_built(user_id):
+    return User.objects.filter(id=user_id, timeline_built=True).exists()
+
+
+def uses_timeline(user):
+    """Лента пользователя полностью материализована в TimelineEntry.
+
+    Флаг читается из БД, а не с объекта запроса: его меняют подписки,
+    и пока лента не построена, отдается fan-out-on-read.
+    """
+
+    if settings.SUBSCRIPTION_FEED_TIMELINE_THRESHOLD is None:
+        return False
+    return is_built(user.id)
+
+
+def fan_out_on_read(user):
+    """Рецепты авторов из подписок одним запросом с JOIN подписок."""
+
+    return Recipe.objects.filter(author__subscribe_object__user=user).annotate(
+        feed_date=F("pub_date"), feed_id=F("id")
+    )
+
+
+def materialized(user):
+    """Рецепты из материализованной ленты пользователя.
+
+    Ключ пагинации берется из записи ленты, чтобы выборка шла по индексу
+    (user, -pub_date, -recipe) таблицы ленты.
+    """
+
+    return Recipe.objects.filter(timeline__user=user).annotate(
+        feed_date=F("timeline__pub_date"), feed_id=F("timeline__recipe_id")
+    )
+
+
+def get_feed(user):
+    if uses_timeline(user):
+        return materialized(user)
+    return fan_out_on_read(user)
+
+
+def create_entries(entries):
+    TimelineEntry.objects.bulk_create(
+        entries,
+        batch_size=settings.SUBSCRIPTION_FEED_TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def add_recipe(recipe):
+    """Запись нового рецепта в ленты подписчиков автора (fan-out-on-write)."""
+
+    add_new_recipes((recipe,))
+
+
+def add_new_recipes(recipes):
+    """Запись пачки новых рецептов в ленты подписчиков их авторов.
+
+    Один запрос подписок на всех авторов пачки: нужен импорту, который
+    создает рецепты в обход сигналов.
+    """
+
+    threshold = settings.SUBSCRIPTION_FEED_TIMELINE_THRESHOLD
+    if threshold is None:
+        return
+    author_recipes = defaultdict(list)
+    for recipe in recipes:
+        author_recipes[recipe.author_id].append(recipe)
+    subscriptions = (
+        Subscription.objects.filter(
+            author_id__in=author_recipes, user__timeline_built=True
+        )
+        .values_list("user_id", "author_id")
+        .iterator()
+    )
+    create_entries(
+        TimelineEntry(
+            user_id=user_id,
+            recipe_id=recipe.id,
+            author_id=author_id,
+            pub_date=recipe.pub_date,
+        )
+        for user_id, author_id in subscriptions
+        for recipe in author_recipes[author_id]
+    )
+
+
+def add_recipes(user_id, recipes):
+    create_entries(
+        TimelineEntry(
+            user_id=user_id,
+            recipe_id=recipe_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for recipe_id, author_id, pub_date in recipes.values_list(
+            "id", "author_id", "pub_date"
+        ).iterator()
+    )
+
+
+def build(user_id):
+    """Построение ленты пользователя с нуля и отметка о готовности."""
+
+    with transaction.atomic():
+        User.objects.filter(id=user_id).update(timeline_built=True)
+        TimelineEntry.objects.filter(user_id=user_id).delete()
+        add_recipes(
+            user_id,
+            Recipe.objects.filter(author__subscribe_object__user=user_id),
+        )
+
+
+def drop(user_id):
+    """Удаление ленты пользователя: дальше он читает fan-out-on-read."""
+
+    with transaction.atomic():
+        User.objects.filter(id=user_id).update(timeline_built=False)
+        TimelineEntry.objects.filter(user_id=user_id).delete()
+
+
+def subscribe(user_id, author_id, subscriptions_count):
+    """В построенную ленту добавляются рецепты нового автора, а лента
+    пользователя на пороге подписок и выше строится целиком.
+
+    Готовность ленты берется из флага, а не из равенства порогу: счетчик
+    перескакивает порог при параллельных подписках, пересчете счетчиков
+    и смене самого порога.
+    """
+
+    threshold = settings.SUBSCRIPTION_FEED_TIMELINE_THRESHOLD
+    if threshold is None:
+        return
+    if is_built(user_id):
+        add_recipes(user_id, Recipe.objects.filter(author_id=author_id))
+    elif subscriptions_count >= threshold:
+        build(user_id)
+
+
+def unsubscribe(user_id, author_id, subscriptions_count):
+    """Удаление рецептов автора из ленты или всей ленты, если кол-во
+    подписок опустилось ниже порога.
+    """
+
+    threshold = settings.SUBSCRIPTION_FEED_TIMELINE_THRESHOLD
+    if threshold is None or not is_built(user_id):
+        return
+    if subscriptions_count < threshold:
+        drop(user_id)
+    else:
+        TimelineEntry.objects.filter(
+            user_id=user_id, author_id=author_id
+        ).delete()
+
+
+def rebuild(rebuild_all=False):
+    """Приведение лент в соответствие с порогом подписок.
+
+    Строит ленты пользователей на пороге и выше, у которых она не
+    построена (или всем при rebuild_all), и удаляет ленты ниже порога.
+    Возвращает кол-во построенных и удаленных лент.
+    """
+
+    threshold = settings.SUBSCRIPTION_FEED_TIMELINE_THRESHOLD
+    users = User.objects.all()
+    if threshold is None:
+        stale = users.filter(timeline_built=True)
+        to_build = users.none()
+    else:
+        stale = users.filter(
+            timeline_built=True, subscriptions_count__lt=threshold
+        )
+        to_build = users.filter(subscriptions_count__gte=threshold)
+        if not rebuild_all:
+            to_build = to_build.filter(timeline_built=False)
+    dropped = built = 0
+    for user_id in stale.values_list("id", flat=True).iterator():
+        drop(user_id)
+        dropped += 1
+    for user_id in to_build.values_list("id", flat=True).iterator():
+        build(user_id)
+        built += 1
+    return built, dropped
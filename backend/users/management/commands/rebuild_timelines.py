@@ -0,0 +1,25 @@
+from django.core.management import BaseCommand
+from django.utils.translation import gettext_lazy as _
+
+from users.feed import rebuild
+
+
+class Command(BaseCommand):
+    """Построение недостающих и удаление лишних материализованных лент."""
+
+    help = _("Build missing subscription timelines and drop stale ones.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help=_("Rebuild every timeline above the threshold from scratch"),
+        )
+
+    def handle(self, *args, **options):
+        built, dropped = rebuild(rebuild_all=options["all"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                _("Built timelines: {}, dropped: {}").format(built, dropped)
+            )
+        )
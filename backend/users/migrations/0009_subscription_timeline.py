@@ -0,0 +1,88 @@
+# Generated by Django 4.1 on 2026-10-18 17:01
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def fill_timelines(apps, schema_editor):
+    User = apps.get_model("users", "User")
+    Subscription = apps.get_model("users", "Subscription")
+    Recipe = apps.get_model("recipes", "Recipe")
+    TimelineEntry = apps.get_model("users", "TimelineEntry")
+
+    User.objects.update(
+        subscriptions_count=Coalesce(
+            Subquery(
+                Subscription.objects.filter(user=OuterRef("pk"))
+                .order_by()
+                .values("user")
+                .annotate(count=Count("pk"))
+                .values("count"),
+                output_field=IntegerField(),
+            ),
+            0,
+        )
+    )
+
+    threshold = settings.SUBSCRIPTION_FEED_TIMELINE_THRESHOLD
+    if threshold is None:
+        return
+    for user_id in User.objects.filter(
+        subscriptions_count__gte=threshold
+    ).values_list("id", flat=True):
+        TimelineEntry.objects.bulk_create(
+            (
+                TimelineEntry(
+                    user_id=user_id,
+                    recipe_id=recipe_id,
+                    author_id=author_id,
+                    pub_date=pub_date,
+                )
+                for recipe_id, author_id, pub_date in Recipe.objects.filter(
+                    author__subscribe_object__user=user_id
+                ).values_list("id", "author_id", "pub_date").iterator()
+            ),
+            batch_size=settings.SUBSCRIPTION_FEED_TIMELINE_BATCH_SIZE,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_ranking'),
+        ('users', '0008_user_recipes_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='subscriptions_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Кол-во подписок'),
+        ),
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации рецепта')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи ленты',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-pub_date', '-recipe'], name='timeline_user_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique timeline recipe'),
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
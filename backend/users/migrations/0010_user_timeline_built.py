@@ -0,0 +1,30 @@
+# Generated by Django 4.1 on 2026-10-18 21:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_built_timelines(apps, schema_editor):
+    threshold = settings.SUBSCRIPTION_FEED_TIMELINE_THRESHOLD
+    if threshold is None:
+        return
+    User = apps.get_model("users", "User")
+    User.objects.filter(subscriptions_count__gte=threshold).update(
+        timeline_built=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_subscription_timeline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='timeline_built',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Лента материализована'),
+        ),
+        migrations.RunPython(mark_built_timelines, migrations.RunPython.noop),
+    ]
@@ -95,6 +95,15 @@ class User(AbstractBaseUser, PermissionsMixin):
         default=False,
         help_text=_("Заблокирован ли пользователь."),
     )
+    recipes_count = models.PositiveIntegerField(
+        _("Кол-во рецептов"), default=0, editable=False
+    )
+    subscriptions_count = models.PositiveIntegerField(
+        _("Кол-во подписок"), default=0, editable=False
+    )
+    timeline_built = models.BooleanField(
+        _("Лента материализована"), default=False, editable=False
+    )
 
     @property
     def is_admin(self):
@@ -148,3 +157,46 @@ class Subscription(models.Model):
                 fields=("user", "author"), name="unique subscription"
             ),
         )
+
+
+class TimelineEntry(models.Model):
+    """Рецепт в материализованной ленте подписок пользователя.
+
+    Ведется только для пользователей с большим кол-вом подписок
+    (SUBSCRIPTION_FEED_TIMELINE_THRESHOLD), см. users.feed.
+    """
+
+    user = models.ForeignKey(
+        User,
+        verbose_name=_("Пользователь"),
+        related_name="timeline",
+        on_delete=models.CASCADE,
+    )
+    recipe = models.ForeignKey(
+        "recipes.Recipe",
+        verbose_name=_("Рецепт"),
+        related_name="timeline",
+        on_delete=models.CASCADE,
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name=_("Автор"),
+        related_name="+",
+        on_delete=models.CASCADE,
+    )
+    pub_date = models.DateTimeField(_("Дата публикации рецепта"))
+
+    class Meta:
+        verbose_name = _("Запись ленты")
+        verbose_name_plural = _("Записи ленты")
+        constraints = (
+            models.UniqueConstraint(
+                fields=("user", "recipe"), name="unique timeline recipe"
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=("user", "-pub_date", "-recipe"),
+                name="timeline_user_pub_date_idx",
+            ),
+        )
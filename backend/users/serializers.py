@@ -1,16 +1,33 @@
-import re
-
+from django.db import models
 from djoser.serializers import UserSerializer as DefaultUserSerializer
 from recipes.models import Recipe
 from rest_framework import serializers
 
+from api.images import ImageSrcsetField
 from users.models import Subscription, User
+from users.utils import AuthorPayloadLoader
 
 
 class UserRecipeSerializer(serializers.ModelSerializer):
+    image_srcset = ImageSrcsetField()
+
     class Meta:
         model = Recipe
-        fields = ("id", "name", "image", "cooking_time")
+        fields = ("id", "name", "image", "image_srcset", "cooking_time")
+
+
+class AuthorPayloadListSerializer(serializers.ListSerializer):
+    """Предзагрузка вложенных данных всех авторов страницы."""
+
+    author_id_attr = "id"
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        objects = list(iterable)
+        AuthorPayloadLoader.from_context(self.context).load(
+            getattr(obj, self.author_id_attr) for obj in objects
+        )
+        return super().to_representation(objects)
 
 
 class CustomUserSerializer(DefaultUserSerializer):
@@ -18,33 +35,23 @@ class CustomUserSerializer(DefaultUserSerializer):
 
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField()
 
     def get_is_subscribed(self, obj):
         if self.context["request"].user.is_authenticated:
             if hasattr(obj, "is_subscribed"):
                 return obj.is_subscribed
-            return Subscription.objects.filter(
-                user=self.context["request"].user, author=obj
-            ).exists()
+            return self.loader.is_subscribed(obj.id)
         return False
 
     def get_recipes(self, obj):
-        recipe_count = 3
-        path = self.context["request"].get_full_path()
-        recipe_limit = re.search(r"recipes_limit=(\d+)", path)
-
-        if recipe_limit:
-            recipe_count = int(recipe_limit.group(1))
-
         return UserRecipeSerializer(
-            Recipe.objects.filter(author=obj)[:recipe_count], many=True
+            self.loader.get_recipes(obj.id), many=True
         ).data
 
-    def get_recipes_count(self, obj):
-        if hasattr(obj, "recipes_count"):
-            return obj.recipes_count
-        return Recipe.objects.filter(author=obj).count()
+    @property
+    def loader(self):
+        return AuthorPayloadLoader.from_context(self.context)
 
     class Meta:
         model = User
@@ -58,6 +65,7 @@ class CustomUserSerializer(DefaultUserSerializer):
             "recipes",
             "recipes_count",
         )
+        list_serializer_class = AuthorPayloadListSerializer
 
 
 class SubscribeSerializer(serializers.ModelSerializer):
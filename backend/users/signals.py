@@ -0,0 +1,44 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from recipes.counters import change_counter
+from recipes.models import Recipe
+
+from users import feed
+from users.models import Subscription, User
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def update_subscriptions(sender, instance, created=False, **kwargs):
+    """Счетчик подписок и материализованная лента подписчика."""
+
+    if not created and kwargs["signal"] is not post_delete:
+        return
+
+    change_counter(
+        User, instance.user_id, "subscriptions_count", 1 if created else -1
+    )
+    subscriptions_count = (
+        User.objects.filter(id=instance.user_id)
+        .values_list("subscriptions_count", flat=True)
+        .first()
+    )
+    if subscriptions_count is None:
+        return
+
+    if created:
+        feed.subscribe(
+            instance.user_id, instance.author_id, subscriptions_count
+        )
+    else:
+        feed.unsubscribe(
+            instance.user_id, instance.author_id, subscriptions_count
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def add_to_timelines(sender, instance, created, **kwargs):
+    """Новый рецепт в материализованные ленты подписчиков автора."""
+
+    if created:
+        feed.add_recipe(instance)
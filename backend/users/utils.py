@@ -0,0 +1,104 @@
+import re
+
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from recipes.models import Recipe
+
+from users.models import Subscription
+
+DEFAULT_RECIPES_LIMIT = 3
+
+
+def get_recipes_limit(request):
+    """Кол-во рецептов автора из параметра recipes_limit."""
+
+    recipe_limit = re.search(r"recipes_limit=(\d+)", request.get_full_path())
+    if recipe_limit:
+        return int(recipe_limit.group(1))
+    return DEFAULT_RECIPES_LIMIT
+
+
+class AuthorPayloadLoader:
+    """Пакетная загрузка вложенных данных автора.
+
+    Для всех авторов страницы одним запросом достаются последние рецепты
+    (ROW_NUMBER() OVER (PARTITION BY author_id)), вторым - подписки
+    текущего пользователя. Кол-во рецептов хранится в User.recipes_count.
+    """
+
+    context_key = "author_payload_loader"
+
+    def __init__(self, request):
+        self.request = request
+        self.recipes_limit = get_recipes_limit(request)
+        self._loaded = set()
+        self._recipes = {}
+        self._subscriptions = set()
+
+    @classmethod
+    def from_context(cls, context):
+        """Один загрузчик на весь корневой сериализатор."""
+
+        if cls.context_key not in context:
+            context[cls.context_key] = cls(context["request"])
+        return context[cls.context_key]
+
+    def load(self, author_ids):
+        to_load = set(author_ids) - self._loaded
+        if not to_load:
+            return
+
+        self._loaded |= to_load
+        self._load_recipes(to_load)
+
+        user = self.request.user
+        if user.is_authenticated:
+            self._subscriptions.update(
+                Subscription.objects.filter(
+                    user=user, author_id__in=to_load
+                ).values_list("author_id", flat=True)
+            )
+
+    def _load_recipes(self, author_ids):
+        for author_id in author_ids:
+            self._recipes[author_id] = []
+        if self.recipes_limit == 0:
+            return
+
+        ranked = (
+            Recipe.objects.filter(author_id__in=author_ids)
+            .order_by()
+            .annotate(
+                row_number=Window(
+                    RowNumber(),
+                    partition_by=F("author_id"),
+                    order_by=(F("pub_date").desc(), F("id").desc()),
+                ),
+            )
+            .values(
+                "id",
+                "name",
+                "image",
+                "image_variants",
+                "cooking_time",
+                "author_id",
+                "row_number",
+            )
+        )
+        sql, params = ranked.query.sql_with_params()
+        recipes = Recipe.objects.raw(
+            f"SELECT * FROM ({sql}) ranked WHERE row_number <= %s "
+            f"ORDER BY author_id, row_number",
+            (*params, self.recipes_limit),
+        )
+
+        for recipe in recipes:
+            self._recipes[recipe.author_id].append(recipe)
+
+    def get_recipes(self, author_id):
+        self.load((author_id,))
+        return self._recipes[author_id]
+
+    def is_subscribed(self, author_id):
+        self.load((author_id,))
+        return author_id in self._subscriptions
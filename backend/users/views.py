@@ -1,12 +1,15 @@
-from django.db.models import Count, Exists, OuterRef
 from djoser.views import UserViewSet as DefaultUserViewSet
 from rest_framework.exceptions import ValidationError
 from rest_framework.generics import CreateAPIView, DestroyAPIView, ListAPIView
+from rest_framework.permissions import IsAuthenticated
 
+from .feed import get_feed
 from .models import Subscription, User
 from .serializers import CustomUserSerializer, SubscribeSerializer
 from api.permissions import IsNotBlockedOrReadOnly
-from api.pagination import CustomPagination
+from api.pagination import CustomPagination, SubscriptionFeedPagination
+from api.serializers import RecipeReadSerializer
+from api.utils import with_read_relations
 
 
 class UserViewSet(DefaultUserViewSet):
@@ -15,17 +18,7 @@ class UserViewSet(DefaultUserViewSet):
     http_method_names = ("get", "post")
 
     def get_queryset(self):
-        return (
-            User.objects.all()
-            .annotate(recipes_count=Count("recipes"))
-            .annotate(
-                is_subscribed=Exists(
-                    Subscription.objects.filter(
-                        user=self.request.user, author=OuterRef("pk")
-                    )
-                )
-            )
-        )
+        return User.objects.all()
 
 
 class SubscribeView(CreateAPIView, DestroyAPIView):
@@ -69,4 +62,21 @@ class SubscribeListView(ListAPIView):
             id__in=Subscription.objects.filter(user=self.request.user).values(
                 "author"
             )
-        ).annotate(recipes_count=Count("recipes"))
+        )
+
+
+class SubscriptionFeedView(ListAPIView):
+    """Лента рецептов авторов из подписок, от новых к старым.
+
+    Для пользователей с большим кол-вом подписок читается
+    материализованная лента, для остальных - выборка с JOIN подписок.
+    """
+
+    permission_classes = (IsAuthenticated,)
+    serializer_class = RecipeReadSerializer
+    pagination_class = SubscriptionFeedPagination
+
+    def get_queryset(self):
+        return with_read_relations(
+            get_feed(self.request.user), self.request.user
+        )
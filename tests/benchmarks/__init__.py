@@ -0,0 +1,63 @@
+"""Бенчмарки.
+
+Не собираются pytest'ом, запускаются из корня репозитория:
+
+    python -m tests.benchmarks.<имя модуля>
+
+По умолчанию используется SQLite в памяти, для замеров на PostgreSQL
+достаточно задать переменные окружения DB_* как для приложения.
+"""
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent.parent / "backend"
+
+
+def setup_django():
+    """Настройка Django и создание таблиц."""
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "foodgram.settings")
+    os.environ.setdefault("DB_ENGINE", "django.db.backends.sqlite3")
+    os.environ.setdefault("DB_NAME", ":memory:")
+
+    import django
+    from django.core.management import call_command
+
+    django.setup()
+    call_command("migrate", verbosity=0)
+
+
+def measure(func, repeat=5):
+    """Медианное время (мс) и пиковая память (КБ) вызова func."""
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return sorted(timings)[len(timings) // 2], peak / 1024
+
+
+def print_table(header, rows):
+    """Вывод результатов в виде таблицы."""
+
+    widths = [
+        max(len(str(value)) for value in column)
+        for column in zip(header, *rows)
+    ]
+    for row in (header, *rows):
+        print(
+            "  ".join(
+                str(value).rjust(width) for value, width in zip(row, widths)
+            )
+        )
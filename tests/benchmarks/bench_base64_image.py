@@ -0,0 +1,108 @@
+"""Декодирование картинки из Base64: целиком в память против по кускам.
+
+Для PNG размером около 1, 4 и 8 МБ замеряются время и пиковая память
+разбора поля image (строка запроса уже в памяти и в замер не входит),
+а также отказ по разрешению для картинки больше
+RECIPE_IMAGE_MAX_PIXELS.
+
+    python -m tests.benchmarks.bench_base64_image
+"""
+import base64
+import os
+import uuid
+from io import BytesIO
+
+from tests.benchmarks import measure, print_table, setup_django
+
+SIZES_MB = (1, 4, 8)
+
+
+def make_payload(size_mb):
+    """PNG из шума: почти не сжимается, размер файла ~ числу пикселей."""
+
+    from PIL import Image
+
+    side = int((size_mb * 1024 * 1024 / 3) ** 0.5)
+    image = Image.frombytes("RGB", (side, side), os.urandom(side * side * 3))
+    buffer = BytesIO()
+    image.save(buffer, "PNG", compress_level=1)
+    return len(buffer.getvalue()), "data:image/png;base64," + (
+        base64.b64encode(buffer.getvalue()).decode()
+    )
+
+
+def legacy_decode(data):
+    """Прежняя реализация Base64ImageField.to_internal_value."""
+
+    from django.core.files.base import ContentFile
+    from rest_framework import serializers
+
+    format, encoded_image = data.split(";base64,")
+    extension = format.split("/")[-1]
+    data = ContentFile(
+        base64.b64decode(encoded_image),
+        name=f"{uuid.uuid4().hex}.{extension}",
+    )
+    return serializers.ImageField().to_internal_value(data)
+
+
+def main():
+    setup_django()
+
+    from django.conf import settings
+    from django.test.utils import override_settings
+    from rest_framework.exceptions import ValidationError
+
+    from api.serializers import Base64ImageField
+
+    field = Base64ImageField()
+
+    def chunked_decode(data):
+        try:
+            return field.to_internal_value(data)
+        except ValidationError:
+            return None
+
+    rows = []
+    for size_mb in SIZES_MB:
+        size, payload = make_payload(size_mb)
+        legacy_timing, legacy_peak = measure(lambda: legacy_decode(payload))
+        chunked_timing, chunked_peak = measure(
+            lambda: chunked_decode(payload)
+        )
+        rows.append(
+            (
+                f"{size / 1024 / 1024:.1f}",
+                f"{legacy_timing:.1f}",
+                f"{legacy_peak:.0f}",
+                f"{chunked_timing:.1f}",
+                f"{chunked_peak:.0f}",
+            )
+        )
+
+    print(f"spool in memory up to: {settings.FILE_UPLOAD_MAX_MEMORY_SIZE} B")
+    print_table(
+        (
+            "image MB",
+            "legacy ms",
+            "peak KB",
+            "chunked ms",
+            "peak KB",
+        ),
+        rows,
+    )
+
+    _, payload = make_payload(SIZES_MB[-1])
+    with override_settings(RECIPE_IMAGE_MAX_PIXELS=1000 * 1000):
+        assert chunked_decode(payload) is None
+        rejected_timing, rejected_peak = measure(
+            lambda: chunked_decode(payload)
+        )
+    print(
+        f"rejected by resolution: {rejected_timing:.1f} ms, "
+        f"peak {rejected_peak:.0f} KB"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Поиск ингредиентов: icontains без лимита против ранжированного поиска.
+
+Каталог ingredients.csv увеличивается в SCALE раз.
+
+    python -m tests.benchmarks.bench_ingredient_search
+"""
+import csv
+
+from tests.benchmarks import BACKEND_DIR, measure, print_table, setup_django
+
+SCALE = 100
+QUERIES = ("с", "са", "сах", "молоко", "ый", "сливочное")
+
+
+def load_catalogue():
+    from recipes.models import Ingredient
+
+    csv_path = BACKEND_DIR / "backend_static" / "data" / "ingredients.csv"
+    with open(csv_path, encoding="UTF-8") as file:
+        rows = list(csv.reader(file))
+
+    for copy in range(SCALE):
+        suffix = f" {copy}" if copy else ""
+        Ingredient.objects.bulk_create(
+            (
+                Ingredient(name=name + suffix, measurement_unit=unit)
+                for name, unit in rows
+            ),
+            batch_size=1000,
+        )
+    return len(rows) * SCALE
+
+
+def main():
+    setup_django()
+
+    from api.filters import IngredientSearchFilter
+    from recipes.models import Ingredient
+
+    total = load_catalogue()
+    print(f"ingredients: {total}")
+
+    rows = []
+    for query in QUERIES:
+        def old_search():
+            return len(
+                list(Ingredient.objects.filter(name__icontains=query.lower()))
+            )
+
+        def new_search():
+            return len(
+                list(
+                    IngredientSearchFilter.filter_name(
+                        Ingredient.objects.all(), "name", query
+                    )
+                )
+            )
+
+        old_timing, _ = measure(old_search, repeat=3)
+        new_timing, _ = measure(new_search, repeat=3)
+        rows.append(
+            (
+                query,
+                old_search(),
+                f"{old_timing:.1f}",
+                new_search(),
+                f"{new_timing:.1f}",
+            )
+        )
+
+    print_table(
+        ("query", "icontains rows", "ms", "ranked rows", "ms"), rows
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Пиковая память разбора JSON-каталога: json.load против потокового чтения.
+
+Размеры файлов в МБ передаются аргументами, например для 1 ГБ:
+
+    python -m tests.benchmarks.bench_json_import 1024
+"""
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+from tests.benchmarks import measure, print_table, setup_django
+
+DEFAULT_SIZES_MB = (8, 32, 128)
+
+
+def generate_catalogue(file_path, size_mb):
+    """JSON-массив ингредиентов заданного размера одной строкой."""
+
+    limit = size_mb * 1024 * 1024
+    written = 0
+    with open(file_path, "w", encoding="UTF-8") as file:
+        file.write("[")
+        index = 0
+        while written < limit:
+            row = json.dumps(
+                {"name": f"ингредиент {index}", "measurement_unit": "г"},
+                ensure_ascii=False,
+            )
+            if index:
+                row = ", " + row
+            file.write(row)
+            written += len(row.encode())
+            index += 1
+        file.write("]")
+    return index
+
+
+def main():
+    setup_django()
+
+    from recipes.management.importers import IngredientImporter
+    from recipes.management.parsers import read_json
+
+    sizes = [int(size) for size in sys.argv[1:]] or DEFAULT_SIZES_MB
+
+    def json_load(file_path):
+        with open(file_path, encoding="UTF-8") as file:
+            return IngredientImporter(dry_run=True).run(json.load(file))
+
+    def streaming(file_path):
+        return IngredientImporter(dry_run=True).run(read_json(file_path))
+
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            file_path = Path(directory) / f"catalogue_{size}.json"
+            count = generate_catalogue(file_path, size)
+            for name, func in (("json.load", json_load), ("stream", streaming)):
+                timing, peak = measure(lambda: func(file_path), repeat=1)
+                rows.append(
+                    (size, count, name, f"{timing:.0f}", f"{peak / 1024:.1f}")
+                )
+
+    print_table(("MB", "rows", "reader", "ms", "peak MB"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Флаги избранного/корзины в ленте рецептов: EXISTS против множеств id.
+
+Для пользователей с 0, 100 и 10 000 рецептов в избранном замеряется
+страница ленты без фильтра и с фильтрами is_favorited=1/0. Для
+стратегии "sets" отдельно показан первый запрос с пустым кэшем.
+
+    python -m tests.benchmarks.bench_recipe_user_flags
+"""
+from tests.benchmarks import measure, print_table, setup_django
+
+FAVORITES_COUNTS = (0, 100, 10000)
+RECIPES_TOTAL = 20000
+QUERIES = (
+    ("list", {}),
+    ("is_favorited=1", {"is_favorited": 1}),
+    ("is_favorited=0", {"is_favorited": 0}),
+)
+
+
+def create_recipes(author):
+    from recipes.models import Recipe
+
+    return Recipe.objects.bulk_create(
+        (
+            Recipe(
+                name=f"recipe_{i}",
+                text="text",
+                cooking_time=10,
+                author=author,
+                image="photos/image.png",
+            )
+            for i in range(RECIPES_TOTAL)
+        ),
+        batch_size=1000,
+    )
+
+
+def create_user(name, recipes, favorites_count):
+    from recipes.models import Favorite, ShoppingCard
+    from users.models import User
+
+    user = User.objects.create(
+        username=name, email=f"{name}@foodgram.fake"
+    )
+    Favorite.objects.bulk_create(
+        (
+            Favorite(user=user, recipe=recipe)
+            for recipe in recipes[:favorites_count]
+        ),
+        batch_size=1000,
+    )
+    ShoppingCard.objects.bulk_create(
+        (
+            ShoppingCard(user=user, recipe=recipe)
+            for recipe in recipes[: favorites_count // 10]
+        ),
+        batch_size=1000,
+    )
+    return user
+
+
+def main():
+    setup_django()
+
+    from django.core.cache import caches
+    from django.db import connection
+    from django.test.utils import (CaptureQueriesContext,
+                                   override_settings)
+    from rest_framework.test import APIRequestFactory, force_authenticate
+
+    from api.views import RecipeViewset
+
+    factory = APIRequestFactory()
+    view = RecipeViewset.as_view({"get": "list"})
+    author = create_user("author", [], 0)
+    recipes = create_recipes(author)
+
+    def get_page(user, params):
+        request = factory.get("/api/recipes/", params, HTTP_HOST="localhost")
+        force_authenticate(request, user)
+        response = view(request)
+        response.render()
+        return response
+
+    def count_queries(user, params):
+        with CaptureQueriesContext(connection) as context:
+            get_page(user, params)
+        return len(context)
+
+    def cold_page(user, params):
+        caches["default"].clear()
+        return get_page(user, params)
+
+    rows = []
+    for favorites_count in FAVORITES_COUNTS:
+        user = create_user(f"user_{favorites_count}", recipes, favorites_count)
+        for name, params in QUERIES:
+            with override_settings(RECIPE_USER_FLAGS_STRATEGY="exists"):
+                exists_timing, _ = measure(lambda: get_page(user, params))
+                exists_queries = count_queries(user, params)
+            with override_settings(RECIPE_USER_FLAGS_STRATEGY="sets"):
+                cold_timing, _ = measure(lambda: cold_page(user, params))
+                caches["default"].clear()
+                cold_queries = count_queries(user, params)
+                warm_timing, _ = measure(lambda: get_page(user, params))
+                warm_queries = count_queries(user, params)
+            rows.append(
+                (
+                    favorites_count,
+                    name,
+                    f"{exists_timing:.1f}",
+                    exists_queries,
+                    f"{cold_timing:.1f}",
+                    cold_queries,
+                    f"{warm_timing:.1f}",
+                    warm_queries,
+                )
+            )
+
+    print(f"recipes: {RECIPES_TOTAL}")
+    print_table(
+        (
+            "favorites",
+            "query",
+            "exists ms",
+            "queries",
+            "sets cold ms",
+            "queries",
+            "sets warm ms",
+            "queries",
+        ),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
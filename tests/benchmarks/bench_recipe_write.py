@@ -0,0 +1,125 @@
+"""Создание и редактирование рецепта в зависимости от числа ингредиентов.
+
+Замеряются время и число запросов POST /api/recipes/ и PATCH с
+исправлением названия и одного количества для рецептов с 1, 10, 30 и
+100 ингредиентами.
+
+    python -m tests.benchmarks.bench_recipe_write
+"""
+import base64
+import itertools
+import tempfile
+from io import BytesIO
+
+from tests.benchmarks import measure, print_table, setup_django
+
+INGREDIENT_COUNTS = (1, 10, 30, 100)
+
+
+def image_data():
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.new("RGB", (8, 8), "#ff8800").save(buffer, "PNG")
+    return "data:image/png;base64," + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+def main():
+    setup_django()
+
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext, override_settings
+    from rest_framework.test import APIRequestFactory, force_authenticate
+
+    from api.views import RecipeViewset
+    from recipes.models import Ingredient, Tag
+    from users.models import User
+
+    factory = APIRequestFactory()
+    create_view = RecipeViewset.as_view({"post": "create"})
+    update_view = RecipeViewset.as_view({"patch": "partial_update"})
+    author = User.objects.create(username="author", email="a@foodgram.fake")
+    tags = [
+        Tag.objects.create(name=f"tag_{i}", slug=f"tag_{i}", color=f"#00000{i}")
+        for i in range(3)
+    ]
+    ingredients = Ingredient.objects.bulk_create(
+        Ingredient(name=f"ingredient_{i}", measurement_unit="г")
+        for i in range(max(INGREDIENT_COUNTS))
+    )
+    image = image_data()
+    names = itertools.count()
+
+    def payload(count, amount=10):
+        return {
+            "name": f"recipe_{next(names)}",
+            "text": "text",
+            "cooking_time": 10,
+            "tags": [tag.id for tag in tags],
+            "ingredients": [
+                {"id": ingredient.id, "amount": amount}
+                for ingredient in ingredients[:count]
+            ],
+        }
+
+    def create(count):
+        request = factory.post(
+            "/api/recipes/",
+            {**payload(count), "image": image},
+            format="json",
+            HTTP_HOST="localhost",
+        )
+        force_authenticate(request, author)
+        response = create_view(request)
+        assert response.status_code == 201, response.data
+        return response.data["id"]
+
+    def update(recipe_id, count):
+        data = payload(count)
+        data["ingredients"][0]["amount"] = next(names) + 1
+        request = factory.patch(
+            f"/api/recipes/{recipe_id}/",
+            data,
+            format="json",
+            HTTP_HOST="localhost",
+        )
+        force_authenticate(request, author)
+        response = update_view(request, pk=recipe_id)
+        assert response.status_code == 200, response.data
+
+    def count_queries(func):
+        with CaptureQueriesContext(connection) as context:
+            func()
+        return len(context)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as media_root, override_settings(
+        MEDIA_ROOT=media_root, RECIPE_IMAGE_WORKERS=0
+    ):
+        create(1)
+        for count in INGREDIENT_COUNTS:
+            create_timing, _ = measure(lambda: create(count))
+            create_queries = count_queries(lambda: create(count))
+            recipe_id = create(count)
+            update_timing, _ = measure(lambda: update(recipe_id, count))
+            update_queries = count_queries(lambda: update(recipe_id, count))
+            rows.append(
+                (
+                    count,
+                    f"{create_timing:.1f}",
+                    create_queries,
+                    f"{update_timing:.1f}",
+                    update_queries,
+                )
+            )
+
+    print_table(
+        ("ingredients", "create ms", "queries", "update ms", "queries"),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Время и пиковая память выгрузки корзины в каждом формате.
+
+    python -m tests.benchmarks.bench_shopping_list_export
+"""
+from tests.benchmarks import measure, print_table, setup_django
+
+CART_SIZES = (10, 100, 1000)
+INGREDIENTS_PER_RECIPE = 10
+INGREDIENTS_TOTAL = 2000
+
+
+def fill_cart(user, size):
+    from recipes.models import (Ingredient, Recipe, RecipeIngredient,
+                                ShoppingCard)
+
+    ingredients = list(Ingredient.objects.all())
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            name=f"recipe_{size}_{i}",
+            text="text",
+            cooking_time=10,
+            author=user,
+            image="photos/image.png",
+        )
+        for i in range(size)
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(
+            recipe=recipe,
+            ingredient=ingredients[
+                (i * INGREDIENTS_PER_RECIPE + j) % len(ingredients)
+            ],
+            amount=j + 1,
+        )
+        for i, recipe in enumerate(recipes)
+        for j in range(INGREDIENTS_PER_RECIPE)
+    )
+    ShoppingCard.objects.bulk_create(
+        ShoppingCard(user=user, recipe=recipe) for recipe in recipes
+    )
+
+
+def export(exporter_class, user_id):
+    from api.utils import get_shopping_list
+
+    response = exporter_class(get_shopping_list(user_id).iterator()).response()
+    if not response.streaming:
+        return len(response.content)
+
+    size = 0
+    for chunk in response.streaming_content:
+        size += len(chunk)
+    response.close()
+    return size
+
+
+def main():
+    setup_django()
+
+    from api.exporters import EXPORTERS
+    from recipes.models import Ingredient
+    from users.models import User
+
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f"ingredient_{i}", measurement_unit="г")
+        for i in range(INGREDIENTS_TOTAL)
+    )
+
+    rows = []
+    for size in CART_SIZES:
+        user = User.objects.create(
+            username=f"user_{size}", email=f"user_{size}@foodgram.fake"
+        )
+        fill_cart(user, size)
+        for export_format, exporter_class in EXPORTERS.items():
+            timing, peak = measure(
+                lambda: export(exporter_class, user.id)
+            )
+            rows.append(
+                (
+                    size,
+                    export_format,
+                    export(exporter_class, user.id),
+                    f"{timing:.1f}",
+                    f"{peak:.0f}",
+                )
+            )
+
+    print_table(("recipes", "format", "bytes", "ms", "peak KB"), rows)
+
+
+if __name__ == "__main__":
+    main()
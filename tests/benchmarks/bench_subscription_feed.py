@@ -0,0 +1,147 @@
+"""Лента подписок: выборка при чтении против материализованной ленты.
+
+Для пользователей с 10, 1 000 и 100 000 подписок замеряются первая
+страница ленты и страница после PAGES переходов по курсору, а также
+время построения материализованной ленты.
+
+    python -m tests.benchmarks.bench_subscription_feed
+"""
+import time
+
+from tests.benchmarks import measure, print_table, setup_django
+
+SUBSCRIPTIONS = (10, 1000, 100000)
+RECIPES_PER_AUTHOR = 2
+PAGE_SIZE = 6
+PAGES = 10
+BATCH_SIZE = 5000
+
+
+def create_authors(count):
+    from recipes.models import Recipe
+    from users.models import User
+
+    authors = User.objects.bulk_create(
+        (
+            User(username=f"author_{i}", email=f"author_{i}@foodgram.fake")
+            for i in range(count)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    Recipe.objects.bulk_create(
+        (
+            Recipe(
+                name=f"recipe_{i}",
+                text="text",
+                cooking_time=10,
+                author=author,
+                image="photos/image.png",
+            )
+            for author in authors
+            for i in range(RECIPES_PER_AUTHOR)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    return authors
+
+
+def create_subscriber(authors, count):
+    from users.models import Subscription, User
+
+    user = User.objects.create(
+        username=f"user_{count}",
+        email=f"user_{count}@foodgram.fake",
+        subscriptions_count=count,
+    )
+    # подписки на авторов вперемешку по всему диапазону
+    step = len(authors) // count
+    Subscription.objects.bulk_create(
+        (
+            Subscription(user=user, author=author)
+            for author in authors[::step][:count]
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    return user
+
+
+def walk(queryset, pages):
+    """Ключи страницы после pages переходов по курсору."""
+
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    from api.pagination import SubscriptionFeedPagination
+
+    factory = APIRequestFactory()
+    params = {"page_size": PAGE_SIZE}
+    for _ in range(pages):
+        request = Request(
+            factory.get("/feed/", params, HTTP_HOST="localhost")
+        )
+        paginator = SubscriptionFeedPagination()
+        recipes = paginator.paginate_queryset(queryset, request)
+        if not paginator.has_next:
+            break
+        params = {
+            "page_size": PAGE_SIZE,
+            "cursor": paginator.encode_cursor(paginator.last),
+        }
+    return [recipe.id for recipe in recipes]
+
+
+def main():
+    setup_django()
+
+    from recipes.models import Recipe
+    from users import feed
+
+    authors = create_authors(max(SUBSCRIPTIONS))
+    print(f"authors: {len(authors)}, recipes: {len(authors) * 2}")
+
+    rows = []
+    for count in SUBSCRIPTIONS:
+        user = create_subscriber(authors, count)
+
+        start = time.perf_counter()
+        feed.add_recipes(
+            user.id,
+            Recipe.objects.filter(author__subscribe_object__user=user),
+        )
+        build_ms = (time.perf_counter() - start) * 1000
+
+        for pages in (1, PAGES):
+            read_ids = walk(feed.fan_out_on_read(user), pages)
+            timeline_ids = walk(feed.materialized(user), pages)
+            assert read_ids == timeline_ids
+
+            read_timing, _ = measure(
+                lambda: walk(feed.fan_out_on_read(user), pages)
+            )
+            timeline_timing, _ = measure(
+                lambda: walk(feed.materialized(user), pages)
+            )
+            rows.append(
+                (
+                    count,
+                    pages,
+                    f"{read_timing:.1f}",
+                    f"{timeline_timing:.1f}",
+                    f"{build_ms:.0f}",
+                )
+            )
+
+    print_table(
+        (
+            "subscriptions",
+            "pages",
+            "fan-out-on-read ms",
+            "timeline ms",
+            "timeline build ms",
+        ),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
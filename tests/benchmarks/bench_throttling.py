@@ -0,0 +1,109 @@
+"""Троттлинг: штатный UserRateThrottle против счетчиков в кэше.
+
+Замеряется время allow_request на запрос для пользователя, уже
+сделавшего HISTORY запросов в текущем окне, на локальном и файловом
+кэше (файловый ближе к сетевому: каждое обращение сериализует значение
+и идет мимо памяти процесса).
+
+    python -m tests.benchmarks.bench_throttling
+"""
+import tempfile
+
+from tests.benchmarks import measure, print_table, setup_django
+
+HISTORY = (10, 1000, 10000)
+CALLS = 200
+RATE = "1000000/day"
+
+
+def make_throttles():
+    from rest_framework import throttling
+
+    from api import throttling as counters
+
+    class StockThrottle(throttling.UserRateThrottle):
+        rate = RATE
+
+    class CounterThrottle(counters.UserRateThrottle):
+        rate = RATE
+
+    return StockThrottle, CounterThrottle
+
+
+def prefill(throttle, request, history):
+    """history запросов в текущем окне без вызова allow_request."""
+
+    throttle.key = throttle.get_cache_key(request, None)
+    now = throttle.timer()
+    if hasattr(throttle, "increment"):
+        window = int(now // throttle.duration)
+        throttle.cache.set(f"{throttle.key}:{window}", history)
+    else:
+        throttle.cache.set(
+            throttle.key, [now] * history, throttle.duration
+        )
+
+
+def main():
+    setup_django()
+
+    from django.conf import settings
+    from django.core.cache import caches
+    from django.test.utils import override_settings
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    from users.models import User
+
+    request = Request(APIRequestFactory().get("/api/tags/"))
+    request.user = User(id=1, username="user")
+    stock_class, counter_class = make_throttles()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        backends = {
+            "locmem": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache"
+            },
+            "file": {
+                "BACKEND": "django.core.cache.backends.filebased."
+                "FileBasedCache",
+                "LOCATION": directory,
+            },
+        }
+        for name, backend in backends.items():
+            with override_settings(
+                CACHES={**settings.CACHES, "default": backend}
+            ):
+                stock_class.cache = caches["default"]
+                for history in HISTORY:
+                    timings = []
+                    for throttle_class in (stock_class, counter_class):
+                        caches["default"].clear()
+                        throttle = throttle_class()
+                        prefill(throttle, request, history)
+                        timing, _ = measure(
+                            lambda: [
+                                throttle.allow_request(request, None)
+                                for _ in range(CALLS)
+                            ]
+                        )
+                        timings.append(timing * 1000 / CALLS)
+                    rows.append(
+                        (
+                            name,
+                            history,
+                            f"{timings[0]:.1f}",
+                            f"{timings[1]:.1f}",
+                            f"{timings[0] / timings[1]:.1f}x",
+                        )
+                    )
+
+    print_table(
+        ("cache", "history", "stock us/req", "counter us/req", "speedup"),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
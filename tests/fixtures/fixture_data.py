@@ -1,6 +1,74 @@
 import pytest
 
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    from django.core.cache import caches
+
+    from api.authentication import auth_token_cache
+    from api.cache import shopping_list_cache
+
+    for cache in caches.all():
+        cache.clear()
+    shopping_list_cache.local.clear()
+    auth_token_cache.local.clear()
+    auth_token_cache.reset_stats()
+
+
+@pytest.fixture(autouse=True)
+def shared_cache(settings):
+    """Тесты идут в одном процессе: LocMem для них - общий кэш."""
+
+    settings.SHOPPING_LIST_CACHE_POINTERS = True
+    settings.RECIPE_USER_FLAGS_STRATEGY = "sets"
+    settings.RECIPE_FEED_CACHE = True
+    settings.AUTH_TOKEN_CACHE = True
+
+
+@pytest.fixture(autouse=True)
+def sync_image_variants(settings):
+    settings.RECIPE_IMAGE_WORKERS = 0
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    return tmp_path
+
+
+def make_image(size=(64, 32), image_format="PNG"):
+    from io import BytesIO
+
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.new("RGB", size, "#ff8800").save(buffer, image_format)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def recipe_payload(tag_1, ingredients):
+    import base64
+
+    def _recipe_payload(name="recipe", size=(64, 32), image=None):
+        if image is None:
+            image = make_image(size)
+        return {
+            "name": name,
+            "text": "text",
+            "cooking_time": 10,
+            "tags": [tag_1.id],
+            "ingredients": [
+                {"id": ingredient.id, "amount": 10}
+                for ingredient in ingredients
+            ],
+            "image": "data:image/png;base64,"
+            + base64.b64encode(image).decode(),
+        }
+
+    return _recipe_payload
+
+
 @pytest.fixture
 def tag_1():
     from recipes.models import Tag
@@ -11,3 +79,80 @@ def tag_1():
 def tag_2():
     from recipes.models import Tag
     return Tag.objects.create(name="tag_2", slug="tag_2", color="#100000")
+
+
+@pytest.fixture
+def user():
+    from users.models import User
+    return User.objects.create(
+        username="user", email="user@foodgram.fake", password="Passw0rd!"
+    )
+
+
+@pytest.fixture
+def author():
+    from users.models import User
+    return User.objects.create(
+        username="author", email="author@foodgram.fake", password="Passw0rd!"
+    )
+
+
+@pytest.fixture
+def user_client(user):
+    from rest_framework.test import APIClient
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def ingredients():
+    from recipes.models import Ingredient
+    return Ingredient.objects.bulk_create(
+        Ingredient(name=f"ingredient_{i}", measurement_unit="г")
+        for i in range(5)
+    )
+
+
+@pytest.fixture
+def create_recipes(author, tag_1, ingredients):
+    from recipes.models import Recipe, RecipeIngredient
+
+    def _create_recipes(count, recipe_author=author):
+        recipes = []
+        for i in range(count):
+            recipe = Recipe.objects.create(
+                name=f"recipe_{Recipe.objects.count()}",
+                text="text",
+                cooking_time=10,
+                author=recipe_author,
+                image="photos/image.png",
+            )
+            recipe.tags.add(tag_1)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=i + 1
+                )
+                for ingredient in ingredients
+            )
+            recipes.append(recipe)
+        return recipes
+
+    return _create_recipes
+
+
+@pytest.fixture
+def create_authors():
+    from users.models import User
+
+    def _create_authors(count):
+        return [
+            User.objects.create(
+                username=f"author_{i}",
+                email=f"author_{i}@foodgram.fake",
+                password="Passw0rd!",
+            )
+            for i in range(count)
+        ]
+
+    return _create_authors
@@ -0,0 +1,148 @@
+import pytest
+
+
+class TestIngredientSearch:
+
+    url = "/api/ingredients/"
+
+    @pytest.fixture
+    def catalogue(self):
+        from recipes.models import Ingredient
+
+        names = (
+            "сахарная пудра",
+            "ванильный сахар",
+            "сахар",
+            "тростниковый сахар",
+            "соль",
+        )
+        return Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit="г") for name in names
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_prefix_matches_first(self, client, catalogue):
+        response = client.get(self.url, {"name": "Сахар"})
+
+        assert response.status_code == 200
+        assert [ingredient["name"] for ingredient in response.json()] == [
+            "сахар",
+            "сахарная пудра",
+            "ванильный сахар",
+            "тростниковый сахар",
+        ]
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize("index", (False, True))
+    def test_only_search_is_capped(self, client, settings, index):
+        from api.search import ingredient_index
+        from recipes.models import Ingredient
+
+        settings.INGREDIENT_SEARCH_LIMIT = 3
+        settings.INGREDIENT_SEARCH_INDEX = index
+        ingredient_index.version = None
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f"мука {i}", measurement_unit="г")
+            for i in range(10)
+        )
+
+        assert len(client.get(self.url, {"name": "мука"}).json()) == 3
+        assert len(client.get(self.url).json()) == 10
+
+    @pytest.mark.django_db(transaction=True)
+    def test_prefix_search_uses_index(self, catalogue):
+        from django.db import connection
+
+        from recipes.models import Ingredient
+
+        if connection.vendor != "postgresql":
+            pytest.skip("индексы поиска создаются только в PostgreSQL")
+
+        with connection.cursor() as cursor:
+            # в маленькой таблице планировщик иначе выберет seq scan
+            cursor.execute("SET enable_seqscan = off")
+            try:
+                plan = Ingredient.objects.filter(
+                    name__istartswith="сахар"
+                ).explain()
+            finally:
+                cursor.execute("RESET enable_seqscan")
+
+        assert "recipes_ingredient_name_prefix" in plan
+
+
+class TestIngredientIndex:
+
+    url = "/api/ingredients/"
+
+    @pytest.fixture
+    def index_enabled(self, settings):
+        from api.search import ingredient_index
+
+        settings.INGREDIENT_SEARCH_INDEX = True
+        ingredient_index.version = None
+        yield ingredient_index
+        ingredient_index.version = None
+
+    @pytest.mark.django_db(transaction=True)
+    def test_same_results_as_database(self, client, settings, index_enabled):
+        from recipes.models import Ingredient
+
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit="г")
+            for name in (
+                "сахарная пудра",
+                "ванильный сахар",
+                "сахар",
+                "тростниковый сахар",
+                "соль",
+                "сало",
+            )
+        )
+
+        for query in ("сахар", "Са", "ль", "пудра", "нет такого"):
+            from_index = client.get(self.url, {"name": query}).json()
+            settings.INGREDIENT_SEARCH_INDEX = False
+            from_database = client.get(self.url, {"name": query}).json()
+            settings.INGREDIENT_SEARCH_INDEX = True
+
+            assert from_index == from_database
+
+    @pytest.mark.django_db(transaction=True)
+    def test_served_without_database(self, client, ingredients, index_enabled):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        index_enabled.build()
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(self.url, {"name": "ingredient"})
+
+        assert len(response.json()) == 5
+        assert len(context) == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_incremental_update(self, client, ingredients, index_enabled):
+        index_enabled.build()
+        ingredient = ingredients[0]
+        ingredient.name = "морковь"
+        ingredient.save()
+        ingredients[1].delete()
+
+        assert [
+            found["id"] for found in client.get(self.url, {"name": "мор"}).json()
+        ] == [ingredient.id]
+        assert len(client.get(self.url, {"name": "ingredient"}).json()) == 3
+        assert len(client.get(self.url).json()) == 4
+
+    @pytest.mark.django_db(transaction=True)
+    def test_change_recorded_after_commit(self, ingredients, index_enabled):
+        from django.db import transaction
+
+        index_enabled.build()
+        version = index_enabled.get_remote_version()
+        with transaction.atomic():
+            ingredients[0].name = "морковь"
+            ingredients[0].save()
+            assert index_enabled.get_remote_version() == version
+
+        assert index_enabled.get_remote_version() == version + 1
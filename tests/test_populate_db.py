@@ -0,0 +1,154 @@
+import io
+import json
+
+import pytest
+from django.core.management import call_command
+
+
+@pytest.fixture
+def data_path(tmp_path, monkeypatch):
+    from api.management.commands.populate_db import Command
+
+    monkeypatch.setattr(Command, "data_path", tmp_path)
+    return tmp_path
+
+
+def populate_db(*args):
+    stdout = io.StringIO()
+    call_command("populate_db", *args, stdout=stdout)
+    return stdout.getvalue()
+
+
+class TestPopulateDb:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_csv(self, data_path):
+        from recipes.models import Ingredient
+
+        (data_path / "ingredients.csv").write_text(
+            "соль,г\n"
+            "сахар,г\n"
+            "соль,г\n"
+            "перец\n"
+            ",г\n",
+            encoding="UTF-8",
+        )
+
+        output = populate_db("--csv", "--batch-size", "2")
+
+        assert Ingredient.objects.count() == 2
+        assert (
+            "всего 5, добавлено 2, пропущено 1, с ошибками 2" in output
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_existing_rows_are_skipped(self, data_path, ingredients):
+        from recipes.models import Ingredient
+
+        (data_path / "ingredients.json").write_text(
+            json.dumps(
+                [
+                    {"name": "ingredient_0", "measurement_unit": "г"},
+                    {"name": "ingredient_0", "measurement_unit": "кг"},
+                ]
+            ),
+            encoding="UTF-8",
+        )
+
+        output = populate_db("--json")
+
+        assert Ingredient.objects.count() == 6
+        assert "добавлено 1, пропущено 1" in output
+
+    @pytest.mark.django_db(transaction=True)
+    def test_dry_run(self, data_path):
+        from recipes.models import Ingredient
+
+        (data_path / "ingredients.csv").write_text(
+            "соль,г\nсахар,г,лишнее\n", encoding="UTF-8"
+        )
+
+        output = populate_db("--csv", "--dry-run")
+
+        assert Ingredient.objects.count() == 0
+        assert "корректных 1, с ошибками 1" in output
+
+    @pytest.mark.django_db(transaction=True)
+    def test_jsonl(self, data_path):
+        from recipes.models import Ingredient
+
+        (data_path / "ingredients.jsonl").write_text(
+            '{"name": "соль", "measurement_unit": "г"}\n'
+            "\n"
+            "не json\n"
+            '{"name": "сахар", "measurement_unit": "г"}\n',
+            encoding="UTF-8",
+        )
+
+        output = populate_db("--jsonl")
+
+        assert Ingredient.objects.count() == 2
+        assert "добавлено 2, пропущено 0, с ошибками 1" in output
+
+
+class TestPopulateDbShards:
+
+    @pytest.fixture
+    def shards(self, data_path):
+        shards_path = data_path / "shards"
+        shards_path.mkdir()
+        for shard in range(3):
+            (shards_path / f"shard_{shard}.csv").write_text(
+                f"общий,г\nингредиент {shard},г\nошибка\n", encoding="UTF-8"
+            )
+        return shards_path
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize("workers", ("1", "2"))
+    @pytest.mark.parametrize("filenames", (("shards",), ("shards/*.csv",)))
+    def test_directory_and_glob(self, shards, workers, filenames):
+        from recipes.models import Ingredient
+
+        output = populate_db("--csv", "--workers", workers, *filenames)
+
+        assert Ingredient.objects.count() == 4
+        assert (
+            "всего 9, добавлено 4, пропущено 2, с ошибками 3" in output
+        )
+        assert "Этапы: " in output
+
+    @pytest.mark.django_db(transaction=True)
+    def test_missing_file(self, shards):
+        output = populate_db("--csv", "shards/*.json")
+
+        assert "отсутствует файл shards/*.json" in output
+
+
+class TestJSONArrayReader:
+
+    @staticmethod
+    def read(text, chunk_size=3):
+        from recipes.management.parsers import JSONArrayReader
+
+        return list(JSONArrayReader(io.StringIO(text), chunk_size=chunk_size))
+
+    @pytest.mark.parametrize("chunk_size", (1, 2, 3, 7, 1024))
+    def test_same_as_json_load(self, chunk_size):
+        data = [
+            {"name": 'соль, "крупная"', "measurement_unit": "г"},
+            12345,
+            [1, {"a": [2.5e3]}],
+            "]",
+            None,
+        ]
+        text = " [ " + " ,\n ".join(json.dumps(item) for item in data) + " ] "
+
+        assert self.read(text, chunk_size) == data
+
+    def test_empty_array(self):
+        assert self.read(" [ ] ") == []
+
+    @pytest.mark.parametrize("text", ("{}", "[1 2]", "[1,", '[{"a": 1'))
+    def test_malformed(self, text):
+        with pytest.raises(ValueError):
+            self.read(text)
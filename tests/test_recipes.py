@@ -0,0 +1,1225 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from tests.fixtures.fixture_data import make_image
+
+
+def ingredient_queries(context):
+    return [
+        query["sql"]
+        for query in context.captured_queries
+        if "recipes_ingredient" in query["sql"]
+        or "recipes_recipeingredient" in query["sql"]
+    ]
+
+
+class TestRecipeIngredients:
+
+    url = "/api/recipes/"
+
+    @pytest.mark.django_db(transaction=True)
+    def test_ingredients_in_response(self, client, create_recipes):
+        recipe = create_recipes(1)[0]
+
+        response = client.get(f"{self.url}{recipe.id}/")
+
+        assert response.status_code == 200
+        ingredients = response.json()["ingredients"]
+        assert len(ingredients) == 5
+        assert set(ingredients[0]) == {
+            "id", "name", "measurement_unit", "amount"
+        }
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize("client_name", ("client", "user_client"))
+    def test_ingredient_queries_do_not_depend_on_page_size(
+        self, request, client_name, create_recipes
+    ):
+        api_client = request.getfixturevalue(client_name)
+        create_recipes(12)
+        # прогрев кэша множеств избранного/корзины пользователя
+        api_client.get(self.url, {"page_size": 1})
+
+        with CaptureQueriesContext(connection) as small_page:
+            response = api_client.get(self.url, {"page_size": 2})
+        assert response.status_code == 200
+
+        with CaptureQueriesContext(connection) as big_page:
+            response = api_client.get(self.url, {"page_size": 12})
+        assert response.status_code == 200
+        assert len(response.json()["results"]) == 12
+
+        assert len(ingredient_queries(small_page)) == 1
+        assert len(ingredient_queries(big_page)) == 1
+        assert len(small_page) == len(big_page)
+
+
+class TestRecipeAuthors:
+
+    url = "/api/recipes/"
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize("client_name", ("client", "user_client"))
+    def test_queries_do_not_depend_on_authors_count(
+        self, request, client_name, create_authors, create_recipes
+    ):
+        api_client = request.getfixturevalue(client_name)
+        for recipe_author in create_authors(6):
+            create_recipes(2, recipe_author=recipe_author)
+        # прогрев кэша множеств избранного/корзины пользователя
+        api_client.get(self.url, {"page_size": 1})
+
+        with CaptureQueriesContext(connection) as small_page:
+            api_client.get(self.url, {"page_size": 2})
+        with CaptureQueriesContext(connection) as big_page:
+            response = api_client.get(self.url, {"page_size": 12})
+
+        assert len(response.json()["results"]) == 12
+        assert len(small_page) == len(big_page)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_author_payload(
+        self, user, user_client, author, create_recipes
+    ):
+        from users.models import Subscription
+
+        recipes = create_recipes(5)
+        Subscription.objects.create(user=user, author=author)
+
+        response = user_client.get(f"{self.url}{recipes[0].id}/")
+
+        payload = response.json()["author"]
+        assert payload["is_subscribed"] is True
+        assert payload["recipes_count"] == 5
+        assert [recipe["id"] for recipe in payload["recipes"]] == [
+            recipe.id for recipe in reversed(recipes[2:])
+        ]
+
+
+class TestRecipePagination:
+
+    url = "/api/recipes/"
+
+    @pytest.mark.django_db(transaction=True)
+    def test_cursor_pages_match_page_numbers(self, client, create_recipes):
+        create_recipes(7)
+        by_page = [
+            recipe["id"]
+            for page in (1, 2, 3)
+            for recipe in client.get(
+                self.url, {"page": page, "page_size": 3}
+            ).json()["results"]
+        ]
+
+        by_cursor = []
+        pages = []
+        response = client.get(self.url, {"cursor": "", "page_size": 3}).json()
+        while True:
+            pages.append(response)
+            by_cursor += [recipe["id"] for recipe in response["results"]]
+            if response["next"] is None:
+                break
+            response = client.get(response["next"]).json()
+
+        assert by_cursor == by_page
+        assert len(pages) == 3
+        assert all(page["count"] == 7 for page in pages)
+        assert pages[0]["previous"] is None
+
+        previous = client.get(pages[-1]["previous"]).json()
+        assert previous["results"] == pages[1]["results"]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_invalid_cursor(self, client):
+        assert client.get(self.url, {"cursor": "garbage"}).status_code == 404
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize("mode", ({}, {"cursor": ""}))
+    def test_estimated_count_is_cached(self, client, create_recipes, mode):
+        create_recipes(2)
+        params = {"count": "estimate", **mode}
+        assert client.get(self.url, params).json()["count"] == 2
+
+        create_recipes(1)
+
+        assert client.get(self.url, params).json()["count"] == 2
+        assert client.get(self.url, mode).json()["count"] == 3
+
+
+class TestRecipeStreaming:
+
+    url = "/api/recipes/"
+
+    @staticmethod
+    def streamed_json(response):
+        import json
+
+        assert response.streaming
+        return json.loads(b"".join(response.streaming_content))
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize("client_name", ("client", "user_client"))
+    def test_same_payload_as_regular_page(
+        self, request, settings, client_name, create_recipes
+    ):
+        api_client = request.getfixturevalue(client_name)
+        create_recipes(7)
+        params = {"page": 2, "page_size": 3}
+        regular = api_client.get(self.url, params).json()
+
+        settings.RECIPE_STREAM_PAGE_SIZE = 2
+        settings.RECIPE_STREAM_CHUNK_SIZE = 2
+        streamed = self.streamed_json(api_client.get(self.url, params))
+
+        assert streamed == regular
+
+    @pytest.mark.django_db(transaction=True)
+    def test_cursor_mode(self, client, settings, create_recipes):
+        create_recipes(7)
+        params = {"cursor": "", "page_size": 3}
+        first = client.get(self.url, params).json()
+        second = client.get(first["next"]).json()
+        back = client.get(second["previous"]).json()
+
+        settings.RECIPE_STREAM_PAGE_SIZE = 2
+        settings.RECIPE_STREAM_CHUNK_SIZE = 2
+
+        assert self.streamed_json(client.get(self.url, params)) == first
+        assert self.streamed_json(client.get(first["next"])) == second
+        assert self.streamed_json(client.get(second["previous"])) == back
+
+
+class TestRecipeUserFlags:
+
+    url = "/api/recipes/"
+
+    @staticmethod
+    def flags(response):
+        return {
+            recipe["id"]: (recipe["is_favorited"], recipe["is_in_shopping_cart"])
+            for recipe in response.json()["results"]
+        }
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize("strategy", ("exists", "sets"))
+    def test_flags_and_filters(
+        self, settings, user, user_client, create_recipes, strategy
+    ):
+        from recipes.models import Favorite, ShoppingCard
+
+        settings.RECIPE_USER_FLAGS_STRATEGY = strategy
+        first, second, third = create_recipes(3)
+        Favorite.objects.create(user=user, recipe=first)
+        ShoppingCard.objects.create(user=user, recipe=second)
+
+        response = user_client.get(self.url)
+        assert self.flags(response) == {
+            first.id: (True, False),
+            second.id: (False, True),
+            third.id: (False, False),
+        }
+
+        for params, expected in (
+            ({"is_favorited": 1}, {first.id}),
+            ({"is_favorited": 0}, {second.id, third.id}),
+            ({"is_in_shopping_cart": 1}, {second.id}),
+            ({"is_in_shopping_cart": 0}, {first.id, third.id}),
+        ):
+            response = user_client.get(self.url, params)
+            assert set(self.flags(response)) == expected
+
+    @pytest.mark.django_db(transaction=True)
+    def test_sets_are_loaded_once_and_invalidated(
+        self, settings, user, user_client, create_recipes
+    ):
+        settings.RECIPE_USER_FLAGS_STRATEGY = "sets"
+        recipe, _ = create_recipes(2)
+
+        with CaptureQueriesContext(connection) as first_request:
+            user_client.get(self.url, {"is_favorited": 0})
+        with CaptureQueriesContext(connection) as second_request:
+            response = user_client.get(self.url, {"is_favorited": 0})
+
+        set_queries = [
+            query
+            for query in first_request.captured_queries
+            if "recipes_favorite" in query["sql"]
+        ]
+        assert len(set_queries) == 1
+        assert not any(
+            "recipes_favorite" in query["sql"]
+            for query in second_request.captured_queries
+        )
+        assert not self.flags(response)[recipe.id][0]
+
+        user_client.post(f"{self.url}{recipe.id}/favorite/")
+        response = user_client.get(self.url)
+        assert self.flags(response)[recipe.id][0]
+
+        user_client.delete(f"{self.url}{recipe.id}/favorite/")
+        response = user_client.get(self.url)
+        assert not self.flags(response)[recipe.id][0]
+
+
+class TestRecipeFeedCache:
+
+    url = "/api/recipes/"
+
+    @staticmethod
+    def get(api_client, url, params=None):
+        with CaptureQueriesContext(connection) as context:
+            response = api_client.get(url, params)
+        assert response.status_code == 200
+        return response.json(), len(context)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_anonymous_responses_are_cached(self, client, create_recipes):
+        from api.cache import recipe_feed_cache
+
+        create_recipes(3)
+        first, first_queries = self.get(client, self.url, {"page_size": 2})
+        second, second_queries = self.get(client, self.url, {"page_size": 2})
+
+        assert first == second
+        assert first_queries > 0
+        assert second_queries == 0
+        assert recipe_feed_cache.stats() == {
+            "hits": 1, "misses": 1, "invalidations": 0
+        }
+
+    @pytest.mark.django_db(transaction=True)
+    def test_query_string_is_normalized(
+        self, client, tag_1, tag_2, create_recipes
+    ):
+        create_recipes(1)
+        self.get(
+            client, f"{self.url}?tags={tag_2.slug}&tags={tag_1.slug}&author="
+        )
+        _, queries = self.get(
+            client, f"{self.url}?tags={tag_1.slug}&tags={tag_2.slug}"
+        )
+        assert queries == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_authenticated_responses_are_not_cached(
+        self, user_client, create_recipes
+    ):
+        create_recipes(1)
+        self.get(user_client, self.url)
+        _, queries = self.get(user_client, self.url)
+        assert queries > 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_recipe_change_purges_only_affected_keys(
+        self, client, tag_1, tag_2, create_authors, create_recipes
+    ):
+        other_author, = create_authors(1)
+        recipe, = create_recipes(1)
+        other_recipe, = create_recipes(1, recipe_author=other_author)
+        other_recipe.tags.set((tag_2,))
+
+        feed = (self.url, {})
+        tag_1_feed = (self.url, {"tags": tag_1.slug})
+        tag_2_feed = (self.url, {"tags": tag_2.slug})
+        detail = (f"{self.url}{recipe.id}/", None)
+        other_detail = (f"{self.url}{other_recipe.id}/", None)
+        for url, params in (
+            feed, tag_1_feed, tag_2_feed, detail, other_detail
+        ):
+            self.get(client, url, params)
+
+        recipe.name = "renamed"
+        recipe.save()
+
+        for (url, params), cached in (
+            (feed, False),
+            (tag_1_feed, False),
+            (tag_2_feed, True),
+            (detail, False),
+            (other_detail, True),
+        ):
+            data, queries = self.get(client, url, params)
+            assert (queries == 0) is cached
+        assert data["id"] == other_recipe.id
+        assert self.get(client, *detail)[0]["name"] == "renamed"
+
+    @pytest.mark.django_db(transaction=True)
+    def test_tag_change_purges_filtered_feed(
+        self, client, tag_1, tag_2, create_recipes
+    ):
+        recipe, = create_recipes(1)
+        self.get(client, self.url, {"tags": tag_2.slug})
+
+        recipe.tags.add(tag_2)
+
+        data, queries = self.get(client, self.url, {"tags": tag_2.slug})
+        assert queries > 0
+        assert [item["id"] for item in data["results"]] == [recipe.id]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_author_change_purges_their_recipes(
+        self, client, author, create_recipes
+    ):
+        recipe, = create_recipes(1)
+        self.get(client, f"{self.url}{recipe.id}/")
+
+        author.first_name = "renamed"
+        author.save()
+
+        data, queries = self.get(client, f"{self.url}{recipe.id}/")
+        assert queries > 0
+        assert data["author"]["first_name"] == "renamed"
+
+
+class TestRecipeCounters:
+
+    @staticmethod
+    def counters(recipe):
+        recipe.refresh_from_db()
+        recipe.author.refresh_from_db()
+        return (
+            recipe.favorites_count,
+            recipe.cart_count,
+            recipe.author.recipes_count,
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_counters_follow_changes(
+        self, user, user_client, author, create_recipes
+    ):
+        recipe, other_recipe = create_recipes(2)
+        assert self.counters(recipe) == (0, 0, 2)
+
+        user_client.post(f"/api/recipes/{recipe.id}/favorite/")
+        user_client.post(f"/api/recipes/{recipe.id}/shopping_cart/")
+        assert self.counters(recipe) == (1, 1, 2)
+
+        user_client.delete(f"/api/recipes/{recipe.id}/favorite/")
+        other_recipe.delete()
+        assert self.counters(recipe) == (0, 1, 1)
+
+        user.delete()
+        assert self.counters(recipe) == (0, 0, 1)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_reconcile(self, user, author, create_recipes):
+        from io import StringIO
+
+        from django.core.management import call_command
+        from recipes.models import Favorite, Recipe
+
+        recipe, = create_recipes(1)
+        Favorite.objects.bulk_create((Favorite(user=user, recipe=recipe),))
+        Recipe.objects.filter(id=recipe.id).update(cart_count=5)
+
+        stdout = StringIO()
+        call_command("reconcile_counters", "--dry-run", stdout=stdout)
+        assert "recipe.favorites_count: 1" in stdout.getvalue()
+        assert "recipe.cart_count: 1" in stdout.getvalue()
+        assert self.counters(recipe) == (0, 5, 1)
+
+        call_command("reconcile_counters", stdout=StringIO())
+        assert self.counters(recipe) == (1, 0, 1)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_admin_save_keeps_counters(self, author, create_recipes):
+        from django.contrib import admin
+        from django.db.models import F
+        from recipes.admin import RecipeAdmin
+        from recipes.models import Recipe
+        from users.admin import CustomUserAdmin
+        from users.models import User
+
+        recipe, = create_recipes(1)
+        recipe.refresh_from_db()
+        # счетчики меняются, пока открыта форма
+        Recipe.objects.filter(id=recipe.id).update(
+            favorites_count=F("favorites_count") + 1
+        )
+        User.objects.filter(id=author.id).update(
+            recipes_count=F("recipes_count") + 1
+        )
+
+        recipe.name = "renamed"
+        RecipeAdmin(Recipe, admin.site).save_model(None, recipe, None, True)
+        author.is_blocked = True
+        CustomUserAdmin(User, admin.site).save_model(
+            None, author, None, True
+        )
+
+        assert self.counters(recipe) == (1, 0, 2)
+        assert recipe.name == "renamed"
+        assert recipe.author.is_blocked
+
+
+class TestRecipeRanking:
+
+    url = "/api/recipes/"
+
+    @staticmethod
+    def update_ranking(*args):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        call_command("update_recipe_ranking", *args, stdout=StringIO())
+
+    def ids(self, api_client, ordering):
+        response = api_client.get(self.url, {"ordering": ordering})
+        assert response.status_code == 200
+        return [recipe["id"] for recipe in response.json()["results"]]
+
+    @pytest.fixture
+    def ranked(self, create_authors, create_recipes):
+        from datetime import timedelta
+
+        from django.utils import timezone
+        from recipes.models import Favorite, ShoppingCard
+
+        old, recent, unranked = create_recipes(3)
+        month_ago = timezone.now() - timedelta(days=30)
+        for fan in create_authors(3):
+            Favorite.objects.create(user=fan, recipe=old, created=month_ago)
+        Favorite.objects.create(user=fan, recipe=recent)
+        ShoppingCard.objects.create(user=fan, recipe=recent)
+        return old, recent, unranked
+
+    @pytest.mark.django_db(transaction=True)
+    def test_popular_and_trending(self, client, ranked):
+        old, recent, unranked = ranked
+        self.update_ranking()
+
+        assert self.ids(client, "popular") == [old.id, recent.id, unranked.id]
+        assert self.ids(client, "trending") == [
+            recent.id, old.id, unranked.id
+        ]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_incremental_update_matches_rebuild(self, ranked):
+        from recipes.models import Favorite, RecipeRanking
+
+        old, recent, _ = ranked
+        self.update_ranking()
+        Favorite.objects.filter(recipe=old).first().delete()
+        recent.delete()
+        self.update_ranking()
+        incremental = list(
+            RecipeRanking.objects.order_by("recipe_id").values_list(
+                "recipe_id", "popular", "trending"
+            )
+        )
+
+        self.update_ranking("--full")
+        rebuilt = list(
+            RecipeRanking.objects.order_by("recipe_id").values_list(
+                "recipe_id", "popular", "trending"
+            )
+        )
+
+        assert [row[:2] for row in incremental] == [(old.id, 4.0)]
+        assert incremental[0][2] == pytest.approx(rebuilt[0][2])
+        assert incremental[0][:2] == rebuilt[0][:2]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_update_invalidates_feed_cache(self, client, ranked):
+        old, recent, unranked = ranked
+        self.ids(client, "popular")
+
+        self.update_ranking()
+
+        assert self.ids(client, "popular") == [old.id, recent.id, unranked.id]
+
+
+class TestRecipeImageVariants:
+
+    url = "/api/recipes/"
+
+    @staticmethod
+    def srcset(api_client, recipe_id):
+        return api_client.get(f"/api/recipes/{recipe_id}/").json()[
+            "image_srcset"
+        ]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_variants_are_generated(
+        self, settings, media_root, author, recipe_payload
+    ):
+        from rest_framework.test import APIClient
+
+        from api.images import variant_name
+        from recipes.models import Recipe
+
+        settings.RECIPE_IMAGE_WIDTHS = (320, 640, 1280)
+        api_client = APIClient()
+        api_client.force_authenticate(author)
+        response = api_client.post(
+            self.url, recipe_payload(size=(1000, 500)), format="json"
+        )
+        assert response.status_code == 201
+
+        recipe = Recipe.objects.get()
+        assert recipe.image_variants["widths"] == [320, 640]
+        srcset = self.srcset(api_client, recipe.id)
+        entries = [entry.split() for entry in srcset.split(", ")]
+        assert [descriptor for _, descriptor in entries] == [
+            "320w", "640w", "1000w"
+        ]
+        variant_url = entries[0][0]
+        variant_path = media_root / variant_url.split("/media/")[1]
+        assert variant_path.suffix == ".webp"
+
+        from PIL import Image
+
+        with Image.open(variant_path) as image:
+            assert image.size == (320, 160)
+
+        old_variant = variant_path
+        response = api_client.patch(
+            f"{self.url}{recipe.id}/",
+            recipe_payload(size=(400, 400)),
+            format="json",
+        )
+        assert response.status_code == 200
+        assert not old_variant.exists()
+        assert self.srcset(api_client, recipe.id).count("w, ") == 1
+
+        recipe.refresh_from_db()
+        variant_path = media_root / variant_name(
+            recipe.image.name, recipe.image_variants["widths"][0]
+        )
+        assert variant_path.exists()
+        recipe.delete()
+        assert not variant_path.exists()
+
+    @pytest.mark.parametrize("mode", ("P", "LA", "RGBA"))
+    def test_transparency_is_kept(self, settings, media_root, mode):
+        from io import BytesIO
+
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import default_storage
+        from PIL import Image
+
+        from api.images import render_variants, variant_name
+
+        settings.RECIPE_IMAGE_WIDTHS = (320,)
+        image = Image.new("RGBA", (640, 320), (0, 0, 0, 0))
+        image.paste((255, 136, 0, 255), (160, 80, 480, 240))
+        if mode == "LA":
+            image = image.convert("LA")
+        elif mode == "P":
+            image = image.convert("P")
+            image.info["transparency"] = image.getpixel((0, 0))
+        buffer = BytesIO()
+        image.save(buffer, "PNG")
+        name = default_storage.save(
+            "photos/alpha.png", ContentFile(buffer.getvalue())
+        )
+
+        assert render_variants(name) == (640, [320])
+        with default_storage.open(variant_name(name, 320)) as file:
+            with Image.open(file) as variant:
+                assert variant.mode == "RGBA"
+                assert variant.getpixel((0, 0))[3] == 0
+                assert variant.getpixel((160, 80))[3] == 255
+
+    @pytest.mark.django_db
+    def test_original_until_variants_are_ready(self, client, create_recipes):
+        recipe, = create_recipes(1)
+        assert self.srcset(client, recipe.id).endswith(recipe.image.url)
+
+
+class TestRecipeImageUpload:
+
+    url = "/api/recipes/"
+
+    @staticmethod
+    def encode(image, mime="image/png"):
+        import base64
+
+        return f"data:{mime};base64," + base64.b64encode(image).decode()
+
+    def post(self, author, payload):
+        from rest_framework.test import APIClient
+
+        api_client = APIClient()
+        api_client.force_authenticate(author)
+        return api_client.post(self.url, payload, format="json")
+
+    @pytest.mark.django_db
+    def test_format_is_detected_by_signature(
+        self, media_root, author, recipe_payload
+    ):
+        import base64
+
+        from PIL import Image
+
+        from recipes.models import Recipe
+
+        payload = recipe_payload()
+        payload["image"] = self.encode(make_image((50, 40), "JPEG"))
+        response = self.post(author, payload)
+        assert response.status_code == 201
+
+        recipe = Recipe.objects.get()
+        assert recipe.image.name.endswith(".jpg")
+        with Image.open(media_root / recipe.image.name) as image:
+            assert (image.format, image.size) == ("JPEG", (50, 40))
+
+        # переносы строк в Base64 не мешают декодированию по кускам
+        encoded = base64.encodebytes(make_image((300, 200))).decode()
+        payload = recipe_payload(name="wrapped")
+        payload["image"] = "data:image/png;base64," + encoded
+        assert "\n" in encoded
+        assert self.post(author, payload).status_code == 201
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize(
+        "image",
+        (
+            "data:image/png;base64,not base64!",
+            "data:image/png;base64,iVBORw0KGgo",
+            "data:image/png,iVBORw0KGgo=",
+        ),
+    )
+    def test_invalid_base64(self, author, recipe_payload, image):
+        payload = recipe_payload()
+        payload["image"] = image
+        response = self.post(author, payload)
+        assert response.status_code == 400
+        assert "image" in response.json()
+
+    @pytest.mark.django_db
+    def test_unsupported_format(self, author, recipe_payload):
+        payload = recipe_payload()
+        payload["image"] = self.encode(make_image(image_format="BMP"))
+        response = self.post(author, payload)
+        assert response.status_code == 400
+        assert "PNG, JPEG" in response.json()["image"][0]
+
+    @pytest.mark.django_db
+    def test_too_large(self, settings, author, recipe_payload):
+        from recipes.models import Recipe
+
+        image = make_image((300, 200))
+        settings.RECIPE_IMAGE_MAX_BYTES = len(image) - 1
+        payload = recipe_payload()
+        payload["image"] = self.encode(image)
+        response = self.post(author, payload)
+        assert response.status_code == 400
+        assert "байт" in response.json()["image"][0]
+
+        settings.RECIPE_IMAGE_MAX_BYTES = len(image)
+        assert self.post(author, payload).status_code == 201
+        assert Recipe.objects.count() == 1
+
+    @pytest.mark.django_db
+    def test_resolution_is_checked_by_header(
+        self, settings, author, recipe_payload
+    ):
+        settings.RECIPE_IMAGE_MAX_PIXELS = 100 * 100
+        payload = recipe_payload()
+        # за заголовком большой картинки идет мусор: отказ по разрешению
+        # происходит раньше, чем до него дойдет декодирование
+        header = make_image((101, 100))[:64]
+        payload["image"] = self.encode(header + b"\0" * 1024 * 1024)
+        response = self.post(author, payload)
+        assert response.status_code == 400
+        assert "пикселей" in response.json()["image"][0]
+
+        payload["image"] = self.encode(header + b"\0" * 1024)
+        settings.RECIPE_IMAGE_MAX_PIXELS = 101 * 100
+        response = self.post(author, payload)
+        assert response.status_code == 400
+        assert "пикселей" not in response.json()["image"][0]
+
+
+class TestRecipeMediaCleanup:
+
+    url = "/api/recipes/"
+
+    @pytest.fixture
+    def uploaded(self, media_root, author, recipe_payload):
+        from rest_framework.test import APIClient
+
+        from recipes.models import Recipe
+
+        api_client = APIClient()
+        api_client.force_authenticate(author)
+        response = api_client.post(self.url, recipe_payload(), format="json")
+        assert response.status_code == 201
+        return api_client, Recipe.objects.get()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_only_parents_of_deleted_file_are_pruned(
+        self, media_root, uploaded
+    ):
+        api_client, recipe = uploaded
+        image_path = media_root / recipe.image.name
+        unrelated = media_root / "photos" / "2000" / "01" / "01"
+        unrelated.mkdir(parents=True)
+
+        response = api_client.delete(f"{self.url}{recipe.id}/")
+        assert response.status_code == 204
+        assert not image_path.exists()
+        assert not (media_root / "photos" / image_path.parts[-4]).exists()
+        assert unrelated.exists()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_file_is_kept_on_rollback(self, media_root, uploaded):
+        from django.db import transaction
+
+        _, recipe = uploaded
+        image_path = media_root / recipe.image.name
+
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                recipe.delete()
+                raise RuntimeError
+        assert image_path.exists()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_variants_are_kept_on_rollback(
+        self, settings, media_root, author, recipe_payload
+    ):
+        from django.db import transaction
+        from rest_framework.test import APIClient
+
+        from api.images import variant_name
+        from recipes.models import Recipe
+
+        settings.RECIPE_IMAGE_WIDTHS = (32,)
+        api_client = APIClient()
+        api_client.force_authenticate(author)
+        api_client.post(self.url, recipe_payload(), format="json")
+        recipe = Recipe.objects.get()
+        variant_path = media_root / variant_name(recipe.image.name, 32)
+        assert variant_path.exists()
+
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                recipe.delete()
+                raise RuntimeError
+        assert variant_path.exists()
+
+        Recipe.objects.get().delete()
+        assert not variant_path.exists()
+
+    def test_full_sweep(self, media_root):
+        from django.core.management import call_command
+
+        photos = media_root / "photos"
+        (photos / "2000" / "01" / "01").mkdir(parents=True)
+        (photos / "2000" / "02" / "01").mkdir(parents=True)
+        (photos / "2000" / "02" / "01" / "image.png").write_bytes(b"")
+
+        call_command("clean_media_folders")
+        assert (photos / "2000" / "01" / "01").exists()
+
+        call_command("clean_media_folders", min_age=0, workers=1)
+        assert not (photos / "2000" / "01").exists()
+        assert (photos / "2000" / "02" / "01" / "image.png").exists()
+        assert photos.exists()
+
+
+class TestRecipeUpdate:
+
+    url = "/api/recipes/"
+
+    @pytest.fixture
+    def recipe(self, media_root, author, recipe_payload):
+        from rest_framework.test import APIClient
+
+        api_client = APIClient()
+        api_client.force_authenticate(author)
+        payload = recipe_payload()
+        response = api_client.post(self.url, payload, format="json")
+        assert response.status_code == 201
+        payload.pop("image")
+        return api_client, response.json()["id"], payload
+
+    @staticmethod
+    def writes(context, table):
+        return [
+            query["sql"].split()[0]
+            for query in context.captured_queries
+            if query["sql"].startswith(("INSERT", "UPDATE", "DELETE"))
+            and f'"{table}"' in query["sql"].split("(")[0]
+        ]
+
+    def patch(self, api_client, recipe_id, payload):
+        with CaptureQueriesContext(connection) as context:
+            response = api_client.patch(
+                f"{self.url}{recipe_id}/", payload, format="json"
+            )
+        assert response.status_code == 200
+        return context
+
+    @pytest.mark.django_db
+    def test_typo_edit_does_not_touch_relations(self, recipe):
+        from recipes.models import Recipe, RecipeIngredient
+
+        api_client, recipe_id, payload = recipe
+        row_ids = set(RecipeIngredient.objects.values_list("id", flat=True))
+        payload["name"] = "fixed typo"
+
+        context = self.patch(api_client, recipe_id, payload)
+        assert self.writes(context, "recipes_recipe") == ["UPDATE"]
+        assert self.writes(context, "recipes_recipe_tags") == []
+        assert self.writes(context, "recipes_recipeingredient") == []
+        assert len(context) == 14
+
+        assert Recipe.objects.get().name == "fixed typo"
+        assert set(
+            RecipeIngredient.objects.values_list("id", flat=True)
+        ) == row_ids
+
+    @pytest.mark.django_db
+    def test_only_differences_are_written(
+        self, recipe, tag_1, tag_2, ingredients
+    ):
+        from recipes.models import Recipe, RecipeIngredient
+
+        api_client, recipe_id, payload = recipe
+        kept = RecipeIngredient.objects.get(ingredient=ingredients[1]).id
+        payload["tags"] = [tag_2.id]
+        payload["ingredients"] = [
+            {"id": ingredients[0].id, "amount": 20},
+            {"id": ingredients[1].id, "amount": 10},
+            *(
+                {"id": ingredient.id, "amount": 10}
+                for ingredient in ingredients[2:4]
+            ),
+        ]
+
+        context = self.patch(api_client, recipe_id, payload)
+        assert self.writes(context, "recipes_recipe_tags") == [
+            "DELETE", "INSERT"
+        ]
+        assert self.writes(context, "recipes_recipeingredient") == [
+            "DELETE", "UPDATE"
+        ]
+        assert self.writes(context, "recipes_recipe") == ["UPDATE"]
+
+        recipe = Recipe.objects.get()
+        assert list(recipe.tags.values_list("id", flat=True)) == [tag_2.id]
+        assert dict(
+            recipe.recipe_ingr.values_list("ingredient_id", "amount")
+        ) == {
+            ingredients[0].id: 20,
+            ingredients[1].id: 10,
+            ingredients[2].id: 10,
+            ingredients[3].id: 10,
+        }
+        assert RecipeIngredient.objects.get(ingredient=ingredients[1]).id == (
+            kept
+        )
+
+        payload["ingredients"].append({"id": ingredients[4].id, "amount": 5})
+        context = self.patch(api_client, recipe_id, payload)
+        assert self.writes(context, "recipes_recipeingredient") == ["INSERT"]
+        assert recipe.recipe_ingr.count() == 5
+
+
+class TestRecipeValidation:
+
+    url = "/api/recipes/"
+
+    @pytest.fixture
+    def api_client(self, author):
+        from rest_framework.test import APIClient
+
+        api_client = APIClient()
+        api_client.force_authenticate(author)
+        return api_client
+
+    @pytest.mark.django_db
+    def test_missing_ids_are_reported_together(
+        self, api_client, recipe_payload, tag_1, ingredients
+    ):
+        from recipes.models import Recipe
+
+        payload = recipe_payload()
+        payload["tags"] = [999, tag_1.id, 998]
+        payload["ingredients"] = [
+            {"id": ingredients[0].id, "amount": 1},
+            {"id": 997, "amount": 1},
+            {"id": 996, "amount": 1},
+        ]
+        response = api_client.post(self.url, payload, format="json")
+        assert response.status_code == 400
+        errors = response.json()
+        assert "998, 999" in errors["tags"][0]
+        assert "996, 997" in errors["ingredients"][0]
+        assert not Recipe.objects.exists()
+
+        payload = recipe_payload()
+        payload["tags"] = ["tag_1"]
+        payload["ingredients"][0]["id"] = "ingredient_0"
+        response = api_client.post(self.url, payload, format="json")
+        assert response.status_code == 400
+        assert response.json().keys() == {"tags", "ingredients"}
+
+    @pytest.mark.django_db
+    def test_queries_do_not_depend_on_ingredients_count(
+        self, media_root, api_client, recipe_payload, ingredients
+    ):
+        # первый запрос загружает в кэш множества id пользователя
+        response = api_client.post(
+            self.url, recipe_payload(name="warm-up"), format="json"
+        )
+        assert response.status_code == 201
+
+        queries = []
+        for count in (1, len(ingredients)):
+            payload = recipe_payload(name=f"recipe_{count}")
+            payload["ingredients"] = payload["ingredients"][:count]
+            with CaptureQueriesContext(connection) as context:
+                response = api_client.post(self.url, payload, format="json")
+            assert response.status_code == 201
+            queries.append(len(context))
+        assert queries[0] == queries[1]
+
+
+class TestRecipeImportExport:
+
+    import_url = "/api/recipes/import/"
+    export_url = "/api/recipes/export/"
+
+    @pytest.fixture
+    def admin_client(self):
+        from rest_framework.test import APIClient
+
+        from users.models import User
+
+        admin = User.objects.create(
+            username="admin", email="admin@foodgram.fake", role=User.ADMIN
+        )
+        api_client = APIClient()
+        api_client.force_authenticate(admin)
+        return api_client
+
+    @pytest.fixture
+    def stored_image(self, media_root):
+        path = media_root / "photos" / "import" / "image.png"
+        path.parent.mkdir(parents=True)
+        path.write_bytes(make_image((400, 200)))
+        return "photos/import/image.png"
+
+    @staticmethod
+    def record(name, tags, ingredients, image, **fields):
+        return {
+            "name": name,
+            "text": "text",
+            "cooking_time": 10,
+            "tags": tags,
+            "ingredients": [
+                {"name": name, "measurement_unit": "г", "amount": amount}
+                for name, amount in ingredients
+            ],
+            "image": image,
+            **fields,
+        }
+
+    @staticmethod
+    def ndjson(records):
+        import json
+
+        return "\n".join(
+            record if isinstance(record, str) else json.dumps(record)
+            for record in records
+        ).encode()
+
+    @pytest.mark.django_db
+    def test_import_report(
+        self, settings, media_root, admin_client, user_client, stored_image,
+        tag_1, ingredients
+    ):
+        from recipes.models import Recipe
+        from users.models import User
+
+        settings.RECIPE_IMPORT_BATCH_SIZE = 2
+        body = self.ndjson(
+            (
+                self.record(
+                    "imported",
+                    [tag_1.slug],
+                    [("ingredient_0", 5), ("ingredient_1", 1)],
+                    stored_image,
+                ),
+                self.record(
+                    "unknown refs", ["nope"], [("unknown", 1)], stored_image
+                ),
+                self.record(
+                    "invalid", [tag_1.slug], [("ingredient_0", 1)],
+                    stored_image, cooking_time=0
+                ),
+                "{not json",
+                self.record(
+                    "imported", [tag_1.slug], [("ingredient_0", 5)],
+                    stored_image
+                ),
+                self.record(
+                    "no image", [tag_1.slug], [("ingredient_0", 5)],
+                    "photos/missing.png"
+                ),
+                *(
+                    self.record(
+                        f"unsafe {image}", [tag_1.slug],
+                        [("ingredient_0", 5)], image
+                    )
+                    for image in ("../image.png", "/etc/passwd")
+                ),
+            )
+        )
+
+        response = user_client.post(
+            self.import_url, body, content_type="application/x-ndjson"
+        )
+        assert response.status_code == 403
+
+        response = admin_client.post(
+            self.import_url, body, content_type="application/x-ndjson"
+        )
+        assert response.status_code == 200
+        report = response.json()
+        assert {
+            key: report[key]
+            for key in ("total", "valid", "inserted", "skipped", "failed")
+        } == {
+            "total": 8,
+            "valid": 1,
+            "inserted": 1,
+            "skipped": 1,
+            "failed": 6,
+        }
+        errors = {error["line"]: error for error in report["errors"]}
+        assert list(errors) == [2, 3, 4, 6, 7, 8]
+        assert len(errors[2]["errors"]) == 2
+        assert "nope" in errors[2]["errors"][0]
+        assert "unknown (г)" in errors[2]["errors"][1]
+        assert errors[3]["errors"][0].startswith("cooking_time")
+        assert errors[7]["errors"][0].startswith("image")
+        assert errors[8]["errors"][0].startswith("image")
+
+        recipe = Recipe.objects.get()
+        assert recipe.author.username == "admin"
+        assert list(recipe.tags.all()) == [tag_1]
+        assert dict(
+            recipe.recipe_ingr.values_list("ingredient__name", "amount")
+        ) == {"ingredient_0": 5, "ingredient_1": 1}
+        # у рецепта своя копия картинки под новым именем
+        assert recipe.image.name != stored_image
+        assert (media_root / recipe.image.name).exists()
+        assert recipe.image_variants["source"] == recipe.image.name
+        assert User.objects.get(username="admin").recipes_count == 1
+
+    @pytest.mark.django_db
+    def test_import_empty_body(self, admin_client):
+        from rest_framework.exceptions import ParseError
+
+        from api.parsers import NDJSONParser
+
+        response = admin_client.post(
+            self.import_url, b"", content_type="application/x-ndjson"
+        )
+
+        assert response.status_code == 400
+        with pytest.raises(ParseError):
+            NDJSONParser().parse(None)
+
+    @pytest.mark.django_db
+    def test_import_fills_subscriber_timelines(
+        self, settings, admin_client, user, author, stored_image, tag_1,
+        ingredients
+    ):
+        from recipes.models import Recipe
+        from users.models import Subscription, TimelineEntry
+
+        settings.SUBSCRIPTION_FEED_TIMELINE_THRESHOLD = 1
+        Subscription.objects.create(user=user, author=author)
+
+        response = admin_client.post(
+            self.import_url,
+            self.ndjson(
+                (
+                    self.record(
+                        "for subscribers",
+                        [tag_1.slug],
+                        [("ingredient_0", 1)],
+                        stored_image,
+                        author=author.username,
+                    ),
+                )
+            ),
+            content_type="application/x-ndjson",
+        )
+        assert response.json()["inserted"] == 1
+        recipe = Recipe.objects.get(author=author)
+        assert TimelineEntry.objects.filter(
+            user=user, recipe=recipe
+        ).exists()
+
+    @pytest.mark.django_db
+    def test_export_and_import_round_trip(
+        self, tmp_path, media_root, admin_client, create_recipes
+    ):
+        import io
+        import json
+
+        from django.core.management import call_command
+
+        from recipes.models import Recipe
+
+        (media_root / "photos").mkdir()
+        (media_root / "photos" / "image.png").write_bytes(make_image())
+        create_recipes(3)
+
+        response = admin_client.get(self.export_url)
+        assert response.status_code == 200
+        assert response["Content-Type"].startswith("application/x-ndjson")
+        records = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).splitlines()
+        ]
+        assert [record["name"] for record in records] == [
+            "recipe_0", "recipe_1", "recipe_2"
+        ]
+        assert records[2]["ingredients"][0] == {
+            "name": "ingredient_0", "measurement_unit": "г", "amount": 3
+        }
+
+        export_path = tmp_path / "recipes.ndjson"
+        call_command(
+            "export_recipes", output=str(export_path), stdout=io.StringIO()
+        )
+        assert [
+            json.loads(line) for line in export_path.read_text().splitlines()
+        ] == records
+
+        Recipe.objects.all().delete()
+        records[0]["image"] = "copy.png"
+        images_dir = tmp_path / "images"
+        images_dir.mkdir()
+        (images_dir / "copy.png").write_bytes(make_image())
+        export_path.write_text(
+            "\n".join(json.dumps(record) for record in records)
+        )
+        stdout = io.StringIO()
+        call_command(
+            "import_recipes",
+            str(export_path),
+            images_dir=str(images_dir),
+            batch_size=2,
+            stdout=stdout,
+        )
+        assert "добавлено 3" in stdout.getvalue()
+
+        imported = list(Recipe.objects.order_by("id"))
+        assert [recipe.name for recipe in imported] == [
+            "recipe_0", "recipe_1", "recipe_2"
+        ]
+        assert imported[0].image.name.startswith("photos/")
+        assert imported[0].image.name != "photos/image.png"
+        assert (media_root / imported[0].image.name).exists()
+        assert imported[1].image.name != imported[2].image.name
+        assert (media_root / imported[1].image.name).exists()
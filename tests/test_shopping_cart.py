@@ -0,0 +1,225 @@
+import json
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+@pytest.fixture
+def cart(user, create_recipes):
+    from recipes.models import ShoppingCard
+
+    recipes = create_recipes(3)
+    ShoppingCard.objects.bulk_create(
+        ShoppingCard(user=user, recipe=recipe) for recipe in recipes
+    )
+    return recipes
+
+
+class TestShoppingList:
+
+    url = "/api/recipes/download_shopping_cart/"
+
+    def get_rows(self, client):
+        response = client.get(self.url, {"format": "json"})
+        assert response.status_code == 200
+        return json.loads(b"".join(response.streaming_content))
+
+    @pytest.mark.django_db(transaction=True)
+    def test_amounts_are_aggregated(self, user_client, cart):
+        with CaptureQueriesContext(connection) as context:
+            rows = self.get_rows(user_client)
+
+        assert len(context) == 1
+        assert len(rows) == 5
+        assert rows[0] == {
+            "name": "ingredient_0", "measurement_unit": "г", "amount": 6
+        }
+
+    @pytest.mark.django_db(transaction=True)
+    def test_same_name_different_units(self, user, user_client, cart):
+        from recipes.models import Ingredient, RecipeIngredient
+
+        ingredient = Ingredient.objects.create(
+            name="ingredient_0", measurement_unit="кг"
+        )
+        RecipeIngredient.objects.create(
+            recipe=cart[0], ingredient=ingredient, amount=2
+        )
+
+        rows = self.get_rows(user_client)
+
+        assert [
+            (row["measurement_unit"], row["amount"])
+            for row in rows
+            if row["name"] == "ingredient_0"
+        ] == [("г", 6), ("кг", 2)]
+
+
+class TestShoppingCardExport:
+
+    url = "/api/recipes/download_shopping_cart/"
+
+    @staticmethod
+    def content(response):
+        if response.streaming:
+            return b"".join(response.streaming_content)
+        return b"".join(response)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_pdf_by_default(self, user_client, cart):
+        response = user_client.get(self.url)
+
+        assert response.status_code == 200
+        assert response["Content-Type"] == "application/pdf"
+        assert self.content(response).startswith(b"%PDF")
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize(
+        "export_format, expected_line",
+        (
+            ("csv", "ingredient_0,г,6"),
+            ("txt", "ingredient_0: 6 (г)"),
+            (
+                "json",
+                '[{"name": "ingredient_0", "measurement_unit": "г", '
+                '"amount": 6},',
+            ),
+        ),
+    )
+    def test_streaming_formats(
+        self, user_client, cart, export_format, expected_line
+    ):
+        response = user_client.get(self.url, {"format": export_format})
+
+        assert response.status_code == 200
+        assert response.streaming
+        assert expected_line in self.content(response).decode()
+        assert response["Content-Disposition"] == (
+            f'attachment; filename="shopping_card.{export_format}"'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_accept_header(self, user_client, cart):
+        response = user_client.get(self.url, HTTP_ACCEPT="text/csv")
+
+        assert response["Content-Type"].startswith("text/csv")
+
+    @pytest.mark.django_db(transaction=True)
+    def test_unknown_format(self, user_client, cart):
+        response = user_client.get(self.url, {"format": "docx"})
+
+        assert response.status_code == 404
+
+
+class TestShoppingCardCache:
+
+    url = "/api/recipes/download_shopping_cart/"
+
+    @pytest.mark.django_db(transaction=True)
+    def test_etag_and_not_modified(self, user_client, cart):
+        response = user_client.get(self.url)
+        etag = response["ETag"]
+
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == 304
+        assert response["ETag"] == etag
+        assert len(context) == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_document_served_from_cache(self, user_client, cart):
+        first = user_client.get(self.url)
+
+        with CaptureQueriesContext(connection) as context:
+            second = user_client.get(self.url)
+
+        assert len(context) == 0
+        assert second.content == first.content
+
+    @pytest.mark.django_db(transaction=True)
+    def test_cart_change_invalidates(
+        self, user, user_client, cart, create_recipes
+    ):
+        from recipes.models import ShoppingCard
+
+        etag = user_client.get(self.url)["ETag"]
+        ShoppingCard.objects.filter(user=user).first().delete()
+
+        response = user_client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+
+    @pytest.mark.django_db(transaction=True)
+    def test_invalidation_after_commit(self, user, user_client, cart):
+        from django.db import transaction
+
+        from api.cache import shopping_list_cache
+        from recipes.models import ShoppingCard
+
+        user_client.get(self.url)
+        with transaction.atomic():
+            ShoppingCard.objects.filter(user=user).first().delete()
+            # параллельный запрос видит старую корзину до фиксации
+            shopping_list_cache.set_digest(user.id, "pdf", "stale")
+
+        assert shopping_list_cache.get_digest(user.id, "pdf") is None
+
+    @pytest.mark.django_db(transaction=True)
+    def test_ingredient_change_invalidates(self, user_client, cart):
+        from recipes.models import Ingredient
+
+        etag = user_client.get(self.url)["ETag"]
+        ingredient = Ingredient.objects.first()
+        ingredient.name = "renamed"
+        ingredient.save()
+
+        assert user_client.get(self.url)["ETag"] != etag
+
+    @pytest.mark.django_db(transaction=True)
+    def test_same_content_same_etag(self, user_client, author, cart):
+        from rest_framework.test import APIClient
+
+        from recipes.models import ShoppingCard
+
+        ShoppingCard.objects.bulk_create(
+            ShoppingCard(user=author, recipe=recipe) for recipe in cart
+        )
+        author_client = APIClient()
+        author_client.force_authenticate(author)
+
+        assert (
+            user_client.get(self.url)["ETag"]
+            == author_client.get(self.url)["ETag"]
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_without_pointers(self, settings, user, user_client, cart):
+        from recipes.models import ShoppingCard
+
+        settings.SHOPPING_LIST_CACHE_POINTERS = False
+        etag = user_client.get(self.url)["ETag"]
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert len(context) == 1
+
+        ShoppingCard.objects.filter(user=user).first().delete()
+        assert user_client.get(self.url)["ETag"] != etag
+
+
+def test_document_lru_eviction():
+    from api.cache import DocumentLRUCache
+
+    lru = DocumentLRUCache(max_size=10)
+    lru.set("a", b"1234")
+    lru.set("b", b"1234")
+    lru.get("a")
+    lru.set("c", b"1234")
+
+    assert lru.get("b") is None
+    assert lru.get("a") == b"1234"
+    assert lru.get("c") == b"1234"
+    assert lru.size == 8
@@ -0,0 +1,106 @@
+import pytest
+
+
+@pytest.fixture(params=("locmem", "file"))
+def throttle_cache(request, settings, tmp_path):
+    """Лимиты на LocMem и на файловом кэше как замене общего."""
+
+    if request.param == "file":
+        settings.CACHES = {
+            **settings.CACHES,
+            "throttle": {
+                "BACKEND": "django.core.cache.backends.filebased."
+                "FileBasedCache",
+                "LOCATION": str(tmp_path / "throttle"),
+            },
+        }
+        settings.THROTTLE_CACHE_ALIAS = "throttle"
+    settings.REST_FRAMEWORK = {
+        **settings.REST_FRAMEWORK,
+        "DEFAULT_THROTTLE_RATES": {
+            "user": "3/min",
+            "anon": "2/min",
+            "bulk": "1/min",
+        },
+    }
+    return request.param
+
+
+@pytest.mark.django_db(transaction=True)
+class TestThrottling:
+
+    url = "/api/tags/"
+
+    def test_anon_rate(self, client, throttle_cache):
+        assert client.get(self.url).status_code == 200
+        assert client.get(self.url).status_code == 200
+
+        response = client.get(self.url)
+        assert response.status_code == 429
+        assert 0 < int(response["Retry-After"]) <= 60
+
+    def test_user_rate(self, user_client, throttle_cache):
+        for _ in range(3):
+            assert user_client.get(self.url).status_code == 200
+        assert user_client.get(self.url).status_code == 429
+
+    def test_rejected_requests_do_not_count(self, throttle_cache):
+        from api.throttling import AnonRateThrottle
+
+        request, view = self.request(), object()
+        throttle = AnonRateThrottle()
+        throttle.timer = lambda: 120.0
+        assert throttle.allow_request(request, view)
+        assert throttle.allow_request(request, view)
+        for _ in range(3):
+            assert not throttle.allow_request(request, view)
+        assert throttle.cache.get(f"{throttle.key}:2") == 2
+
+    @pytest.mark.parametrize(
+        "sliding, allowed", ((True, [True, True, False]), (False, [True] * 3))
+    )
+    def test_window(self, settings, throttle_cache, sliding, allowed):
+        """4 запроса в прошлом окне, 3 - на середине текущего."""
+
+        from api.throttling import AnonRateThrottle
+
+        settings.THROTTLE_SLIDING_WINDOW = sliding
+        settings.REST_FRAMEWORK = {
+            **settings.REST_FRAMEWORK,
+            "DEFAULT_THROTTLE_RATES": {"anon": "4/min"},
+        }
+        request, view = self.request(), object()
+        throttle = AnonRateThrottle()
+        throttle.timer = lambda: 60.0
+        for _ in range(4):
+            assert throttle.allow_request(request, view)
+
+        throttle.timer = lambda: 150.0
+        assert [
+            throttle.allow_request(request, view) for _ in range(3)
+        ] == allowed
+        if sliding:
+            # 4 * (1 - t / 60) + 3 <= 4 при t >= 45
+            assert throttle.wait() == pytest.approx(15)
+
+    def test_scoped_rate(self, throttle_cache):
+        from api.throttling import ScopedRateThrottle
+
+        class View:
+            throttle_scope = "bulk"
+
+        request = self.request()
+        throttle = ScopedRateThrottle()
+        assert throttle.allow_request(request, View())
+        assert not throttle.allow_request(request, View())
+        assert throttle.allow_request(request, object())
+
+    @staticmethod
+    def request():
+        from django.contrib.auth.models import AnonymousUser
+        from rest_framework.request import Request
+        from rest_framework.test import APIRequestFactory
+
+        request = Request(APIRequestFactory().get("/"))
+        request.user = AnonymousUser()
+        return request
@@ -0,0 +1,246 @@
+import io
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class TestSubscriptions:
+
+    url = "/api/users/subscriptions/"
+
+    @pytest.mark.django_db(transaction=True)
+    def test_queries_do_not_depend_on_subscriptions_count(
+        self, user, user_client, create_authors, create_recipes
+    ):
+        from users.models import Subscription
+
+        authors = create_authors(6)
+        for author in authors:
+            create_recipes(4, recipe_author=author)
+
+        Subscription.objects.create(user=user, author=authors[0])
+        with CaptureQueriesContext(connection) as one_author:
+            user_client.get(self.url)
+
+        Subscription.objects.bulk_create(
+            Subscription(user=user, author=author) for author in authors[1:]
+        )
+        with CaptureQueriesContext(connection) as many_authors:
+            response = user_client.get(
+                self.url, {"page_size": 6, "recipes_limit": 2}
+            )
+
+        results = response.json()["results"]
+        assert len(results) == 6
+        assert len(one_author) == len(many_authors)
+        for author in results:
+            assert author["is_subscribed"] is True
+            assert author["recipes_count"] == 4
+            assert len(author["recipes"]) == 2
+
+
+class TestSubscriptionFeed:
+
+    url = "/api/users/subscriptions/feed/"
+
+    def read_feed(self, api_client, page_size=2):
+        ids = []
+        url, params = self.url, {"page_size": page_size}
+        while url:
+            response = api_client.get(url, params)
+            assert response.status_code == 200
+            data = response.json()
+            ids += [recipe["id"] for recipe in data["results"]]
+            url, params = data["next"], None
+        return ids
+
+    @staticmethod
+    def expected(user):
+        from recipes.models import Recipe
+
+        return list(
+            Recipe.objects.filter(
+                author__subscribe_object__user=user
+            ).values_list("id", flat=True)
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize("threshold", (None, 1, 3))
+    def test_feed(
+        self,
+        settings,
+        user,
+        user_client,
+        create_authors,
+        create_recipes,
+        threshold,
+    ):
+        from users.models import TimelineEntry
+
+        settings.SUBSCRIPTION_FEED_TIMELINE_THRESHOLD = threshold
+        authors = create_authors(4)
+        for author in authors:
+            create_recipes(2, recipe_author=author)
+
+        for author in authors[:3]:
+            user_client.post(f"/api/users/{author.id}/subscribe/")
+        create_recipes(1, recipe_author=authors[0])
+        create_recipes(1, recipe_author=authors[3])
+
+        feed = self.read_feed(user_client)
+        assert feed == self.expected(user)
+        assert len(feed) == 7
+        assert TimelineEntry.objects.filter(user=user).count() == (
+            0 if threshold is None else 7
+        )
+
+        user_client.delete(f"/api/users/{authors[1].id}/subscribe/")
+        assert self.read_feed(user_client, page_size=3) == self.expected(user)
+        assert TimelineEntry.objects.filter(user=user).count() == (
+            5 if threshold == 1 else 0
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_threshold_lowered(
+        self, settings, user, user_client, create_authors, create_recipes
+    ):
+        from users.models import TimelineEntry
+
+        settings.SUBSCRIPTION_FEED_TIMELINE_THRESHOLD = 3
+        authors = create_authors(3)
+        for author in authors:
+            create_recipes(2, recipe_author=author)
+        for author in authors[:2]:
+            user_client.post(f"/api/users/{author.id}/subscribe/")
+        settings.SUBSCRIPTION_FEED_TIMELINE_THRESHOLD = 1
+
+        assert self.read_feed(user_client) == self.expected(user)
+        assert not TimelineEntry.objects.filter(user=user).exists()
+
+        user_client.post(f"/api/users/{authors[2].id}/subscribe/")
+        assert TimelineEntry.objects.filter(user=user).count() == 6
+        assert self.read_feed(user_client) == self.expected(user)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_rebuild_timelines(
+        self, settings, user, user_client, create_authors, create_recipes
+    ):
+        from django.core.management import call_command
+
+        from users.models import TimelineEntry
+
+        settings.SUBSCRIPTION_FEED_TIMELINE_THRESHOLD = None
+        authors = create_authors(2)
+        for author in authors:
+            create_recipes(2, recipe_author=author)
+            user_client.post(f"/api/users/{author.id}/subscribe/")
+
+        settings.SUBSCRIPTION_FEED_TIMELINE_THRESHOLD = 2
+        call_command("rebuild_timelines", stdout=io.StringIO())
+        user.refresh_from_db()
+        assert user.timeline_built
+        assert TimelineEntry.objects.filter(user=user).count() == 4
+        create_recipes(1, recipe_author=authors[0])
+        assert TimelineEntry.objects.filter(user=user).count() == 5
+        assert self.read_feed(user_client) == self.expected(user)
+
+        settings.SUBSCRIPTION_FEED_TIMELINE_THRESHOLD = 3
+        call_command("rebuild_timelines", stdout=io.StringIO())
+        user.refresh_from_db()
+        assert not user.timeline_built
+        assert not TimelineEntry.objects.filter(user=user).exists()
+        assert self.read_feed(user_client) == self.expected(user)
+
+    def test_anonymous(self, client):
+        assert client.get(self.url).status_code == 401
+
+
+@pytest.mark.django_db(transaction=True)
+class TestAuthTokenCache:
+
+    url = "/api/users/me/"
+
+    @pytest.fixture
+    def token_client(self, user):
+        from rest_framework.authtoken.models import Token
+        from rest_framework.test import APIClient
+
+        token = Token.objects.create(user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        return client
+
+    def auth_queries(self, client):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(self.url)
+        assert response.status_code == 200
+        return [
+            query["sql"]
+            for query in context.captured_queries
+            if "authtoken_token" in query["sql"]
+        ]
+
+    def test_hits_skip_database(self, token_client):
+        from api.authentication import auth_token_cache
+
+        assert len(self.auth_queries(token_client)) == 1
+        assert self.auth_queries(token_client) == []
+
+        auth_token_cache.local.clear()
+        assert self.auth_queries(token_client) == []
+
+        auth_token_cache.flush_stats()
+        stats = auth_token_cache.stats()
+        assert stats["misses"] == 1
+        assert stats["local_hits"] == 1
+        assert stats["shared_hits"] == 1
+
+    def test_disabled(self, settings, user, token_client):
+        settings.AUTH_TOKEN_CACHE = False
+
+        assert len(self.auth_queries(token_client)) == 1
+        assert len(self.auth_queries(token_client)) == 1
+        user.is_active = False
+        user.save()
+        assert token_client.get(self.url).status_code == 401
+
+    @pytest.mark.parametrize(
+        "field, status_code", (("is_blocked", 200), ("is_active", 401))
+    )
+    def test_user_change_invalidates(
+        self, user, token_client, field, status_code
+    ):
+        token_client.get(self.url)
+
+        setattr(user, field, field == "is_blocked")
+        user.save()
+        response = token_client.get(self.url)
+        assert response.status_code == status_code
+        if status_code == 200:
+            assert response.wsgi_request.user.is_blocked
+
+    def test_last_login_keeps_snapshot(self, user, token_client):
+        from django.utils import timezone
+
+        token_client.get(self.url)
+        user.last_login = timezone.now()
+        user.save(update_fields=("last_login",))
+        assert self.auth_queries(token_client) == []
+
+    def test_token_delete_invalidates(self, user, token_client):
+        token_client.get(self.url)
+        user.auth_token.delete()
+        assert token_client.get(self.url).status_code == 401
+
+    def test_stats_command(self, token_client):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        token_client.get(self.url)
+        token_client.get(self.url)
+        out = StringIO()
+        call_command("auth_token_cache_stats", "--reset", stdout=out)
+        assert "hit rate: 50.0%" in out.getvalue()
+        assert "saved per request" in out.getvalue()